@@ -12,6 +12,7 @@
 #define ITERATIONS 100
 #define DELAY_BETWEEN_MS 50
 #define MARKER_PIN 4  // Connect to Logger's marker input
+#define EVENT_LOG 0   // 1 = print "[EVT] micros,event,packet,bytes" lines for scripts/attribution.py
 
 const char* PEER_WIFI_SSID = "XiFi-Peer";
 const char* PEER_WIFI_PASS = "xifi1234";
@@ -47,7 +48,14 @@ void setup() {
 
   setupDone = true;
   Serial.println("[START]");
+  uint32_t t = micros();
   digitalWrite(MARKER_PIN, HIGH);  // Marker ON = transfer phase
+  logEvent(t, "marker_on", -1, 0);
+}
+
+// Events are printed after the fact so the UART stays out of the timed window
+void logEvent(uint32_t t, const char* event, int packet, int bytes) {
+  if (EVENT_LOG) Serial.printf("[EVT] %lu,%s,%d,%d\n", (unsigned long)t, event, packet, bytes);
 }
 
 void loop() {
@@ -55,14 +63,20 @@ void loop() {
   if (!setupDone) return;
 
   if (iteration < ITERATIONS) {
+    uint32_t start = micros();
     if (TEST_MODE == 1) sendBleAdv();
     else if (TEST_MODE == 2) sendBleConn();
     else if (TEST_MODE == 3) sendWifi();
+    uint32_t end = micros();
+    logEvent(start, "start", iteration, PAYLOAD_SIZE);
+    logEvent(end, "end", iteration, PAYLOAD_SIZE);
 
     iteration++;
     delay(DELAY_BETWEEN_MS);
   } else if (iteration == ITERATIONS) {
+    uint32_t t = micros();
     digitalWrite(MARKER_PIN, LOW);  // Marker OFF = transfer done
+    logEvent(t, "marker_off", -1, 0);
     Serial.println("[END]");
     const char* modeName = TEST_MODE==1 ? "BLE_ADV" : TEST_MODE==2 ? "BLE_CONN" : "WIFI";
     Serial.printf("[DONE] %s,%d bytes,%d iterations\n", modeName, PAYLOAD_SIZE, ITERATIONS);
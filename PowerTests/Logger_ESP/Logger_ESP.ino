@@ -8,8 +8,9 @@
 #define I2C_SDA 7
 #define I2C_SCL 6
 #define MARKER_PIN 5
-#define SAMPLE_INTERVAL_MS 50
+#define SAMPLE_INTERVAL_MS 50   // default; change at runtime with 'interval <ms>'
 #define BUFFER_SIZE 6000
+#define DUMP_VERSION 1
 
 const char* WIFI_SSID = "XiFi-Peer";
 const char* WIFI_PASS = "xifi1234";
@@ -25,19 +26,42 @@ struct Sample {
   uint8_t marker;
 };
 
+// 'dump' wire format (little-endian, see scripts/binary_dump.py)
+struct __attribute__((packed)) DumpHeader {
+  char magic[4];          // "XIFB"
+  uint8_t version;
+  uint8_t recordSize;
+  uint16_t reserved;
+  uint32_t count;
+  uint32_t intervalMs;
+};
+
+struct __attribute__((packed)) DumpRecord {
+  uint32_t timestamp;     // ms since 'start', like the CSV
+  float voltage;
+  float current;
+  float power;
+  uint8_t marker;
+};
+static_assert(sizeof(DumpHeader) == 16, "DumpHeader layout");
+static_assert(sizeof(DumpRecord) == 17, "DumpRecord layout");
+
 Sample buffer[BUFFER_SIZE];
 int sampleCount = 0;
 unsigned long lastSample = 0;
 unsigned long lastStatus = 0;
 bool logging = false;
+bool streaming = false;            // print every sample as it is taken
+unsigned long sampleIntervalMs = SAMPLE_INTERVAL_MS;
 unsigned long logStartTime = 0;
+unsigned long streamStartTime = 0;  // separate epoch: `stream` must not shift buffered timestamps
 Sample latest;
 
 void setup() {
   Serial.begin(115200);
   delay(1000);
   Serial.println("\n=== XiFi Power Logger ===");
-  Serial.println("Commands: start, stop, status, csv");
+  Serial.println("Commands: start, stop, status, csv, dump, stream, interval <ms>");
 
   Wire.begin(I2C_SDA, I2C_SCL);
   pinMode(MARKER_PIN, INPUT_PULLDOWN);
@@ -76,7 +100,7 @@ void loop() {
 
   // Sample INA219
   unsigned long now = millis();
-  if (now - lastSample >= SAMPLE_INTERVAL_MS) {
+  if (now - lastSample >= sampleIntervalMs) {
     lastSample = now;
 
     latest.timestamp = now;
@@ -89,10 +113,20 @@ void loop() {
       buffer[sampleCount] = latest;
       sampleCount++;
     }
+
+    // Continuous mode: host-side capture daemon stores the samples
+    if (streaming) {
+      Serial.printf("%lu,%.3f,%.2f,%.2f,%d\n",
+        latest.timestamp - streamStartTime,
+        latest.voltage,
+        latest.current,
+        latest.power,
+        latest.marker);
+    }
   }
 
   // Print status every 2 seconds while logging
-  if (logging && now - lastStatus >= 2000) {
+  if (logging && !streaming && now - lastStatus >= 2000) {
     lastStatus = now;
     Serial.printf("[%d] %.2fmA %.2fmW marker=%d\n",
       sampleCount, latest.current, latest.power, latest.marker);
@@ -112,17 +146,35 @@ void loop() {
     }
     else if (cmd == "stop") {
       logging = false;
+      if (streaming) {
+        streaming = false;
+        Serial.println(">>> STREAM END <<<");
+      }
       Serial.printf(">>> STOPPED - %d samples <<<\n", sampleCount);
     }
+    else if (cmd == "stream") {
+      streamStartTime = millis();
+      streaming = true;
+      Serial.println(">>> STREAM START <<<");
+      Serial.println("timestamp_ms,voltage_V,current_mA,power_mW,marker");
+    }
+    else if (cmd.startsWith("interval")) {
+      long ms = cmd.substring(8).toInt();
+      if (ms > 0) sampleIntervalMs = ms;
+      Serial.printf("Interval: %lums\n", sampleIntervalMs);
+    }
     else if (cmd == "status") {
-      Serial.printf("Logging: %s, Samples: %d/%d\n",
-        logging?"YES":"NO", sampleCount, BUFFER_SIZE);
+      Serial.printf("Logging: %s, Streaming: %s, Samples: %d/%d, Interval: %lums\n",
+        logging?"YES":"NO", streaming?"YES":"NO", sampleCount, BUFFER_SIZE, sampleIntervalMs);
       Serial.printf("Current: %.2fmA, Power: %.2fmW, Marker: %d\n",
         latest.current, latest.power, latest.marker);
     }
     else if (cmd == "csv") {
       printCSV();
     }
+    else if (cmd == "dump") {
+      dumpBinary();
+    }
   }
 }
 
@@ -140,6 +192,39 @@ void printCSV() {
   Serial.println(">>> CSV END <<<");
 }
 
+// CRC-32 (zlib polynomial), chainable: crc = crc32Update(crc, ...) starting from 0
+uint32_t crc32Update(uint32_t crc, const uint8_t* data, size_t len) {
+  crc = ~crc;
+  while (len--) {
+    crc ^= *data++;
+    for (int k = 0; k < 8; k++) {
+      crc = (crc >> 1) ^ (0xEDB88320 & (0 - (crc & 1)));
+    }
+  }
+  return ~crc;
+}
+
+// Same samples as printCSV() as packed binary records: header, records, CRC-32
+void dumpBinary() {
+  DumpHeader header = {{'X', 'I', 'F', 'B'}, DUMP_VERSION, sizeof(DumpRecord), 0,
+                       (uint32_t)sampleCount, (uint32_t)sampleIntervalMs};
+  Serial.println("\n>>> DUMP START <<<");
+  uint32_t crc = crc32Update(0, (const uint8_t*)&header, sizeof(header));
+  Serial.write((const uint8_t*)&header, sizeof(header));
+  for (int i = 0; i < sampleCount; i++) {
+    DumpRecord rec = {
+      (uint32_t)(buffer[i].timestamp - logStartTime),
+      buffer[i].voltage,
+      buffer[i].current,
+      buffer[i].power,
+      buffer[i].marker};
+    crc = crc32Update(crc, (const uint8_t*)&rec, sizeof(rec));
+    Serial.write((const uint8_t*)&rec, sizeof(rec));
+  }
+  Serial.write((const uint8_t*)&crc, sizeof(crc));
+  Serial.println("\n>>> DUMP END <<<");
+}
+
 void handleCSV() {
   server.setContentLength(CONTENT_LENGTH_UNKNOWN);
   server.send(200, "text/csv", "");
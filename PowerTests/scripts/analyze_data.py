@@ -1,89 +1,56 @@
 #!/usr/bin/env python3
 """Analyze XiFi power measurement data for protocol comparison."""
 
-import pandas as pd
-import matplotlib
-matplotlib.use('Agg')  # Non-interactive backend
-import matplotlib.pyplot as plt
-import numpy as np
-import os
+import argparse
 from pathlib import Path
 
-BASE_DIR = Path(__file__).parent.parent
-DATA_DIR = BASE_DIR / "Data"
-RESULTS_DIR = BASE_DIR / "results"
-IMAGES_DIR = BASE_DIR / "images"
-
-def load_all_data():
-    """Load all CSV files and extract metrics."""
-    results = []
-
-    for size_dir in DATA_DIR.iterdir():
-        if not size_dir.is_dir():
-            continue
-
-        # Parse payload size from folder name
-        size_str = size_dir.name.split()[0]
-        try:
-            payload_size = int(size_str)
-        except:
-            continue
-
-        for csv_file in size_dir.glob("*.csv"):
-            mode = csv_file.stem.replace(" ", "")  # BLE_ADV, BLE_CONN, WiFi
-
-            try:
-                df = pd.read_csv(csv_file)
-
-                # Get transfer phase (marker=1)
-                transfer = df[df['marker'] == 1]
-                idle = df[df['marker'] == 0]
-
-                if len(transfer) == 0:
-                    print(f"Warning: No transfer data in {csv_file}")
-                    continue
-
-                # Calculate metrics
-                duration_ms = transfer['timestamp_ms'].max() - transfer['timestamp_ms'].min()
-                avg_current_mA = transfer['current_mA'].mean()
-                avg_power_mW = transfer['power_mW'].mean()
-                idle_power_mW = idle['power_mW'].mean() if len(idle) > 0 else 0
-
-                # Energy = Power × Time (mW × ms = µJ)
-                energy_uJ = avg_power_mW * duration_ms
-                energy_mJ = energy_uJ / 1000
-
-                # Energy per byte (using transfer phase only)
-                energy_per_byte_uJ = (energy_mJ * 1000) / payload_size if payload_size > 0 else 0
-
-                # Also calculate total energy for full test (init + transfer)
-                total_energy_mJ = df['power_mW'].mean() * (df['timestamp_ms'].max() - df['timestamp_ms'].min()) / 1000
-
-                results.append({
-                    'mode': mode,
-                    'payload_bytes': payload_size,
-                    'duration_ms': duration_ms,
-                    'avg_current_mA': avg_current_mA,
-                    'avg_power_mW': avg_power_mW,
-                    'energy_mJ': energy_mJ,
-                    'energy_per_byte_uJ': energy_per_byte_uJ,
-                    'total_test_energy_mJ': total_energy_mJ
-                })
-
-            except Exception as e:
-                print(f"Error loading {csv_file}: {e}")
-
-    return pd.DataFrame(results)
-
-def plot_comparison(df):
+from metrics import mean_over_runs, metrics_table, runs_note, view
+from paths import DATA_DIR, IMAGES_DIR, add_path_args, add_run_args, run_filters
+from trace_cache import print_cache_stats
+
+# analysis_results.csv column -> metrics table column
+COLUMNS = {
+    'mode': 'mode',
+    'payload_bytes': 'payload_bytes',
+    'campaign': 'campaign',
+    'repetition': 'repetition',
+    'duration_ms': 'window_duration_ms',
+    'avg_current_mA': 'transfer_avg_current_mA',
+    'avg_power_mW': 'transfer_avg_power_mW',
+    'energy_mJ': 'window_energy_mJ',
+    'energy_per_byte_uJ': 'window_energy_per_byte_uJ',
+    'total_test_energy_mJ': 'mean_power_energy_mJ',
+}
+
+def transfer_view(table):
+    """Transfer-phase columns of a metrics table; tests without transfer samples are dropped."""
+    for _, r in table[table['transfer_samples'] == 0].iterrows():
+        print(f"Warning: No transfer data in {r['payload_bytes']} bytes / {r['mode']}")
+    return view(table, COLUMNS, where=lambda t: t['transfer_samples'] > 0)
+
+def load_all_data(workers=1, data_dir=DATA_DIR, **filters):
+    """Load all CSV files and extract transfer-phase metrics, one row per run.
+
+    workers > 1 (or 0 for one per CPU) processes files in a process pool;
+    rows are always ordered by payload size, then mode. filters select
+    runs from the catalog (see metrics_table).
+    """
+    return transfer_view(metrics_table(workers, data_dir, **filters))
+
+def plot_comparison(df, images_dir=IMAGES_DIR):
     """Create comparison plots."""
+    # imported here so the text-only paths never pay for matplotlib
+    import matplotlib
+    matplotlib.use('Agg')  # Non-interactive backend
+    import matplotlib.pyplot as plt
+
     fig, axes = plt.subplots(2, 2, figsize=(14, 10))
 
     modes = ['BLE_ADV', 'BLE_CONN', 'WiFi']
     colors = {'BLE_ADV': 'blue', 'BLE_CONN': 'green', 'WiFi': 'red'}
 
-    # Sort by payload size
-    df = df.sort_values('payload_bytes')
+    # Sort by payload size, one point per mode and size
+    df = mean_over_runs(df).sort_values('payload_bytes')
 
     # 1. Energy vs Payload Size
     ax = axes[0, 0]
@@ -139,12 +106,16 @@ def plot_comparison(df):
     ax.set_xscale('log')
 
     plt.tight_layout()
-    plt.savefig(IMAGES_DIR / 'analysis_comparison.png', dpi=150)
+    Path(images_dir).mkdir(parents=True, exist_ok=True)
+    plt.savefig(Path(images_dir) / 'analysis_comparison.png', dpi=150)
     print(f"Saved: analysis_comparison.png")
 
 def find_crossover(df):
-    """Find crossover points between protocols."""
+    """Find crossover points between protocols (repeated runs are averaged)."""
     print("\n=== CROSSOVER ANALYSIS ===")
+    df = mean_over_runs(df)
+    if runs_note(df):
+        print(runs_note(df))
 
     sizes = sorted(df['payload_bytes'].unique())
 
@@ -171,6 +142,7 @@ def print_summary(df):
     print("\n=== KEY INSIGHTS ===")
 
     # Find most efficient protocol for small vs large payloads
+    df = mean_over_runs(df)
     small = df[df['payload_bytes'] <= 10]
     large = df[df['payload_bytes'] >= 512]
 
@@ -185,8 +157,15 @@ def print_summary(df):
         print(f"  Energy per byte: {best_large['energy_per_byte_uJ']:.2f} µJ/byte")
 
 def main():
-    print("Loading data from:", DATA_DIR)
-    df = load_all_data()
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('-j', '--workers', type=int, default=1,
+                        help='worker processes for ingestion (0 = one per CPU)')
+    add_path_args(parser)
+    add_run_args(parser)
+    args = parser.parse_args()
+
+    print("Loading data from:", args.data_dir)
+    df = load_all_data(args.workers, args.data_dir, **run_filters(args))
 
     if len(df) == 0:
         print("No data found!")
@@ -196,12 +175,14 @@ def main():
 
     print_summary(df)
     find_crossover(df)
-    plot_comparison(df)
+    plot_comparison(df, args.images_dir)
 
     # Save results to CSV
-    output_file = RESULTS_DIR / 'analysis_results.csv'
+    output_file = args.results_dir / 'analysis_results.csv'
+    output_file.parent.mkdir(parents=True, exist_ok=True)
     df.to_csv(output_file, index=False)
     print(f"\nSaved: {output_file}")
+    print_cache_stats()
 
     # plt.show()  # Uncomment to display interactively
 
@@ -1,84 +1,32 @@
 #!/usr/bin/env python3
 """Analyze full energy cost for XiFi algorithm comparison."""
 
-import pandas as pd
-import matplotlib
-matplotlib.use('Agg')
-import matplotlib.pyplot as plt
+import argparse
 import numpy as np
 from pathlib import Path
 
-BASE_DIR = Path(__file__).parent.parent
-DATA_DIR = BASE_DIR / "Data"
-RESULTS_DIR = BASE_DIR / "results"
-IMAGES_DIR = BASE_DIR / "images"
+from metrics import ITERATIONS, mean_over_runs, metrics_table, runs_note, view
+from paths import DATA_DIR, IMAGES_DIR, add_path_args, add_run_args, run_filters
+from trace_cache import print_cache_stats
 
-def analyze_full_energy():
-    """Analyze complete energy breakdown for each test."""
-    results = []
+# full_energy_results.csv columns, all taken as-is from the metrics table
+COLUMNS = ['mode', 'payload_bytes', 'campaign', 'repetition', 'total_duration_s', 'transfer_duration_s',
+           'overhead_duration_s', 'total_energy_mJ', 'transfer_energy_mJ',
+           'overhead_energy_mJ', 'transfer_avg_power_mW', 'overhead_avg_power_mW',
+           'throughput_kbps', 'energy_per_byte_uJ']
 
-    for size_dir in DATA_DIR.iterdir():
-        if not size_dir.is_dir():
-            continue
-
-        size_str = size_dir.name.split()[0]
-        try:
-            payload_size = int(size_str)
-        except:
-            continue
-
-        for csv_file in size_dir.glob("*.csv"):
-            mode = csv_file.stem.replace(" ", "")
-
-            try:
-                df = pd.read_csv(csv_file)
-
-                # Time step (ms between samples)
-                dt = df['timestamp_ms'].diff().median()
-
-                # Split into phases based on marker
-                transfer = df[df['marker'] == 1]
-                non_transfer = df[df['marker'] == 0]
-
-                # Total test metrics
-                total_duration_ms = df['timestamp_ms'].max() - df['timestamp_ms'].min()
-                total_samples = len(df)
+def full_energy_view(table):
+    """Full-energy columns of a metrics table."""
+    return view(table, {c: c for c in COLUMNS})
 
-                # Energy calculation: sum of (power × dt) for each sample
-                total_energy_mJ = (df['power_mW'] * dt).sum() / 1000
+def analyze_full_energy(workers=1, data_dir=DATA_DIR, **filters):
+    """Analyze complete energy breakdown for each run.
 
-                # Transfer phase
-                transfer_duration_ms = len(transfer) * dt if len(transfer) > 0 else 0
-                transfer_energy_mJ = (transfer['power_mW'] * dt).sum() / 1000 if len(transfer) > 0 else 0
-                transfer_avg_power = transfer['power_mW'].mean() if len(transfer) > 0 else 0
-
-                # Non-transfer phase (init + teardown + idle)
-                overhead_duration_ms = len(non_transfer) * dt if len(non_transfer) > 0 else 0
-                overhead_energy_mJ = (non_transfer['power_mW'] * dt).sum() / 1000 if len(non_transfer) > 0 else 0
-                overhead_avg_power = non_transfer['power_mW'].mean() if len(non_transfer) > 0 else 0
-
-                # Throughput
-                throughput_bps = (payload_size * 8 * 100) / (transfer_duration_ms / 1000) if transfer_duration_ms > 0 else 0  # 100 iterations
-
-                results.append({
-                    'mode': mode,
-                    'payload_bytes': payload_size,
-                    'total_duration_s': total_duration_ms / 1000,
-                    'transfer_duration_s': transfer_duration_ms / 1000,
-                    'overhead_duration_s': overhead_duration_ms / 1000,
-                    'total_energy_mJ': total_energy_mJ,
-                    'transfer_energy_mJ': transfer_energy_mJ,
-                    'overhead_energy_mJ': overhead_energy_mJ,
-                    'transfer_avg_power_mW': transfer_avg_power,
-                    'overhead_avg_power_mW': overhead_avg_power,
-                    'throughput_kbps': throughput_bps / 1000,
-                    'energy_per_byte_uJ': (total_energy_mJ * 1000) / (payload_size * 100) if payload_size > 0 else 0  # 100 iterations
-                })
-
-            except Exception as e:
-                print(f"Error: {csv_file}: {e}")
-
-    return pd.DataFrame(results)
+    workers > 1 (or 0 for one per CPU) processes files in a process pool;
+    rows are always ordered by payload size, then mode. filters select
+    runs from the catalog (see metrics_table).
+    """
+    return full_energy_view(metrics_table(workers, data_dir, **filters))
 
 def print_analysis(df):
     """Print detailed analysis."""
@@ -87,12 +35,16 @@ def print_analysis(df):
     print("="*80)
 
     print("\n### SUMMARY TABLE ###\n")
-    summary = df[['mode', 'payload_bytes', 'total_duration_s', 'total_energy_mJ',
+    summary = df[['mode', 'payload_bytes', 'campaign', 'repetition', 'total_duration_s', 'total_energy_mJ',
                   'transfer_energy_mJ', 'overhead_energy_mJ', 'throughput_kbps']].copy()
     summary = summary.sort_values(['payload_bytes', 'mode'])
     print(summary.to_string(index=False))
 
     print("\n### ENERGY COMPARISON BY PAYLOAD SIZE ###\n")
+    runs = df
+    df = mean_over_runs(df)
+    if runs_note(df):
+        print(runs_note(df) + "\n")
     print(f"{'Size':<8} {'BLE_ADV':<20} {'BLE_CONN':<20} {'WiFi':<20} {'Best':<10}")
     print(f"{'(bytes)':<8} {'Energy(mJ)/Time(s)':<20} {'Energy(mJ)/Time(s)':<20} {'Energy(mJ)/Time(s)':<20}")
     print("-"*80)
@@ -112,15 +64,17 @@ def print_analysis(df):
               f"{row_data['WiFi'][0]:<8.1f}/{row_data['WiFi'][1]:<8.1f}   {best}")
 
     print("\n### ENERGY BREAKDOWN (Transfer vs Overhead) ###\n")
-    print(f"{'Mode':<10} {'Size':<8} {'Total(mJ)':<12} {'Transfer(mJ)':<14} {'Overhead(mJ)':<14} {'Overhead%':<10}")
-    print("-"*70)
-    for _, r in df.sort_values(['mode', 'payload_bytes']).iterrows():
+    print(f"{'Mode':<10} {'Size':<8} {'Run':<12} {'Total(mJ)':<12} {'Transfer(mJ)':<14} {'Overhead(mJ)':<14} {'Overhead%':<10}")
+    print("-"*83)
+    for _, r in runs.sort_values(['mode', 'payload_bytes', 'campaign', 'repetition']).iterrows():
         overhead_pct = (r['overhead_energy_mJ'] / r['total_energy_mJ'] * 100) if r['total_energy_mJ'] > 0 else 0
-        print(f"{r['mode']:<10} {r['payload_bytes']:<8} {r['total_energy_mJ']:<12.1f} "
+        run = f"{r['campaign']}/r{r['repetition']}" if r['campaign'] else f"r{r['repetition']}"
+        print(f"{r['mode']:<10} {r['payload_bytes']:<8} {run:<12} {r['total_energy_mJ']:<12.1f} "
               f"{r['transfer_energy_mJ']:<14.1f} {r['overhead_energy_mJ']:<14.1f} {overhead_pct:<10.1f}%")
 
 def analyze_hybrid_scenario(df):
-    """Analyze hybrid WiFi + BLE_ADV scenario."""
+    """Analyze hybrid WiFi + BLE_ADV scenario (repeated runs are averaged)."""
+    df = mean_over_runs(df)
     print("\n" + "="*80)
     print("HYBRID SCENARIO ANALYSIS")
     print("="*80)
@@ -146,7 +100,7 @@ Scenario: Video streaming with adaptive bursts
     target_bytes = 10240
 
     for size in sorted(df['payload_bytes'].unique()):
-        bursts_needed = target_bytes / (size * 100)  # 100 iterations per test
+        bursts_needed = target_bytes / (size * ITERATIONS)
 
         wifi = df[(df['payload_bytes'] == size) & (df['mode'] == 'WiFi')]
         ble_conn = df[(df['payload_bytes'] == size) & (df['mode'] == 'BLE_CONN')]
@@ -173,14 +127,19 @@ Scenario: Video streaming with adaptive bursts
         print(f"  → Best: {'Hybrid' if hybrid_energy < min(wifi_energy, ble_conn_energy) else 'WiFi' if wifi_energy < ble_conn_energy else 'BLE_CONN'}")
         print()
 
-def plot_full_analysis(df):
+def plot_full_analysis(df, images_dir=IMAGES_DIR):
     """Create visualization plots."""
+    # imported here so the text-only paths never pay for matplotlib
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+
     fig, axes = plt.subplots(2, 2, figsize=(14, 10))
 
     modes = ['BLE_ADV', 'BLE_CONN', 'WiFi']
     colors = {'BLE_ADV': 'blue', 'BLE_CONN': 'green', 'WiFi': 'red'}
 
-    df = df.sort_values('payload_bytes')
+    df = mean_over_runs(df).sort_values('payload_bytes')
 
     # 1. Total Energy vs Payload
     ax = axes[0, 0]
@@ -246,12 +205,20 @@ def plot_full_analysis(df):
     ax.set_yscale('log')
 
     plt.tight_layout()
-    plt.savefig(IMAGES_DIR / 'full_energy_analysis.png', dpi=150)
+    Path(images_dir).mkdir(parents=True, exist_ok=True)
+    plt.savefig(Path(images_dir) / 'full_energy_analysis.png', dpi=150)
     print(f"\nSaved: full_energy_analysis.png")
 
 def main():
-    print("Loading data from:", DATA_DIR)
-    df = analyze_full_energy()
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('-j', '--workers', type=int, default=1,
+                        help='worker processes for ingestion (0 = one per CPU)')
+    add_path_args(parser)
+    add_run_args(parser)
+    args = parser.parse_args()
+
+    print("Loading data from:", args.data_dir)
+    df = analyze_full_energy(args.workers, args.data_dir, **run_filters(args))
 
     if len(df) == 0:
         print("No data found!")
@@ -261,12 +228,14 @@ def main():
 
     print_analysis(df)
     analyze_hybrid_scenario(df)
-    plot_full_analysis(df)
+    plot_full_analysis(df, args.images_dir)
 
     # Save results
-    output_file = RESULTS_DIR / 'full_energy_results.csv'
+    output_file = args.results_dir / 'full_energy_results.csv'
+    output_file.parent.mkdir(parents=True, exist_ok=True)
     df.to_csv(output_file, index=False)
     print(f"\nSaved: {output_file}")
+    print_cache_stats()
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,420 @@
+#!/usr/bin/env python3
+"""Per-packet energy attribution: join a DUT event log to the logger trace.
+
+The logger only sees the marker pin, so everything else reports energy per
+test. With EVENT_LOG set in DUT_ESP.ino the DUT also prints one line per
+event on its own clock (micros()):
+
+    [EVT] 5123456,marker_on,-1,0
+    [EVT] 5123990,start,0,512
+    [EVT] 5141022,end,0,512
+    ...
+
+A capture of that serial output, or a CSV with the header
+dut_us,event,packet,bytes, is the event log.
+
+Clock alignment: the marker_on/marker_off events and the logger's marker
+edges are the same physical transitions. A logger edge is placed halfway
+between the two samples it falls between, so each edge is known to +-dt/2.
+With at least MIN_FIT_EDGES matched edges, logger_ms = scale x dut_us +
+offset is fitted by least squares, which also removes crystal drift. With
+fewer (the stock firmware gives one rise and one fall) only the offset is
+fitted, because a slope from two edges a few seconds apart would be noisier
+than the drift it corrects.
+
+The join is a sorted as-of merge: np.searchsorted finds the last sample at
+or before every packet start and end, like pd.merge_asof(direction=
+'backward'). The cumulative trapezoidal energy is then interpolated at those
+times, so a packet's energy is E(end) - E(start), exact to the linear power
+interpolation segments.py uses. There is no per-packet Python loop: a
+million packets join in about 0.6 s, plus about as long to parse the log.
+
+    python attribution.py "Data/512 Bytes/WiFi.csv" wifi_serial.log --out results/packets.csv
+    python attribution.py --check                # synthetic logs on every test, vs a per-packet loop
+    python attribution.py --bench 100k,1M,4M     # join time vs packet count
+"""
+
+import argparse
+import io
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from ingest import iter_test_files
+from metrics import ITERATIONS
+from paths import DATA_DIR
+from segments import marker_edges
+from trace_cache import load_trace_arrays, print_cache_stats
+
+EVENT_COLUMNS = ['dut_us', 'event', 'packet', 'bytes']
+EVENT_PREFIX = "[EVT] "
+PACKET_COLUMNS = ['packet', 'bytes', 'start_ms', 'end_ms', 'latency_ms', 'samples',
+                  'energy_mJ', 'avg_power_mW', 'energy_per_byte_uJ']
+MIN_FIT_EDGES = 4
+PERCENTILES = (50, 90, 99)
+MICROS_WRAP = 1 << 32   # micros() is a uint32
+SYNTH_DRIFT_PPM = 40.0  # a typical ESP32 crystal tolerance
+
+
+# --- event log ---
+
+def unwrap_us(dut_us):
+    """Undo uint32 micros() wraparound (every ~71.6 min) in a log in print order."""
+    us = np.asarray(dut_us, dtype=np.int64)
+    wraps = np.cumsum(np.diff(us, prepend=us[:1]) < -(MICROS_WRAP // 2))
+    return us + wraps * MICROS_WRAP
+
+
+def load_events(path):
+    """Event log as a DataFrame with EVENT_COLUMNS, from a serial capture or a CSV."""
+    with open(path, errors='replace') as fh:
+        header = fh.readline()
+    source = path
+    if not header.startswith(EVENT_COLUMNS[0]):
+        text = Path(path).read_text(errors='replace')
+        lines = [line[len(EVENT_PREFIX):] for line in text.splitlines() if line.startswith(EVENT_PREFIX)]
+        source = io.StringIO(",".join(EVENT_COLUMNS) + "\n" + "\n".join(lines))
+    events = pd.read_csv(source, dtype={'dut_us': np.int64, 'event': 'category',
+                                        'packet': np.int64, 'bytes': np.int64})
+    events['dut_us'] = unwrap_us(events['dut_us'])
+    return events
+
+
+def event_mask(events, *names):
+    """Boolean mask of the rows whose event is one of names (compares category codes, not strings)."""
+    kind = events['event'].astype('category').cat
+    codes = [kind.categories.get_loc(n) for n in names if n in kind.categories]
+    return np.isin(kind.codes.to_numpy(), codes)
+
+
+def packet_table(events):
+    """One row per packet with both a start and an end: packet, bytes, start_us, end_us."""
+    start = events.loc[event_mask(events, 'start'), ['packet', 'bytes', 'dut_us']].rename(columns={'dut_us': 'start_us'})
+    end = events.loc[event_mask(events, 'end'), ['packet', 'dut_us']].rename(columns={'dut_us': 'end_us'})
+    if not (start['packet'].is_unique and end['packet'].is_unique):
+        raise ValueError("duplicate packet numbers in the event log (DUT restarted mid-capture?)")
+    packets = start.merge(end, on='packet', how='inner')
+    return packets.sort_values('start_us', kind='stable').reset_index(drop=True)
+
+
+# --- clock alignment ---
+
+def logger_edges(timestamp_ms, marker):
+    """(edge times in ms, rising) for every logger marker edge, each halfway between its samples."""
+    t = np.asarray(timestamp_ms, dtype=np.float64)
+    marker = np.asarray(marker)
+    idx = marker_edges(marker)
+    return (t[idx - 1] + t[idx]) / 2, marker[idx] == 1
+
+
+def dut_edges(events):
+    """(edge times in us, rising) from the marker_on / marker_off events."""
+    mask = event_mask(events, 'marker_on', 'marker_off')
+    return events['dut_us'].to_numpy(np.int64)[mask], event_mask(events, 'marker_on')[mask]
+
+
+def match_edges(dut, dut_rising, log, log_rising):
+    """Pairs of (dut_us, logger_ms) edge times.
+
+    Edges pair up in order when both sides saw the same rise/fall sequence.
+    Otherwise (a truncated capture, a glitch on the marker line) only the
+    first rise and the last fall are paired.
+    """
+    if len(dut) == len(log) and np.array_equal(dut_rising, log_rising):
+        return dut.astype(np.float64), log
+    pairs = []
+    for pick in (lambda r: np.flatnonzero(r)[:1], lambda r: np.flatnonzero(~r)[-1:]):
+        i, j = pick(dut_rising), pick(log_rising)
+        if len(i) and len(j):
+            pairs.append((float(dut[i[0]]), log[j[0]]))
+    if not pairs:
+        raise ValueError("no marker edges to align the event log with")
+    dut_t, log_t = np.array(pairs).T
+    return dut_t, log_t
+
+
+def align(dut_us, log_ms, min_fit=MIN_FIT_EDGES):
+    """Fit logger_ms = scale * dut_us + offset_ms to matched edges.
+
+    Returns {'scale', 'offset_ms', 'drift_ppm', 'edges', 'residual_ms'}.
+    drift_ppm is how much faster the logger clock runs than the DUT's.
+    """
+    dut_us = np.asarray(dut_us, dtype=np.float64)
+    log_ms = np.asarray(log_ms, dtype=np.float64)
+    # centre both clocks so the fit is well conditioned at large micros() values
+    du, lm = dut_us - dut_us[0], log_ms - log_ms[0]
+    if len(du) >= min_fit and np.ptp(du) > 0:
+        scale, rel_offset = np.polyfit(du, lm, 1)
+    else:
+        scale = 1e-3
+        rel_offset = float(np.mean(lm - du * scale))
+    offset_ms = log_ms[0] + rel_offset - scale * dut_us[0]
+    residual = log_ms - (scale * dut_us + offset_ms)
+    return {
+        'scale': float(scale),
+        'offset_ms': float(offset_ms),
+        'drift_ppm': float((scale * 1000 - 1) * 1e6),
+        'edges': len(du),
+        'residual_ms': float(np.max(np.abs(residual), initial=0.0)),
+    }
+
+
+# --- join ---
+
+def cumulative_energy(timestamp_ms, power_mW):
+    """C[k] = trapezoidal energy in uJ from the first sample to sample k."""
+    t = np.asarray(timestamp_ms, dtype=np.float64)
+    p = np.asarray(power_mW, dtype=np.float64)
+    return np.concatenate(([0.0], np.cumsum((p[1:] + p[:-1]) * 0.5 * np.diff(t))))
+
+
+def energy_at(t, p, cum_uJ, x):
+    """Cumulative energy (uJ) at arbitrary times x, and the as-of sample index of each.
+
+    Power is interpolated linearly inside the sample interval, so the
+    partial interval is a trapezoid too. x outside the trace gives NaN.
+    """
+    k = np.clip(np.searchsorted(t, x, side='right') - 1, 0, len(t) - 2)
+    span = t[k + 1] - t[k]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        frac = np.where(span > 0, (x - t[k]) / span, 0.0)
+    px = p[k] + frac * (p[k + 1] - p[k])
+    e = cum_uJ[k] + (p[k] + px) * 0.5 * (x - t[k])
+    return np.where((x >= t[0]) & (x <= t[-1]), e, np.nan), k
+
+
+def attribute(timestamp_ms, power_mW, marker, events):
+    """Per-packet energy for one trace and its event log.
+
+    Returns (packets DataFrame with PACKET_COLUMNS, alignment dict). Packets
+    outside the trace have NaN energy.
+    """
+    t = np.asarray(timestamp_ms, dtype=np.float64)
+    p = np.asarray(power_mW, dtype=np.float64)
+    if len(t) < 2:
+        raise ValueError("trace needs at least two samples")
+    fit = align(*match_edges(*dut_edges(events), *logger_edges(t, marker)))
+
+    pk = packet_table(events)
+    start_us = pk['start_us'].to_numpy(np.float64)
+    end_us = pk['end_us'].to_numpy(np.float64)
+    start_ms = fit['scale'] * start_us + fit['offset_ms']
+    end_ms = fit['scale'] * end_us + fit['offset_ms']
+
+    cum = cumulative_energy(t, p)
+    e0, k0 = energy_at(t, p, cum, start_ms)
+    e1, k1 = energy_at(t, p, cum, end_ms)
+    energy_mJ = (e1 - e0) / 1000
+    duration_ms = end_ms - start_ms
+    size = pk['bytes'].to_numpy()
+    with np.errstate(divide='ignore', invalid='ignore'):
+        avg_power = np.where(duration_ms > 0, energy_mJ * 1000 / duration_ms, np.nan)
+        per_byte = np.where(size > 0, energy_mJ * 1000 / size, np.nan)
+
+    packets = pd.DataFrame({
+        'packet': pk['packet'].to_numpy(),
+        'bytes': size,
+        'start_ms': start_ms,
+        'end_ms': end_ms,
+        'latency_ms': (end_us - start_us) / 1000,
+        'samples': k1 - k0,     # logger samples that fall inside the packet
+        'energy_mJ': energy_mJ,
+        'avg_power_mW': avg_power,
+        'energy_per_byte_uJ': per_byte,
+    }, columns=PACKET_COLUMNS)
+    return packets, fit
+
+
+def attribute_file(csv_file, events_path):
+    """attribute() for a logger CSV (through the trace cache) and an event log file."""
+    cols = load_trace_arrays(csv_file)
+    return attribute(cols['timestamp_ms'], cols['power_mW'], cols['marker'], load_events(events_path))
+
+
+def summarize(packets, percentiles=PERCENTILES):
+    """Count, mean and percentiles of the per-packet distributions, one row per quantity."""
+    rows = []
+    for name in ('energy_mJ', 'latency_ms', 'avg_power_mW', 'energy_per_byte_uJ'):
+        v = packets[name].to_numpy(np.float64)
+        v = v[np.isfinite(v)]
+        row = {'quantity': name, 'packets': len(v), 'mean': v.mean() if len(v) else np.nan}
+        for q, x in zip(percentiles, np.percentile(v, percentiles) if len(v) else [np.nan] * len(percentiles)):
+            row[f"p{q:g}"] = x
+        row['max'] = v.max() if len(v) else np.nan
+        rows.append(row)
+    return pd.DataFrame(rows)
+
+
+# --- synthetic event logs, for --check and --bench ---
+
+def synthetic_events(timestamp_ms, marker, packets, payload_bytes=512, duty=0.6,
+                     drift_ppm=SYNTH_DRIFT_PPM, boot_ms=-3000.0, seed=0):
+    """(event log, true logger-time start/end arrays) for `packets` packets in the marker-high windows.
+
+    Each window gets packets in proportion to its length. A packet starts
+    early in its slot and lasts 50-100% of duty x slot. True marker edges
+    lie uniformly between the two samples around each logger edge. The DUT
+    clock starts boot_ms after the logger's and runs drift_ppm slow.
+    """
+    rng = np.random.default_rng(seed)
+    t = np.asarray(timestamp_ms, dtype=np.float64)
+    idx = marker_edges(marker)
+    edges = t[idx - 1] + rng.random(len(idx)) * (t[idx] - t[idx - 1])
+    rising = np.asarray(marker)[idx] == 1
+    # marker-high windows: each rise up to the next edge (or the end of the trace)
+    w0 = edges[rising]
+    w1 = np.append(edges, t[-1])[np.flatnonzero(rising) + 1]
+    lengths = w1 - w0
+    counts = np.diff(np.floor(packets * np.concatenate(([0], np.cumsum(lengths))) / lengths.sum())).astype(np.int64)
+
+    win = np.repeat(np.arange(len(w0)), counts)
+    j = np.arange(len(win)) - np.repeat(np.cumsum(counts) - counts, counts)
+    slot = lengths[win] / counts[win]
+    start = w0[win] + slot * (j + rng.uniform(0.02, 0.2, len(win)))
+    end = start + slot * duty * rng.uniform(0.5, 1.0, len(win))
+
+    def to_dut(ms):
+        return np.rint((ms - boot_ms) * 1000 * (1 - drift_ppm * 1e-6)).astype(np.int64)
+
+    n = len(win)
+    events = pd.DataFrame({
+        'dut_us': np.concatenate((to_dut(edges), to_dut(start), to_dut(end))),
+        'event': pd.Categorical(np.concatenate((np.where(rising, 'marker_on', 'marker_off'),
+                                                np.repeat(['start', 'end'], n)))),
+        'packet': np.concatenate((np.full(len(edges), -1), np.arange(n), np.arange(n))),
+        'bytes': np.concatenate((np.zeros(len(edges), dtype=np.int64), np.full(2 * n, payload_bytes))),
+    })
+    events = events.sort_values('dut_us', kind='stable').reset_index(drop=True)
+    return events, start, end
+
+
+def reference_energy(t, p, start_ms, end_ms):
+    """Per-packet energy (mJ) with a Python loop and np.trapezoid, for --check."""
+    out = np.empty(len(start_ms))
+    for i, (a, b) in enumerate(zip(start_ms, end_ms)):
+        inside = (t > a) & (t < b)
+        x = np.concatenate(([a], t[inside], [b]))
+        out[i] = np.trapezoid(np.interp(x, t, p), x) / 1000
+    return out
+
+
+def check_one(label, t, p, marker, events, true_start, ref_packets=None, seed=0, rtol=1e-8):
+    """Compare one attribution with the loop reference and the true packet times; True if ok."""
+    t0 = time.perf_counter()
+    packets, fit = attribute(t, p, marker, events)
+    elapsed = time.perf_counter() - t0
+
+    pick = np.arange(len(packets))
+    if ref_packets is not None and ref_packets < len(pick):
+        pick = np.sort(np.random.default_rng(seed).choice(pick, ref_packets, replace=False))
+    got = packets['energy_mJ'].to_numpy()[pick]
+    ref = reference_energy(t, p, packets['start_ms'].to_numpy()[pick], packets['end_ms'].to_numpy()[pick])
+    err = float(np.max(np.abs(got - ref) / np.maximum(np.abs(ref), 1e-12), initial=0.0))
+
+    # alignment can't beat the logger's edge resolution, plus drift when only the offset is fitted
+    dt = float(np.median(np.diff(t)))
+    span = t[-1] - t[0]
+    tol = dt / 2 + (0 if fit['edges'] >= MIN_FIT_EDGES else SYNTH_DRIFT_PPM * 1e-6 * span) + 1e-3
+    shift = float(np.max(np.abs(packets['start_ms'].to_numpy() - true_start[packets['packet'].to_numpy()])))
+
+    ok = err <= rtol and shift <= tol and len(packets) == len(true_start)
+    print(f"{label:<22} {len(packets):>9,} packets  {fit['edges']:>5} edges  drift {fit['drift_ppm']:>7.1f} ppm  "
+          f"time err {shift:6.2f} ms (tol {tol:5.2f})  energy rel err {err:.1e}  {elapsed:.3f}s  "
+          f"{'ok' if ok else 'FAIL'}")
+    return ok
+
+
+def check(data_dir=DATA_DIR, seed=0):
+    """Synthetic event logs on every test plus one long synthetic trace; returns the number of failures."""
+    from synth_trace import generate
+
+    bad = 0
+    for i, (payload_size, mode, csv_file) in enumerate(iter_test_files(data_dir)):
+        cols = load_trace_arrays(csv_file)
+        t = np.asarray(cols['timestamp_ms'], dtype=np.float64)
+        p = np.asarray(cols['power_mW'], dtype=np.float64)
+        events, start, _ = synthetic_events(t, cols['marker'], ITERATIONS, payload_size, seed=seed + i)
+        bad += not check_one(f"{mode} {payload_size}B", t, p, cols['marker'], events, start)
+
+    # many test cycles -> many edges, so the drift is fitted too
+    chunks = list(generate(2_000_000, 'WiFi', seed=seed))
+    t = np.concatenate([c['timestamp_ms'] for c in chunks]).astype(np.float64)
+    p = np.concatenate([c['power_mW'] for c in chunks])
+    marker = np.concatenate([c['marker'] for c in chunks])
+    events, start, _ = synthetic_events(t, marker, 500_000, seed=seed)
+    bad += not check_one("synthetic 2M samples", t, p, marker, events, start, ref_packets=2000, seed=seed)
+    return bad
+
+
+def bench(counts, seed=0):
+    """Parse and join time for synthetic event logs of each packet count."""
+    import tempfile
+
+    from synth_trace import generate
+
+    print(f"{'packets':>10} {'samples':>11} {'parse s':>8} {'join s':>7} {'packets/s':>11}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for n in counts:
+            samples = max(1_000_000, 3 * n)
+            t, p, marker = [], [], []
+            for c in generate(samples, 'WiFi', interval_ms=1, seed=seed):
+                t.append(c['timestamp_ms'].astype(np.float64))
+                p.append(c['power_mW'])
+                marker.append(c['marker'])
+            t, p, marker = np.concatenate(t), np.concatenate(p), np.concatenate(marker)
+            events, _, _ = synthetic_events(t, marker, n, seed=seed)
+            path = Path(tmp) / f"events_{n}.csv"
+            events.to_csv(path, index=False)
+            del events
+
+            t0 = time.perf_counter()
+            events = load_events(path)
+            t1 = time.perf_counter()
+            packets, _ = attribute(t, p, marker, events)
+            t2 = time.perf_counter()
+            print(f"{len(packets):>10,} {samples:>11,} {t1 - t0:>8.2f} {t2 - t1:>7.2f} {len(packets) / (t2 - t0):>11,.0f}")
+
+
+def print_attribution(packets, fit):
+    print(f"Aligned on {fit['edges']} marker edge(s): offset {fit['offset_ms']:.1f} ms, "
+          f"drift {fit['drift_ppm']:.1f} ppm, max edge residual {fit['residual_ms']:.2f} ms")
+    missing = int(packets['energy_mJ'].isna().sum())
+    if missing:
+        print(f"{missing} packet(s) fall outside the trace")
+    print(f"\n{len(packets)} packets, {packets['energy_mJ'].sum():.1f} mJ attributed\n")
+    print(summarize(packets).to_string(index=False, float_format=lambda x: f"{x:.3f}"))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('csv', nargs='?', help="logger CSV")
+    parser.add_argument('events', nargs='?', help="DUT event log: serial capture with [EVT] lines, or CSV")
+    parser.add_argument('--out', type=Path, help="write the per-packet table here")
+    parser.add_argument('--check', action='store_true',
+                        help="synthetic event logs on every test, checked against a per-packet loop")
+    parser.add_argument('--bench', metavar='PACKETS', help="join time for synthetic logs, e.g. 100k,1M")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    if args.check:
+        sys.exit(1 if check(DATA_DIR, args.seed) else 0)
+    if args.bench:
+        from synth_trace import parse_count
+        bench([parse_count(s) for s in args.bench.split(',')], args.seed)
+        return
+    if not (args.csv and args.events):
+        parser.error("give a logger CSV and an event log, or --check / --bench")
+
+    packets, fit = attribute_file(args.csv, args.events)
+    print_attribution(packets, fit)
+    if args.out:
+        packets.to_csv(args.out, index=False)
+        print(f"\nSaved: {args.out}")
+    print_cache_stats()
+
+
+if __name__ == "__main__":
+    main()
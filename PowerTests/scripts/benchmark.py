@@ -0,0 +1,400 @@
+#!/usr/bin/env python3
+"""Benchmark the analysis pipeline on synthetic traces from thousands to millions of samples.
+
+For each requested size, synth_trace.py writes a Data/<size> Bytes/<mode>.csv
+tree (one trace per mode) under .bench/. The tree is reused on later runs.
+Each pipeline stage then runs in its own forked process, so its wall time
+and peak RSS are measured in isolation:
+
+  ingest_cold          CSV parse + trace cache build
+  ingest_warm          memory-mapped cache load
+  segment              segments.segment_all()
+  energy               trapezoidal energy per trace
+  chunked              chunked.chunked_table() (out of core, straight from the CSVs)
+  metrics              metrics.metrics_table()
+  analyze_data         analyze_data.py: table, summary, crossover, plot
+  analyze_full_energy  analyze_full_energy.py: table, analysis, plot
+  plot_batch           plot_power.py --batch (LTTB, template figure)
+  plot_full            plot_power.py full-resolution plot (first trace,
+                       skipped above FULL_PLOT_LIMIT samples)
+
+`startup` times the xifi.py text commands (and --help) as fresh
+processes on the real Data/ tree, best of --repeat after one warm-up run.
+Interpreter start, imports, the trace cache load and the analysis are all
+included. Each command must stay under its STARTUP_BUDGET_S entry and must
+not import matplotlib; otherwise the exit status is 1.
+
+Results go to a JSON file tagged with the git commit. `compare` lines up
+two such files and flags the stages that got slower.
+
+    python benchmark.py run --samples 10k,1M,10M
+    python benchmark.py run --samples 100M --stages ingest_cold,ingest_warm,energy
+    python benchmark.py startup --repeat 5
+    python benchmark.py compare .bench/results/abc1234.json .bench/results/def5678.json
+"""
+
+import argparse
+import contextlib
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+from paths import BASE_DIR
+
+BENCH_DIR = Path(os.environ.get("XIFI_BENCH_DIR", BASE_DIR / ".bench"))
+# Keep benchmark cache entries and catalog rows out of the real ones
+os.environ.setdefault("XIFI_TRACE_CACHE", str(BENCH_DIR / "trace_cache"))
+os.environ.setdefault("XIFI_CATALOG", str(BENCH_DIR / "catalog.sqlite"))
+
+import numpy as np  # noqa: E402
+import pandas as pd  # noqa: E402
+
+import trace_cache  # noqa: E402
+from synth_trace import PROFILES, parse_count, write_tree  # noqa: E402
+
+DATA_VERSION = 1          # bump when synth_trace output changes
+FULL_PLOT_LIMIT = 2_000_000
+
+SCRIPTS_DIR = Path(__file__).parent
+# xifi.py arguments -> cold-start wall time budget (s). Measured on one
+# shared core: --help 0.07 s, text commands 0.5-0.8 s (pandas import
+# plus a warm trace cache). The old per-analysis scripts take ~3 s.
+STARTUP_BUDGET_S = {
+    ('--help',): 0.3,
+    ('summary', '--no-save'): 1.5,
+    ('crossover',): 1.5,
+    ('full-energy', '--no-save'): 1.5,
+    ('hybrid',): 1.5,
+}
+
+
+# --- stages: each takes the bench context dict ---
+
+def stage_ingest_cold(ctx):
+    trace_cache.clear_cache()
+    for path in ctx['paths']:
+        float(trace_cache.load_trace_arrays(path)['power_mW'].sum())
+
+
+def stage_ingest_warm(ctx):
+    for path in ctx['paths']:
+        float(trace_cache.load_trace_arrays(path)['power_mW'].sum())
+
+
+def stage_segment(ctx):
+    from segments import segment_all
+    segment_all(ctx['data_dir'])
+
+
+def stage_energy(ctx):
+    from segments import trace_energy_mJ
+    for path in ctx['paths']:
+        cols = trace_cache.load_trace_arrays(path)
+        trace_energy_mJ(cols['timestamp_ms'], cols['power_mW'])
+
+
+def stage_chunked(ctx):
+    from chunked import chunked_table
+    chunked_table(ctx['data_dir'])
+
+
+def stage_metrics(ctx):
+    from metrics import metrics_table
+    metrics_table(1, ctx['data_dir'])
+
+
+def stage_analyze_data(ctx):
+    import analyze_data
+    from metrics import metrics_table
+    df = analyze_data.transfer_view(metrics_table(1, ctx['data_dir']))
+    analyze_data.print_summary(df)
+    analyze_data.find_crossover(df)
+    analyze_data.plot_comparison(df, ctx['out_dir'])
+
+
+def stage_analyze_full_energy(ctx):
+    import analyze_full_energy
+    from metrics import metrics_table
+    df = analyze_full_energy.full_energy_view(metrics_table(1, ctx['data_dir']))
+    analyze_full_energy.print_analysis(df)
+    analyze_full_energy.analyze_hybrid_scenario(df)
+    analyze_full_energy.plot_full_analysis(df, ctx['out_dir'])
+
+
+def stage_plot_batch(ctx):
+    from plot_power import render_batch
+    render_batch(ctx['paths'], ctx['out_dir'], force=True)
+
+
+def stage_plot_full(ctx):
+    import matplotlib.pyplot as plt
+    from plot_power import plot_single_test
+    plot_single_test(ctx['paths'][0])
+    plt.savefig(ctx['out_dir'] / 'full_resolution.png', dpi=150)
+    plt.close('all')
+
+
+STAGES = {
+    'ingest_cold': stage_ingest_cold,
+    'ingest_warm': stage_ingest_warm,
+    'segment': stage_segment,
+    'energy': stage_energy,
+    'chunked': stage_chunked,
+    'metrics': stage_metrics,
+    'analyze_data': stage_analyze_data,
+    'analyze_full_energy': stage_analyze_full_energy,
+    'plot_batch': stage_plot_batch,
+    'plot_full': stage_plot_full,
+}
+
+
+# --- measurement ---
+
+def _maxrss_mb():
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / (1 << 20) if sys.platform == 'darwin' else rss / 1024
+
+
+def _stage_child(conn, name, ctx):
+    try:
+        base = _maxrss_mb()
+        with open(os.devnull, 'w') as null, contextlib.redirect_stdout(null):
+            t0 = time.perf_counter()
+            STAGES[name](ctx)
+            seconds = time.perf_counter() - t0
+        peak = _maxrss_mb()
+        conn.send({'seconds': seconds, 'peak_rss_mb': peak, 'delta_rss_mb': peak - base})
+    except Exception as e:
+        conn.send({'error': f"{type(e).__name__}: {e}"})
+    finally:
+        conn.close()
+
+
+def measure(name, ctx):
+    """Run one stage in a forked child; returns {'seconds', 'peak_rss_mb', 'delta_rss_mb'} or {'error'}."""
+    mp = multiprocessing.get_context('fork')
+    parent, child = mp.Pipe(duplex=False)
+    proc = mp.Process(target=_stage_child, args=(child, name, ctx))
+    proc.start()
+    child.close()
+    try:
+        result = parent.recv()
+    except EOFError:
+        result = {'error': 'stage process died'}
+    proc.join()
+    if proc.exitcode:
+        result.setdefault('error', f"exit code {proc.exitcode}")
+    return result
+
+
+def prepare_data(samples, seed=0):
+    """Synthetic Data/ tree for `samples` rows per trace, generated once and reused."""
+    root = BENCH_DIR / f"data_{samples}"
+    stamp = root / "complete.json"
+    meta = {'samples': samples, 'seed': seed, 'version': DATA_VERSION}
+    data_dir = root / "Data"
+    if not (stamp.exists() and json.loads(stamp.read_text()) == meta):
+        t0 = time.perf_counter()
+        print(f"  generating {len(PROFILES)} x {samples:,} samples ...", end=" ", flush=True)
+        write_tree(data_dir, samples, seed=seed)
+        stamp.write_text(json.dumps(meta))
+        print(f"{time.perf_counter() - t0:.1f}s")
+    paths = sorted(data_dir.glob("*/*.csv"))
+    out_dir = root / "out"
+    out_dir.mkdir(exist_ok=True)
+    return {'data_dir': data_dir, 'paths': paths, 'out_dir': out_dir,
+            'bytes': sum(p.stat().st_size for p in paths)}
+
+
+def git_info():
+    def git(*args):
+        try:
+            return subprocess.run(['git', *args], cwd=BASE_DIR, capture_output=True,
+                                  text=True, check=True).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
+    status = git('status', '--porcelain', '--untracked-files=no')
+    return {'commit': git('rev-parse', '--short', 'HEAD'),
+            'dirty': bool(status) if status is not None else None}
+
+
+def new_report():
+    return {
+        **git_info(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'pandas': pd.__version__,
+        'machine': platform.machine(),
+        'cpus': os.cpu_count(),
+        'runs': [],
+    }
+
+
+def run(sizes, stages, repeat=1, seed=0):
+    report = new_report()
+    for samples in sizes:
+        print(f"\n{samples:,} samples per trace")
+        ctx = prepare_data(samples, seed)
+        total = samples * len(ctx['paths'])
+        for name in stages:
+            if name == 'plot_full' and samples > FULL_PLOT_LIMIT:
+                print(f"  {name:<20} skipped (> {FULL_PLOT_LIMIT:,} samples)")
+                continue
+            results = [measure(name, ctx) for _ in range(repeat)]
+            failed = [r for r in results if 'error' in r]
+            if failed:
+                print(f"  {name:<20} ERROR {failed[0]['error']}")
+                report['runs'].append({'stage': name, 'samples': samples, 'error': failed[0]['error']})
+                continue
+            best = min(results, key=lambda r: r['seconds'])
+            entry = {
+                'stage': name,
+                'samples': samples,
+                'traces': len(ctx['paths']),
+                'csv_mb': round(ctx['bytes'] / 1e6, 2),
+                'seconds': round(best['seconds'], 4),
+                'samples_per_s': round(total / best['seconds']) if best['seconds'] > 0 else None,
+                'peak_rss_mb': round(max(r['peak_rss_mb'] for r in results), 1),
+                'delta_rss_mb': round(max(r['delta_rss_mb'] for r in results), 1),
+                'repeat': repeat,
+            }
+            report['runs'].append(entry)
+            print(f"  {name:<20} {entry['seconds']:>9.3f}s  {entry['samples_per_s'] or 0:>12,}/s  "
+                  f"peak {entry['peak_rss_mb']:>8.1f} MB (+{entry['delta_rss_mb']:.1f})")
+    return report
+
+
+def time_command(argv):
+    """Run `python xifi.py argv` once; returns (wall seconds, exit status)."""
+    t0 = time.perf_counter()
+    status = subprocess.call([sys.executable, str(SCRIPTS_DIR / 'xifi.py'), *argv],
+                             stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    return time.perf_counter() - t0, status
+
+
+def imported_modules(argv):
+    """Top-level packages `python -X importtime xifi.py argv` imports."""
+    proc = subprocess.run([sys.executable, '-X', 'importtime', str(SCRIPTS_DIR / 'xifi.py'), *argv],
+                          stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+    return {line.rsplit('|', 1)[1].strip().split('.')[0]
+            for line in proc.stderr.splitlines() if line.startswith('import time:') and '|' in line}
+
+
+def startup(repeat=5):
+    """Cold-start report for every STARTUP_BUDGET_S command; returns (report, failures)."""
+    report = new_report()
+    failures = []
+    # No RSS here: a child spawned from this (pandas-sized) process reports
+    # the parent's high-water mark as its own.
+    print(f"{'command':<24} {'best s':>8} {'budget':>8}  matplotlib")
+    for argv, budget in STARTUP_BUDGET_S.items():
+        time_command(argv)      # warm-up: page cache, trace cache, .pyc files
+        results = [time_command(argv) for _ in range(repeat)]
+        label = ' '.join(argv)
+        stage = f"startup_{argv[0].lstrip('-')}"
+        if any(status for _, status in results):
+            print(f"{label:<24} ERROR exit status {results[0][1]}")
+            report['runs'].append({'stage': stage, 'samples': 0, 'error': 'non-zero exit'})
+            failures.append(label)
+            continue
+        seconds = min(r[0] for r in results)
+        heavy = 'matplotlib' in imported_modules(argv)
+        report['runs'].append({
+            'stage': stage,
+            'samples': 0,
+            'seconds': round(seconds, 4),
+            'peak_rss_mb': None,
+            'budget_s': budget,
+            'imports_matplotlib': heavy,
+            'repeat': repeat,
+        })
+        over = seconds > budget
+        if over or heavy:
+            failures.append(label)
+        print(f"{label:<24} {seconds:>8.3f} {budget:>8.2f}  {'yes' if heavy else 'no':<10}"
+              f"{'  <-- over budget' if over else ''}")
+    return report, failures
+
+
+def compare(old_path, new_path, threshold=1.10):
+    """Print time/memory ratios new/old per (stage, samples); returns the regressed keys."""
+    old = json.loads(Path(old_path).read_text())
+    new = json.loads(Path(new_path).read_text())
+    index = {(r['stage'], r['samples']): r for r in old['runs'] if 'error' not in r}
+    print(f"{old.get('commit')} -> {new.get('commit')}\n")
+    print(f"{'stage':<20} {'samples':>12} {'old s':>9} {'new s':>9} {'time':>7} {'rss':>7}")
+    regressed = []
+    for r in new['runs']:
+        key = (r['stage'], r['samples'])
+        if 'error' in r or key not in index:
+            continue
+        o = index[key]
+        t_ratio = r['seconds'] / o['seconds'] if o['seconds'] else float('nan')
+        m_ratio = r['peak_rss_mb'] / o['peak_rss_mb'] if o['peak_rss_mb'] else float('nan')
+        flag = ""
+        if t_ratio > threshold or m_ratio > threshold:
+            flag = "  <-- regression"
+            regressed.append(key)
+        print(f"{r['stage']:<20} {r['samples']:>12,} {o['seconds']:>9.3f} {r['seconds']:>9.3f} "
+              f"{t_ratio:>6.2f}x {m_ratio:>6.2f}x{flag}")
+    return regressed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    sub = parser.add_subparsers(dest='cmd', required=True)
+
+    p = sub.add_parser('run', help="run the benchmark suite")
+    p.add_argument('--samples', default='10k,100k,1M',
+                   help="comma list of samples per trace, e.g. 10k,1M,100M")
+    p.add_argument('--stages', default='all', help=f"comma list from: {', '.join(STAGES)}")
+    p.add_argument('--repeat', type=int, default=1, help="runs per stage (best time is kept)")
+    p.add_argument('--seed', type=int, default=0)
+    p.add_argument('-o', '--out', help="JSON output (default .bench/results/<commit>.json)")
+
+    p = sub.add_parser('startup', help="cold-start times of the xifi.py text commands")
+    p.add_argument('--repeat', type=int, default=5, help="runs per command (best time is kept)")
+    p.add_argument('-o', '--out', help="JSON output (default .bench/results/<commit>-startup.json)")
+
+    p = sub.add_parser('compare', help="compare two result files")
+    p.add_argument('old')
+    p.add_argument('new')
+    p.add_argument('--threshold', type=float, default=1.10, help="ratio that counts as a regression")
+    args = parser.parse_args()
+
+    if args.cmd == 'compare':
+        regressed = compare(args.old, args.new, args.threshold)
+        sys.exit(1 if regressed else 0)
+
+    if args.cmd == 'startup':
+        report, failures = startup(args.repeat)
+        out = (Path(args.out) if args.out else
+               BENCH_DIR / "results" / f"{report['commit'] or 'nogit'}-startup.json")
+        out.parent.mkdir(parents=True, exist_ok=True)
+        out.write_text(json.dumps(report, indent=2))
+        print(f"\nSaved: {out}")
+        sys.exit(1 if failures else 0)
+
+    stages = list(STAGES) if args.stages == 'all' else args.stages.split(',')
+    unknown = [s for s in stages if s not in STAGES]
+    if unknown:
+        parser.error(f"unknown stage(s): {', '.join(unknown)}")
+    sizes = [parse_count(s) for s in args.samples.split(',')]
+
+    report = run(sizes, stages, args.repeat, args.seed)
+    out = Path(args.out) if args.out else BENCH_DIR / "results" / f"{report['commit'] or 'nogit'}.json"
+    out.parent.mkdir(parents=True, exist_ok=True)
+    out.write_text(json.dumps(report, indent=2))
+    print(f"\nSaved: {out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,270 @@
+#!/usr/bin/env python3
+"""Packed binary sample dumps from Logger_ESP (`dump` command).
+
+The `csv` command printf's every sample as ~27 ASCII characters; `dump`
+writes the buffer as fixed 17-byte little-endian records instead, which
+the host maps straight onto a numpy structured array with no parsing:
+
+  \\n>>> DUMP START <<<\\r\\n
+  header   16 B  magic "XIFB", version u8, record size u8, reserved u16,
+                 sample count u32, sample interval ms u32
+  records  count x 17 B  timestamp_ms u32, voltage_V f32, current_mA f32,
+                         power_mW f32, marker u8
+  crc32     4 B  zlib CRC-32 of header + records
+  \\n>>> DUMP END <<<\\r\\n
+
+Timestamps are relative to `start`, exactly as in the CSV output, and the
+floats are the raw INA219 readings (the CSV rounds them).
+
+    python binary_dump.py serial /dev/ttyUSB0 "Data/512 Bytes/WiFi.csv" --raw wifi.bin
+    python binary_dump.py convert wifi.bin "Data/512 Bytes/WiFi.csv"
+    python binary_dump.py selftest
+"""
+
+import argparse
+import struct
+import sys
+import zlib
+
+import numpy as np
+
+from logger_format import CSV_FORMAT, CSV_HEADER
+
+DUMP_START = b">>> DUMP START <<<"
+DUMP_END = b">>> DUMP END <<<"
+MAGIC = b"XIFB"
+VERSION = 1
+
+HEADER = struct.Struct("<4sBBHII")
+CRC = struct.Struct("<I")
+RECORD_DTYPE = np.dtype([
+    ('timestamp_ms', '<u4'),
+    ('voltage_V', '<f4'),
+    ('current_mA', '<f4'),
+    ('power_mW', '<f4'),
+    ('marker', 'u1'),
+])  # packed: itemsize 17, matches the firmware's DumpRecord
+
+
+class DumpError(ValueError):
+    """Malformed, truncated or corrupted dump."""
+
+
+def encode_dump(records, interval_ms=0):
+    """Build a dump payload (header + records + CRC) from a RECORD_DTYPE array or column dict."""
+    if not isinstance(records, np.ndarray) or records.dtype != RECORD_DTYPE:
+        cols = records
+        records = np.zeros(len(cols['timestamp_ms']), dtype=RECORD_DTYPE)
+        for name in RECORD_DTYPE.names:
+            records[name] = cols[name]
+    body = HEADER.pack(MAGIC, VERSION, RECORD_DTYPE.itemsize, 0, len(records), interval_ms)
+    body += records.tobytes()
+    return body + CRC.pack(zlib.crc32(body))
+
+
+def frame_dump(payload):
+    """Wrap a payload in the START/END marker lines, as the firmware sends it."""
+    return b"\n" + DUMP_START + b"\r\n" + payload + b"\n" + DUMP_END + b"\r\n"
+
+
+def decode_dump(data, offset=0):
+    """Decode the payload at data[offset:]; returns (header dict, records).
+
+    `records` is a read-only numpy view over `data` (no copy); keep `data`
+    alive, or call records.copy(), if it must outlive the buffer.
+    """
+    view = memoryview(data)
+    if len(view) - offset < HEADER.size:
+        raise DumpError(f"truncated header: {len(view) - offset} of {HEADER.size} bytes")
+    magic, version, record_size, _, count, interval_ms = HEADER.unpack_from(view, offset)
+    if magic != MAGIC:
+        raise DumpError(f"bad magic {magic!r}")
+    if version != VERSION:
+        raise DumpError(f"unsupported dump version {version}")
+    if record_size != RECORD_DTYPE.itemsize:
+        raise DumpError(f"record size {record_size}, expected {RECORD_DTYPE.itemsize}")
+
+    body_end = offset + HEADER.size + count * record_size
+    if len(view) < body_end + CRC.size:
+        raise DumpError(f"truncated dump: header says {count} samples, "
+                        f"got {len(view) - offset} of {body_end + CRC.size - offset} bytes")
+    (crc,) = CRC.unpack_from(view, body_end)
+    if zlib.crc32(view[offset:body_end]) != crc:
+        raise DumpError("CRC mismatch")
+
+    records = np.frombuffer(view, dtype=RECORD_DTYPE, count=count, offset=offset + HEADER.size)
+    header = {'version': version, 'count': count, 'interval_ms': interval_ms,
+              'size': body_end + CRC.size - offset}
+    return header, records
+
+
+def find_dump(data):
+    """Locate and decode a dump inside raw serial output (bytes or bytearray).
+
+    Text before the start marker and after the CRC is ignored.
+    """
+    start = data.find(DUMP_START)
+    if start < 0:
+        raise DumpError("no dump start marker")
+    nl = data.find(b"\n", start)
+    if nl < 0:
+        raise DumpError("truncated start marker")
+    return decode_dump(data, nl + 1)
+
+
+def to_columns(records):
+    """{column: array} in the Logger CSV schema (each column is a strided view)."""
+    return {name: records[name] for name in RECORD_DTYPE.names}
+
+
+def to_frame(records):
+    """DataFrame with the Logger CSV columns, as analyze_full_energy() reads them."""
+    import pandas as pd
+    return pd.DataFrame({name: records[name] for name in RECORD_DTYPE.names})
+
+
+def write_csv(records, path):
+    """Write records in the Logger CSV format (same rounding as the firmware's printf)."""
+    table = np.column_stack([records[name].astype(np.float64) for name in RECORD_DTYPE.names])
+    with open(path, 'w') as fh:
+        fh.write(CSV_HEADER + "\n")
+        np.savetxt(fh, table, fmt=CSV_FORMAT, delimiter=',')
+
+
+def read_serial_dump(port, baud=115200, timeout=30):
+    """Send `dump` to the Logger and return the raw payload (header + records + CRC)."""
+    import serial
+
+    with serial.Serial(port, baud, timeout=timeout) as ser:
+        ser.reset_input_buffer()
+        ser.write(b"dump\n")
+        while True:
+            line = ser.readline()
+            if not line:
+                raise DumpError("timed out waiting for dump start marker")
+            if line.strip() == DUMP_START:
+                break
+        header = ser.read(HEADER.size)
+        if len(header) < HEADER.size:
+            raise DumpError("timed out reading dump header")
+        _, _, record_size, _, count, _ = HEADER.unpack(header)
+        rest = ser.read(count * record_size + CRC.size)
+        return header + rest
+
+
+# --- self-test on synthetic byte streams ---
+
+def synthetic_records(n, interval_ms=10, seed=0):
+    rng = np.random.default_rng(seed)
+    rec = np.zeros(n, dtype=RECORD_DTYPE)
+    rec['timestamp_ms'] = np.arange(n, dtype=np.uint32) * interval_ms + 1
+    rec['marker'] = (np.arange(n) // 50) % 2
+    rec['current_mA'] = np.where(rec['marker'], 68.0, 41.0) + rng.normal(0, 2.0, n)
+    rec['voltage_V'] = 3.33 - rec['current_mA'] * 0.0005
+    rec['power_mW'] = rec['voltage_V'] * rec['current_mA']
+    return rec
+
+
+def selftest():
+    """Round-trip and corruption checks; raises AssertionError on failure.
+
+    Uses check() rather than `assert` so the checks still run under python -O.
+    """
+    import tempfile
+    from pathlib import Path
+
+    from trace_cache import load_trace
+
+    def check(ok, what):
+        if not ok:
+            raise AssertionError(what)
+
+    rec = synthetic_records(6000)
+    payload = encode_dump(rec, interval_ms=10)
+    check(len(payload) == HEADER.size + 6000 * 17 + CRC.size, "encoded size")
+
+    header, out = decode_dump(payload)
+    check(header['count'] == 6000 and header['interval_ms'] == 10, "header fields")
+    check(np.array_equal(out, rec), "round trip")
+    check(not out.flags.owndata and not out.flags.writeable, "decoded records are a read-only view over the payload")
+
+    # framed in serial chatter, from a bytearray
+    stream = bytearray(b"[5999] 41.20mA 137.20mW marker=0\r\n" + frame_dump(payload) + b"Interval: 10ms\r\n")
+    _, out = find_dump(stream)
+    check(np.array_equal(out, rec), "dump framed in serial output")
+
+    # empty dump
+    check(len(decode_dump(encode_dump(rec[:0]))[1]) == 0, "empty dump")
+
+    def rejects(data, why):
+        try:
+            decode_dump(data)
+        except DumpError as e:
+            check(why in str(e), f"expected {why!r}, got {e}")
+        else:
+            raise AssertionError(f"accepted a dump with {why}")
+
+    rejects(payload[:-1], "truncated dump")
+    rejects(payload[:10], "truncated header")
+    flipped = bytearray(payload)
+    flipped[HEADER.size + 1234] ^= 0x01
+    rejects(flipped, "CRC mismatch")
+    rejects(b"XXXX" + payload[4:], "bad magic")
+    rejects(payload[:5] + b"\x10" + payload[6:], "record size")
+
+    # CSV conversion matches what the firmware's `csv` command would print
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "WiFi.csv"
+        write_csv(out, path)
+        df = load_trace(path, cache_dir=Path(tmp) / "cache")
+        check(list(df.columns) == CSV_HEADER.split(','), "CSV header")
+        check(len(df) == 6000, "CSV row count")
+        check(np.array_equal(df['timestamp_ms'].to_numpy(), rec['timestamp_ms']), "CSV timestamps")
+        check(np.array_equal(df['marker'].to_numpy(), rec['marker']), "CSV markers")
+        check(np.allclose(df['power_mW'].to_numpy(), rec['power_mW'], atol=0.006), "CSV power within rounding")
+
+    print("binary_dump selftest: OK")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    sub = parser.add_subparsers(dest='cmd', required=True)
+
+    p = sub.add_parser('convert', help="convert a saved dump (raw payload or serial log) to CSV")
+    p.add_argument('dump')
+    p.add_argument('csv')
+
+    p = sub.add_parser('serial', help="request a dump over serial and save it as CSV")
+    p.add_argument('port')
+    p.add_argument('csv')
+    p.add_argument('--baud', type=int, default=115200)
+    p.add_argument('--raw', help="also save the raw payload here")
+
+    sub.add_parser('selftest', help="round-trip and corruption checks on synthetic data")
+    args = parser.parse_args()
+
+    if args.cmd == 'selftest':
+        selftest()
+        return
+
+    try:
+        if args.cmd == 'serial':
+            data = read_serial_dump(args.port, args.baud)
+            if args.raw:
+                with open(args.raw, 'wb') as fh:
+                    fh.write(data)
+            header, records = decode_dump(data)
+        else:
+            with open(args.dump, 'rb') as fh:
+                data = fh.read()
+            header, records = decode_dump(data) if data.startswith(MAGIC) else find_dump(data)
+    except DumpError as e:
+        sys.exit(f"error: {e}")
+
+    write_csv(records, args.csv)
+    print(f"{header['count']} samples ({header['size']} bytes, interval {header['interval_ms']} ms) "
+          f"-> {args.csv}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,309 @@
+#!/usr/bin/env python3
+"""Block-bootstrap confidence intervals for the energy metrics and crossover points.
+
+full_energy_results.csv has one number per (mode, size), but each test is
+100 transfers. This script splits every test's transfer phase into
+per-iteration units and resamples them with a circular block bootstrap
+(blocks of consecutive iterations keep slow drift such as battery sag or
+radio retries together). Each resample's transfer energy
+and duration come from block sums precomputed with one cumsum, so all
+resamples of a test are a single fancy-indexing + sum over a
+(resamples x blocks) index matrix. There is no Python loop over resamples.
+
+Units are the transfer segments when the marker toggles per iteration.
+With the current firmware the marker stays high for all 100 iterations, so
+the transfer samples are split into 100 equal runs instead. Those runs
+have the same length by construction, so throughput (which depends on
+the transfer duration alone) gets no interval for such tests. The
+init/teardown overhead is a single observation per test; it is kept
+fixed, and the intervals only cover iteration-to-iteration variation.
+
+Every metric gets a percentile interval (total/transfer energy, energy
+per byte, transfer power, throughput, overhead %). For each protocol pair
+the energy crossover is located in every resample by interpolating in
+log2(size) at the first sign change, and the probability that one mode
+beats the other is reported per size. Pairs whose curves cross more than
+once are flagged with every crossing of the point estimate and the share
+of resamples that cross more than once.
+
+    python bootstrap.py                      # 10k resamples, 95% intervals
+    python bootstrap.py --resamples 2000 --level 90 --block 10
+    python bootstrap.py --data-dir /mnt/run2/Data --results-dir /tmp/ci
+"""
+
+import argparse
+import time
+from collections import Counter
+from itertools import combinations
+
+import numpy as np
+import pandas as pd
+
+from ingest import iter_test_files
+from metrics import ITERATIONS
+from paths import DATA_DIR, add_path_args, add_run_args, run_filters
+from trace_cache import load_trace_arrays, print_cache_stats
+
+RESAMPLES = 10_000
+MODES = ['BLE_ADV', 'BLE_CONN', 'WiFi']
+METRICS = ['total_energy_mJ', 'transfer_energy_mJ', 'energy_per_byte_uJ',
+           'transfer_avg_power_mW', 'throughput_kbps', 'overhead_pct']
+# metrics that depend on the transfer duration alone: equal sample splits
+# fix it to within a sample, so their resampled spread is rounding, not data
+DURATION_METRICS = ['throughput_kbps']
+
+
+def iteration_units(timestamp_ms, power_mW, marker, iterations=ITERATIONS):
+    """Per-iteration (energy_mJ, samples) arrays for the transfer phase, the median dt, and
+    whether the units are equal sample splits rather than marker segments.
+
+    Energy is sum(power x median dt) like metrics.py, so the units add up
+    to its transfer_energy_mJ exactly.
+    """
+    t = np.asarray(timestamp_ms)
+    p = np.asarray(power_mW, dtype=np.float64)
+    dt = float(np.median(np.diff(t))) if len(t) > 1 else 0.0
+    idx = np.flatnonzero(np.asarray(marker) == 1)
+    if len(idx) == 0:
+        return np.empty(0), np.empty(0, dtype=np.int64), dt, False
+
+    # transfer segments, or equal runs when the marker never drops in between
+    starts = np.concatenate(([0], np.flatnonzero(np.diff(idx) > 1) + 1))
+    split = len(starts) < 2
+    if split:
+        starts = np.unique(np.linspace(0, len(idx), min(iterations, len(idx)), endpoint=False).astype(np.intp))
+    energy = np.add.reduceat(p[idx], starts) * dt / 1000
+    samples = np.diff(np.append(starts, len(idx)))
+    return energy, samples, dt, split
+
+
+def block_length(n):
+    """Default block length: about n^(1/3) iterations."""
+    return max(1, int(round(n ** (1 / 3))))
+
+
+def block_bootstrap_sums(values, rng, resamples=RESAMPLES, block=None):
+    """Block bootstrap sums of each column of `values` (n x k), as a (resamples x k) array.
+
+    Every resample is ceil(n / block) blocks of consecutive rows starting at
+    random offsets, with the last block cut so each resample has exactly n
+    rows. Blocks wrap around the end (circular block bootstrap), so the
+    first and last iterations are drawn as often as the rest and the
+    resampled sums are centred on the observed sum.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    if values.ndim == 1:
+        values = values[:, None]
+    n = len(values)
+    block = min(block or block_length(n), n)
+    nblocks = -(-n // block)
+    tail = n - (nblocks - 1) * block       # rows in the last, possibly short, block
+
+    wrapped = np.vstack([values, values[:block - 1]])
+    cum = np.vstack([np.zeros((1, values.shape[1])), np.cumsum(wrapped, axis=0)])
+    full = cum[block:block + n] - cum[:n]  # sum of rows s .. s+block-1 (mod n) for every start s
+    short = cum[tail:tail + n] - cum[:n]
+    starts = rng.integers(0, n, size=(resamples, nblocks))
+    sums = full[starts[:, :-1]].sum(axis=1)
+    sums += short[starts[:, -1]]
+    return sums
+
+
+def run_distributions(payload_size, mode, csv_file, rng, resamples=RESAMPLES, block=None):
+    """Point estimates and bootstrap draws of every metric for one test."""
+    cols = load_trace_arrays(csv_file)
+    energy, samples, dt, split = iteration_units(cols['timestamp_ms'], cols['power_mW'], cols['marker'])
+    marker = np.asarray(cols['marker'])
+    overhead_mJ = float(np.asarray(cols['power_mW'], dtype=np.float64)[marker == 0].sum()) * dt / 1000
+
+    draws = block_bootstrap_sums(np.column_stack([energy, samples]), rng, resamples, block)
+    point = np.array([[energy.sum(), samples.sum()]])
+    total_bytes = payload_size * ITERATIONS
+
+    def derive(transfer_mJ, transfer_samples):
+        total = overhead_mJ + transfer_mJ
+        duration_s = transfer_samples * dt / 1000
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return {
+                'total_energy_mJ': total,
+                'transfer_energy_mJ': transfer_mJ,
+                'energy_per_byte_uJ': total * 1000 / total_bytes,
+                'transfer_avg_power_mW': transfer_mJ / duration_s,
+                'throughput_kbps': total_bytes * 8 / duration_s / 1000,
+                'overhead_pct': overhead_mJ / total * 100,
+            }
+
+    return {
+        'mode': mode,
+        'payload_bytes': payload_size,
+        'iterations': len(energy),
+        'split': split,
+        'point': {k: float(v[0]) for k, v in derive(point[:, 0], point[:, 1]).items()},
+        'draws': derive(draws[:, 0], draws[:, 1]),
+    }
+
+
+def interval(draws, level):
+    alpha = (100 - level) / 2
+    return np.nanpercentile(draws, [alpha, 100 - alpha], axis=0)
+
+
+def metric_table(tests, level):
+    """One row per test: each metric with its _lo/_hi interval (run counts repeats of a mode and size).
+
+    Tests resampled from equal sample splits get NaN intervals for DURATION_METRICS.
+    """
+    rows = []
+    runs = Counter()
+    for t in tests:
+        key = (t['mode'], t['payload_bytes'])
+        runs[key] += 1
+        row = {'mode': t['mode'], 'payload_bytes': t['payload_bytes'], 'run': runs[key],
+               'iterations': t['iterations'], 'units': 'splits' if t['split'] else 'segments'}
+        for name in METRICS:
+            if t['split'] and name in DURATION_METRICS:
+                lo = hi = np.nan
+            else:
+                lo, hi = interval(t['draws'][name], level)
+            row[name] = t['point'][name]
+            row[f"{name}_lo"] = lo
+            row[f"{name}_hi"] = hi
+        rows.append(row)
+    return pd.DataFrame(rows)
+
+
+def crossings(sizes, energy_a, energy_b):
+    """Every crossover per row of (rows x sizes) energies: (rows x sizes - 1).
+
+    Column i is the sign change of a - b between sizes i and i + 1,
+    interpolated linearly in log2(size), or NaN where the sign holds.
+    """
+    d = np.asarray(energy_a) - np.asarray(energy_b)
+    x = np.log2(np.asarray(sizes, dtype=np.float64))
+    d0, d1 = d[:, :-1], d[:, 1:]
+    change = np.signbit(d1) != np.signbit(d0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        frac = np.where(change & (d1 != d0), d0 / (d0 - d1), 0.0)
+    return np.where(change, 2 ** (x[:-1] + frac * np.diff(x)), np.nan)
+
+
+def crossovers(sizes, energy_a, energy_b):
+    """(first crossover, number of crossings) per row; the first is NaN if there are none."""
+    every = crossings(sizes, energy_a, energy_b)
+    found = ~np.isnan(every)
+    count = found.sum(axis=1)
+    if every.shape[1] == 0:
+        return np.full(len(every), np.nan), count
+    first = every[np.arange(len(every)), found.argmax(axis=1)]
+    return np.where(count > 0, first, np.nan), count
+
+
+def crossover_table(tests, level):
+    """Per protocol pair: crossover point with its interval, and P(a cheaper) per size.
+
+    Repeated runs of a (mode, size) are averaged. Their resamples are
+    independent, so the per-resample mean is a bootstrap draw of that mean.
+    """
+    by_key = {}
+    for t in tests:
+        by_key.setdefault((t['mode'], t['payload_bytes']), []).append(t)
+    sizes = sorted({t['payload_bytes'] for t in tests})
+    modes = [m for m in MODES if all((m, s) in by_key for s in sizes)]
+
+    def energy(mode, part):
+        return np.column_stack([np.mean([t[part]['total_energy_mJ'] for t in by_key[(mode, s)]], axis=0)
+                                for s in sizes])
+
+    rows = []
+    for a, b in combinations(modes, 2):
+        point_a, point_b = energy(a, 'point'), energy(b, 'point')
+        draws_a, draws_b = energy(a, 'draws'), energy(b, 'draws')
+
+        cross, count = crossovers(sizes, draws_a, draws_b)
+        found = count > 0
+        lo, hi = interval(cross[found], level) if found.any() else (np.nan, np.nan)
+        every = crossings(sizes, point_a, point_b)[0]
+        every = every[~np.isnan(every)]
+        row = {
+            'mode_a': a,
+            'mode_b': b,
+            'crossover_bytes': every[0] if len(every) else np.nan,
+            'crossover_lo': lo,
+            'crossover_hi': hi,
+            'p_crossover': found.mean(),
+            # the interval is for the first crossing only; these say whether it is the only one
+            'crossings': len(every),
+            'crossings_bytes': ";".join(f"{c:.1f}" for c in every),
+            'p_multiple': (count > 1).mean(),
+        }
+        for j, s in enumerate(sizes):
+            row[f"p_a_cheaper_{s}"] = (draws_a[:, j] < draws_b[:, j]).mean()
+        rows.append(row)
+    return pd.DataFrame(rows)
+
+
+def bootstrap_all(data_dir=DATA_DIR, resamples=RESAMPLES, level=95, block=None, seed=0, **filters):
+    """(metric table, crossover table) for every test under data_dir; filters select catalog runs."""
+    rng = np.random.default_rng(seed)
+    tests = [run_distributions(size, mode, path, rng, resamples, block)
+             for size, mode, path in iter_test_files(data_dir, **filters)]
+    return metric_table(tests, level), crossover_table(tests, level)
+
+
+def print_intervals(metrics_df, cross_df, level):
+    print(f"\n### {level:g}% INTERVALS (total energy, energy per byte) ###\n")
+    print(f"{'Mode':<10} {'Size':>6} {'Total (mJ)':>28} {'uJ/byte':>30}")
+    for _, r in metrics_df.iterrows():
+        print(f"{r['mode']:<10} {r['payload_bytes']:>6} "
+              f"{r['total_energy_mJ']:>9.1f} [{r['total_energy_mJ_lo']:>7.1f}, {r['total_energy_mJ_hi']:>7.1f}] "
+              f"{r['energy_per_byte_uJ']:>10.2f} [{r['energy_per_byte_uJ_lo']:>7.2f}, {r['energy_per_byte_uJ_hi']:>7.2f}]")
+
+    print(f"\n### CROSSOVERS (total energy, {level:g}% intervals) ###\n")
+    size_cols = [c for c in cross_df.columns if c.startswith('p_a_cheaper_')]
+    for _, r in cross_df.iterrows():
+        pair = f"{r['mode_a']} vs {r['mode_b']}"
+        if np.isnan(r['crossover_bytes']):
+            print(f"{pair:<22} no crossover in measured sizes "
+                  f"(crossover in {r['p_crossover'] * 100:.1f}% of resamples)")
+        else:
+            print(f"{pair:<22} {r['crossover_bytes']:.1f} B [{r['crossover_lo']:.1f}, {r['crossover_hi']:.1f}] "
+                  f"(crossover in {r['p_crossover'] * 100:.1f}% of resamples)")
+        if r['crossings'] > 1:
+            print(f"{'':<22} first of {r['crossings']} crossings: {r['crossings_bytes'].replace(';', ', ')} B "
+                  f"(more than one in {r['p_multiple'] * 100:.1f}% of resamples)")
+        probs = ", ".join(f"{c.rsplit('_', 1)[1]}B {r[c]:.2f}" for c in size_cols)
+        print(f"{'':<22} P({r['mode_a']} cheaper): {probs}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--resamples', type=int, default=RESAMPLES)
+    parser.add_argument('--level', type=float, default=95, help="confidence level (%%)")
+    parser.add_argument('--block', type=int, default=None,
+                        help="block length in iterations (default about n^(1/3))")
+    parser.add_argument('--seed', type=int, default=0)
+    add_path_args(parser)
+    add_run_args(parser)
+    args = parser.parse_args()
+
+    t0 = time.perf_counter()
+    metrics_df, cross_df = bootstrap_all(args.data_dir, args.resamples, args.level, args.block, args.seed,
+                                         **run_filters(args))
+    elapsed = time.perf_counter() - t0
+    if len(metrics_df) == 0:
+        print("No data found!")
+        return
+
+    print_intervals(metrics_df, cross_df, args.level)
+    print(f"\n{len(metrics_df)} tests x {args.resamples:,} resamples in {elapsed:.3f}s")
+
+    for df, name in ((metrics_df, 'bootstrap_ci.csv'), (cross_df, 'crossover_ci.csv')):
+        output_file = args.results_dir / name
+        output_file.parent.mkdir(parents=True, exist_ok=True)
+        df.to_csv(output_file, index=False)
+        print(f"Saved: {output_file}")
+    print_cache_stats()
+
+
+if __name__ == "__main__":
+    main()
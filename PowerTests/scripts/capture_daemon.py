@@ -0,0 +1,417 @@
+#!/usr/bin/env python3
+"""Continuous host-side capture of Logger_ESP samples.
+
+The Logger only buffers BUFFER_SIZE (6000) samples on the device. This
+daemon puts it in `stream` mode instead and pulls every sample off the
+serial port as it is taken, so a capture is limited only by disk space:
+
+  serial reader --> SampleRing (fixed size, numpy columns) --> ChunkWriter
+                                                               (rotating CSVs)
+
+Gaps in the device timestamps are counted as dropped samples, intervals
+longer than expected as late samples, and ring overruns (the writer fell
+behind) separately, so a capture reports exactly how much data it lost.
+Chunk files use the Logger CSV schema and work with every analysis script.
+
+    python capture_daemon.py /dev/ttyUSB0 --interval 10 --out ../Data/capture
+    python fake_logger.py --interval 5     # pty stand-in for testing
+    python capture_daemon.py --check       # end-to-end run against fake_logger.py
+"""
+
+import argparse
+import asyncio
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+
+from logger_format import CSV_FORMAT, CSV_HEADER, STREAM_END
+from paths import BASE_DIR
+from stream_energy import StreamingEnergy
+from trace_cache import COLUMNS
+
+
+class SampleRing:
+    """Fixed-capacity ring of logger samples stored as numpy columns.
+
+    If the consumer falls more than `capacity` samples behind, the oldest
+    unread samples are overwritten and counted in `overrun`.
+    """
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.cols = {name: np.zeros(capacity, dtype) for name, dtype in COLUMNS.items()}
+        self.head = 0      # total samples written
+        self.tail = 0      # total samples consumed
+        self.overrun = 0
+
+    def __len__(self):
+        return self.head - self.tail
+
+    def extend(self, rows):
+        """Append {column: array} (all the same length)."""
+        n = len(rows['timestamp_ms'])
+        if n == 0:
+            return
+        skip = max(0, n - self.capacity)
+        idx = (self.head + skip + np.arange(n - skip)) % self.capacity
+        for name, col in self.cols.items():
+            col[idx] = rows[name][skip:]
+        self.head += n
+        if self.head - self.tail > self.capacity:
+            self.overrun += self.head - self.tail - self.capacity
+            self.tail = self.head - self.capacity
+
+    def latest(self, n=None):
+        """Copies of the newest n samples (all buffered ones by default), oldest first.
+
+        Unlike drain() this doesn't consume anything, so a ring nobody drains
+        works as a fixed-size rolling window.
+        """
+        n = min(self.head, self.capacity) if n is None else min(n, self.head, self.capacity)
+        idx = (self.head - n + np.arange(n)) % self.capacity
+        return {name: col[idx] for name, col in self.cols.items()}
+
+    def drain(self):
+        """Remove and return all unread samples as contiguous copies."""
+        n = len(self)
+        idx = (self.tail + np.arange(n)) % self.capacity
+        self.tail = self.head
+        return {name: col[idx] for name, col in self.cols.items()}
+
+
+class ChunkWriter:
+    """Write samples to rotating Logger-format CSV files."""
+
+    def __init__(self, out_dir, prefix=None, chunk_samples=100_000):
+        self.out_dir = Path(out_dir)
+        self.out_dir.mkdir(parents=True, exist_ok=True)
+        self.prefix = prefix or datetime.now().strftime("capture_%Y%m%d-%H%M%S")
+        self.chunk_samples = chunk_samples
+        self.files = []
+        self.samples = 0
+        self._fh = None
+        self._in_chunk = 0
+
+    def _open_next(self):
+        self.close()
+        path = self.out_dir / f"{self.prefix}_{len(self.files) + 1:04d}.csv"
+        self._fh = open(path, 'w')
+        self._fh.write(CSV_HEADER + "\n")
+        self.files.append(path)
+        self._in_chunk = 0
+
+    def write(self, rows):
+        n = len(rows['timestamp_ms'])
+        table = np.column_stack([rows[name].astype(np.float64) for name in COLUMNS])
+        pos = 0
+        while pos < n:
+            if self._fh is None or self._in_chunk >= self.chunk_samples:
+                self._open_next()
+            take = min(n - pos, self.chunk_samples - self._in_chunk)
+            np.savetxt(self._fh, table[pos:pos + take], fmt=CSV_FORMAT, delimiter=',')
+            self._in_chunk += take
+            pos += take
+        if self._fh:
+            self._fh.flush()
+        self.samples += n
+
+    def close(self):
+        if self._fh:
+            self._fh.close()
+            self._fh = None
+
+
+class GapStats:
+    """Dropped/late sample accounting from device timestamps and host arrival."""
+
+    def __init__(self, interval_ms, tolerance=0.5):
+        self.interval_ms = interval_ms
+        self.tolerance = tolerance
+        self.samples = 0
+        self.dropped = 0       # estimated samples missing from the stream
+        self.late = 0          # intervals longer than interval * (1 + tolerance)
+        self.resets = 0        # timestamp went backwards (device restarted streaming)
+        self.max_lag_ms = 0.0  # host arrival behind device clock, beyond the best seen
+        self._last_ts = None
+        self._min_offset = None
+
+    def update(self, timestamps, host_ms):
+        ts = np.asarray(timestamps, dtype=np.int64)
+        if len(ts) == 0:
+            return
+        prev = ts[0] if self._last_ts is None else self._last_ts
+        dt = np.diff(np.concatenate(([prev], ts)))
+        if self._last_ts is None:
+            dt = dt[1:]
+        self._last_ts = int(ts[-1])
+        self.samples += len(ts)
+
+        self.resets += int(np.count_nonzero(dt < 0))
+        fwd = dt[dt >= 0]
+        self.late += int(np.count_nonzero(fwd > self.interval_ms * (1 + self.tolerance)))
+        self.dropped += int(np.maximum(np.rint(fwd / self.interval_ms) - 1, 0).sum())
+
+        # The whole chunk arrived at host_ms; the newest sample bounds the lag
+        offset = host_ms - float(ts[-1])
+        if self._min_offset is None or offset < self._min_offset:
+            self._min_offset = offset
+        self.max_lag_ms = max(self.max_lag_ms, offset - self._min_offset)
+
+    def as_dict(self):
+        return {
+            'samples': self.samples,
+            'dropped': self.dropped,
+            'late': self.late,
+            'resets': self.resets,
+            'max_lag_ms': round(self.max_lag_ms, 1),
+        }
+
+
+def parse_lines(lines):
+    """Parse Logger CSV lines into {column: array}; returns (rows, bad_count, ended)."""
+    ts, volt, cur, pwr, mark = [], [], [], [], []
+    bad = 0
+    ended = False
+    for line in lines:
+        line = line.strip()
+        if not line or not line[0].isdigit():
+            if line == STREAM_END:
+                ended = True
+            continue
+        parts = line.split(',')
+        if len(parts) != 5:
+            bad += 1
+            continue
+        try:
+            t, v, c, p, m = int(parts[0]), float(parts[1]), float(parts[2]), float(parts[3]), int(parts[4])
+        except ValueError:
+            bad += 1
+            continue
+        ts.append(t)
+        volt.append(v)
+        cur.append(c)
+        pwr.append(p)
+        mark.append(m)
+    rows = {
+        'timestamp_ms': np.array(ts, dtype=COLUMNS['timestamp_ms']),
+        'voltage_V': np.array(volt, dtype=COLUMNS['voltage_V']),
+        'current_mA': np.array(cur, dtype=COLUMNS['current_mA']),
+        'power_mW': np.array(pwr, dtype=COLUMNS['power_mW']),
+        'marker': np.array(mark, dtype=COLUMNS['marker']),
+    }
+    return rows, bad, ended
+
+
+class CaptureDaemon:
+    """Stream samples from the Logger into rotating chunk files."""
+
+    def __init__(self, port, baud=115200, out_dir=BASE_DIR / "Data" / "capture",
+                 interval_ms=50, ring_size=1 << 16, chunk_samples=100_000,
+                 flush_every_s=1.0, report_every_s=10.0, send_commands=True):
+        self.port = port
+        self.baud = baud
+        self.interval_ms = interval_ms
+        self.flush_every_s = flush_every_s
+        self.report_every_s = report_every_s
+        self.send_commands = send_commands
+
+        self.ring = SampleRing(ring_size)
+        self.writer = ChunkWriter(out_dir, chunk_samples=chunk_samples)
+        self.gaps = GapStats(interval_ms)
+        self.energy = StreamingEnergy()
+        self.bad_lines = 0
+        self._stop = asyncio.Event()
+        self._t0 = None
+        # one writer thread: a flush abandoned by cancellation still finishes
+        # before the next write or close() starts
+        self._io = None
+
+    async def _open(self):
+        import serial_asyncio
+        return await serial_asyncio.open_serial_connection(url=self.port, baudrate=self.baud)
+
+    async def _read_loop(self, reader):
+        partial = b""
+        while not self._stop.is_set():
+            chunk = await reader.read(65536)
+            if not chunk:
+                break
+            host_ms = (time.monotonic() - self._t0) * 1000
+            *lines, partial = (partial + chunk).split(b"\n")
+            rows, bad, ended = parse_lines(line.decode(errors='replace') for line in lines)
+            self.bad_lines += bad
+            if len(rows['timestamp_ms']):
+                self.gaps.update(rows['timestamp_ms'], host_ms)
+                self.ring.extend(rows)
+                for t, c, p, m in zip(rows['timestamp_ms'].tolist(), rows['current_mA'].tolist(),
+                                      rows['power_mW'].tolist(), rows['marker'].tolist()):
+                    self.energy.add_sample(t, c, p, m)
+            if ended:
+                break
+        self._stop.set()
+
+    async def _flush(self):
+        if len(self.ring):
+            block = self.ring.drain()
+            await asyncio.get_running_loop().run_in_executor(self._io, self.writer.write, block)
+
+    async def _flush_loop(self):
+        while not self._stop.is_set():
+            try:
+                await asyncio.wait_for(self._stop.wait(), self.flush_every_s)
+            except asyncio.TimeoutError:
+                pass
+            await self._flush()
+
+    async def _report_loop(self):
+        while not self._stop.is_set():
+            try:
+                await asyncio.wait_for(self._stop.wait(), self.report_every_s)
+            except asyncio.TimeoutError:
+                self.print_report()
+
+    def stats(self):
+        elapsed = time.monotonic() - self._t0 if self._t0 else 0
+        out = self.gaps.as_dict()
+        out.update({
+            'elapsed_s': round(elapsed, 2),
+            'rate_hz': round(self.gaps.samples / elapsed, 1) if elapsed > 0 else 0,
+            'written': self.writer.samples,
+            'overrun': self.ring.overrun,
+            'bad_lines': self.bad_lines,
+            'files': len(self.writer.files),
+        })
+        return out
+
+    def print_report(self):
+        s = self.stats()
+        r = self.energy.result() if self.energy.samples > 1 else None
+        energy = f", {r['total_energy_mJ']:.1f} mJ" if r else ""
+        print(f"[capture] {s['samples']} samples @ {s['rate_hz']} Hz{energy}; "
+              f"dropped {s['dropped']}, late {s['late']}, overrun {s['overrun']}, "
+              f"lag {s['max_lag_ms']} ms, {s['files']} file(s)", flush=True)
+
+    def stop(self):
+        self._stop.set()
+
+    async def run(self, duration_s=None):
+        reader, writer = await self._open()
+        self._io = ThreadPoolExecutor(max_workers=1, thread_name_prefix='capture-writer')
+        self._t0 = time.monotonic()
+        if self.send_commands:
+            writer.write(f"interval {self.interval_ms}\nstream\n".encode())
+            await writer.drain()
+
+        tasks = [asyncio.create_task(self._read_loop(reader)),
+                 asyncio.create_task(self._flush_loop()),
+                 asyncio.create_task(self._report_loop())]
+        try:
+            if duration_s:
+                try:
+                    await asyncio.wait_for(self._stop.wait(), duration_s)
+                except asyncio.TimeoutError:
+                    pass
+            else:
+                await self._stop.wait()
+        finally:
+            self._stop.set()
+            if self.send_commands:
+                writer.write(b"stop\n")
+            for t in tasks:
+                t.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            await self._flush()
+            await asyncio.get_running_loop().run_in_executor(self._io, self.writer.close)
+            self._io.shutdown()
+            writer.close()
+        return self.stats()
+
+
+async def check(seconds=2.0, interval_ms=5, drop_prob=0.02, seed=1):
+    """Capture from a fake_logger.py pty that is already logging; returns a list of problems.
+
+    The fake drops samples at random and counts the ones a receiver can
+    see (between two delivered samples). The daemon must report exactly
+    those, write every sample it received, and the device's buffered
+    session must keep its own clock across the `stream` command.
+    """
+    from fake_logger import FakeLogger
+
+    fake = FakeLogger(interval_ms, drop_prob, seed=seed)
+    fake.start()
+    problems = []
+    try:
+        fake.handle_command("start")
+        await asyncio.sleep(0.2)
+        with tempfile.TemporaryDirectory() as out:
+            daemon = CaptureDaemon(fake.path, out_dir=out, interval_ms=interval_ms,
+                                   chunk_samples=100, flush_every_s=0.2, report_every_s=3600)
+            task = asyncio.create_task(daemon.run())
+            await asyncio.sleep(seconds)
+            fake.handle_command("stop")          # ends the stream: the daemon reads to STREAM END
+            stats = await asyncio.wait_for(task, 5)
+            rows = sum(len(path.read_text().splitlines()) - 1 for path in daemon.writer.files)
+    finally:
+        fake.close()
+
+    if stats['samples'] != fake.sent:
+        problems.append(f"received {stats['samples']} of {fake.sent} samples sent")
+    if stats['dropped'] != fake.gap_drops:
+        problems.append(f"reported {stats['dropped']} dropped, fake dropped {fake.gap_drops} between samples")
+    if rows != stats['samples'] or stats['written'] != stats['samples']:
+        problems.append(f"{rows} rows in {stats['files']} file(s) for {stats['samples']} samples")
+    for key in ('resets', 'overrun', 'bad_lines'):
+        if stats[key]:
+            problems.append(f"{key} = {stats[key]}")
+    ts = [s[0] for s in fake.buffer]
+    if not ts or ts[0] < 0 or any(b <= a for a, b in zip(ts, ts[1:])):
+        problems.append("buffered session timestamps are not increasing from 0")
+    elif ts[-1] < (seconds + 0.2) * 1000 * 0.9:
+        problems.append(f"buffered session spans {ts[-1]} ms; the stream reset its clock")
+    print(f"capture check: {stats['samples']} samples in {stats['files']} file(s), "
+          f"{stats['dropped']} dropped (fake: {fake.dropped}, {fake.gap_drops} detectable), "
+          f"{len(ts)} buffered: {'OK' if not problems else '; '.join(problems)}")
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('port', nargs='?', help="Logger serial port (or a fake_logger.py pty)")
+    parser.add_argument('--baud', type=int, default=115200)
+    parser.add_argument('--interval', type=int, default=50, help="sample interval to request (ms)")
+    parser.add_argument('--out', default=str(BASE_DIR / "Data" / "capture"), help="chunk file directory")
+    parser.add_argument('--chunk', type=int, default=100_000, help="samples per chunk file")
+    parser.add_argument('--ring', type=int, default=1 << 16, help="ring buffer capacity (samples)")
+    parser.add_argument('--seconds', type=float, default=0, help="stop after N seconds (0 = until Ctrl-C)")
+    parser.add_argument('--report', type=float, default=10.0, help="status report period (s)")
+    parser.add_argument('--no-commands', action='store_true',
+                        help="don't send 'interval'/'stream'/'stop' (port is already streaming)")
+    parser.add_argument('--check', action='store_true', help="run against fake_logger.py and verify the counts")
+    args = parser.parse_args()
+
+    if args.check:
+        raise SystemExit(1 if asyncio.run(check()) else 0)
+    if not args.port:
+        parser.error("a port is required")
+
+    daemon = CaptureDaemon(args.port, args.baud, args.out, args.interval, args.ring,
+                           args.chunk, report_every_s=args.report,
+                           send_commands=not args.no_commands)
+    try:
+        stats = asyncio.run(daemon.run(args.seconds or None))
+    except KeyboardInterrupt:
+        stats = daemon.stats()
+
+    print("\n=== CAPTURE SUMMARY ===")
+    for key, value in stats.items():
+        print(f"{key:<12} {value}")
+    for path in daemon.writer.files:
+        print(f"Saved: {path}")
+
+
+if __name__ == "__main__":
+    main()
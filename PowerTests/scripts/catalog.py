@@ -0,0 +1,434 @@
+#!/usr/bin/env python3
+"""SQLite catalog of every trace under a data directory.
+
+The analysis scripts used to find tests by parsing directory and file names
+on every run. That allowed only one run per (size, mode), and
+`1024 Bytes/ BLE_ADV.csv` worked only because the stray space happened to
+be stripped. The catalog indexes each CSV once: payload size, mode,
+campaign, device, firmware, date, repetition, sample count, file hash and
+a few per-run totals. Later syncs only stat files and re-read the ones
+whose size or mtime changed (and whose hash then differs). Analyses select
+runs with a query and aggregate over the stored totals with SQL, so
+grouping thousands of runs never touches a trace.
+
+Layout understood under the data directory (campaign levels are optional):
+
+    Data/<size> Bytes/<mode>.csv
+    Data/<campaign>/<size> Bytes/<mode>_r<N>.csv      # repetition N
+    Data/<campaign>/<size> Bytes/rep<N>/<mode>.csv
+
+Device, firmware, date, campaign and repetition can also come from JSON
+sidecars. `<file>.csv.json` applies to one trace, and `run.json` or
+`campaign.json` to a directory and everything below it (the nearest one
+wins). Without a date, the file's mtime is used.
+
+    python catalog.py sync                       # index Data/ (incremental)
+    python catalog.py list --mode WiFi --size 512
+    python catalog.py agg --by mode,payload_bytes
+    python catalog.py bench --runs 20000         # aggregation timing on a synthetic catalog
+"""
+
+import argparse
+import datetime
+import json
+import os
+import re
+import sqlite3
+import tempfile
+import time
+from collections import Counter
+from pathlib import Path
+
+import numpy as np
+
+from paths import BASE_DIR, DATA_DIR
+from stream_energy import hist_median
+from trace_cache import file_hash, read_chunks
+
+CATALOG_PATH = Path(os.environ.get("XIFI_CATALOG", BASE_DIR / ".catalog.sqlite"))
+
+SCHEMA_VERSION = 1
+MODES = ('BLE_ADV', 'BLE_CONN', 'WiFi')
+
+SIZE_DIR = re.compile(r"^\s*(\d+)\s*bytes?\s*$", re.IGNORECASE)
+REP_DIR = re.compile(r"^(?:rep|run|r)[\s_-]*(\d+)$", re.IGNORECASE)
+REP_SUFFIX = re.compile(r"[\s_-]+(?:rep|run|r)?(\d+)$", re.IGNORECASE)
+SIDECARS = ('run.json', 'campaign.json')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY,
+    path TEXT UNIQUE NOT NULL,          -- absolute
+    root TEXT NOT NULL,                 -- data directory it was synced from
+    campaign TEXT NOT NULL DEFAULT '',
+    payload_bytes INTEGER NOT NULL,
+    mode TEXT NOT NULL,
+    repetition INTEGER NOT NULL DEFAULT 1,
+    device TEXT,
+    firmware TEXT,
+    run_date TEXT,
+    samples INTEGER,
+    duration_ms REAL,
+    energy_mJ REAL,
+    transfer_samples INTEGER,
+    transfer_energy_mJ REAL,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    sha1 TEXT NOT NULL,
+    indexed_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS runs_root ON runs (root, payload_bytes, mode);
+CREATE INDEX IF NOT EXISTS runs_key ON runs (payload_bytes, mode);
+CREATE INDEX IF NOT EXISTS runs_campaign ON runs (campaign, mode, payload_bytes);
+"""
+
+# columns select()/aggregate() accept as filters
+FILTERS = ('campaign', 'payload_bytes', 'mode', 'repetition', 'device', 'firmware', 'run_date')
+# per-run totals aggregate() summarizes
+VALUES = ('samples', 'duration_ms', 'energy_mJ', 'transfer_samples', 'transfer_energy_mJ')
+
+
+def parse_mode(stem):
+    """(mode, repetition or None) from a file stem like ' BLE_ADV' or 'WiFi_r3'."""
+    name = stem.strip().replace(" ", "")
+    rep = None
+    for known in MODES:
+        if name.lower() == known.lower():
+            return known, None
+    m = REP_SUFFIX.search(name)
+    if m:
+        rep = int(m.group(1))
+        name = name[:m.start()]
+    for known in MODES:
+        if name.lower() == known.lower():
+            return known, rep
+    return name, rep
+
+
+def parse_path(rel):
+    """Layout metadata for a CSV path relative to the data directory, or None if it isn't a test."""
+    parts = rel.parts
+    size_at = next((i for i in range(len(parts) - 2, -1, -1) if SIZE_DIR.match(parts[i])), None)
+    if size_at is None:
+        return None
+    mode, rep = parse_mode(Path(parts[-1]).stem)
+    for part in parts[size_at + 1:-1]:
+        m = REP_DIR.match(part.strip())
+        if m:
+            rep = int(m.group(1))
+    return {
+        'campaign': "/".join(parts[:size_at]),
+        'payload_bytes': int(SIZE_DIR.match(parts[size_at]).group(1)),
+        'mode': mode,
+        'repetition': rep or 1,
+    }
+
+
+def _sidecar_meta(csv_path, root):
+    """Merge sidecar JSON from the data root down to the file (nearest wins)."""
+    meta = {}
+    dirs = [csv_path.parent, *csv_path.parent.parents]
+    dirs = dirs[:dirs.index(root) + 1] if root in dirs else dirs[:1]
+    for d in reversed(dirs):
+        for name in SIDECARS:
+            meta.update(_read_json(d / name))
+    meta.update(_read_json(csv_path.with_name(csv_path.name + ".json")))
+    return meta
+
+
+def _read_json(path):
+    try:
+        with open(path) as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    return data if isinstance(data, dict) else {}
+
+
+def trace_totals(csv_path):
+    """Per-run totals stored in the catalog (energies as sum(power x median dt), like metrics.py).
+
+    Read in chunks with running sums and a sample-interval histogram for the
+    exact median dt, so indexing a multi-GB trace takes one chunk of memory
+    and leaves no trace-cache entry behind.
+    """
+    samples = transfer_samples = 0
+    power_sum = transfer_power_sum = 0.0
+    dt_hist = Counter()
+    first = last = None
+    for chunk in read_chunks(csv_path):
+        t = chunk['timestamp_ms']
+        if len(t) == 0:
+            continue
+        if first is None:
+            first = int(t[0])
+        else:
+            dt_hist[int(t[0]) - last] += 1
+        values, counts = np.unique(np.diff(t.astype(np.int64)), return_counts=True)
+        dt_hist.update(dict(zip(values.tolist(), counts.tolist())))
+        last = int(t[-1])
+        p = chunk['power_mW'].astype(np.float64)
+        transfer = chunk['marker'] == 1
+        samples += len(t)
+        transfer_samples += int(np.count_nonzero(transfer))
+        power_sum += float(p.sum())
+        transfer_power_sum += float(p[transfer].sum())
+    if samples == 0:
+        return {'samples': 0, 'duration_ms': 0.0, 'energy_mJ': 0.0,
+                'transfer_samples': 0, 'transfer_energy_mJ': 0.0}
+    dt = float(hist_median(dt_hist)) if samples > 1 else 0.0
+    return {
+        'samples': samples,
+        'duration_ms': float(last - first),
+        'energy_mJ': power_sum * dt / 1000,
+        'transfer_samples': transfer_samples,
+        'transfer_energy_mJ': transfer_power_sum * dt / 1000,
+    }
+
+
+class Catalog:
+    """Run index in a SQLite file.
+
+        cat = Catalog()
+        cat.sync(DATA_DIR)
+        for run in cat.select(mode='WiFi', payload_bytes=512):
+            print(run['path'], run['repetition'], run['energy_mJ'])
+    """
+
+    def __init__(self, path=None):
+        self.path = Path(path or CATALOG_PATH)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.db = sqlite3.connect(self.path)
+        self.db.row_factory = sqlite3.Row
+        version = self.db.execute("PRAGMA user_version").fetchone()[0]
+        if version != SCHEMA_VERSION:
+            self.db.executescript("DROP TABLE IF EXISTS runs;")
+            self.db.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+        self.db.executescript(SCHEMA)
+
+    def close(self):
+        self.db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def sync(self, data_dir=DATA_DIR, verbose=False):
+        """Bring the catalog in line with data_dir; returns {'added', 'updated', 'removed', 'unchanged'}."""
+        root = Path(data_dir).resolve()
+        known = {row['path']: row for row in self.db.execute(
+            "SELECT path, size, mtime_ns, sha1 FROM runs WHERE root = ?", (str(root),))}
+        counts = {'added': 0, 'updated': 0, 'removed': 0, 'unchanged': 0}
+        seen = set()
+
+        with self.db:
+            for csv_path in sorted(root.rglob("*.csv")):
+                layout = parse_path(csv_path.relative_to(root))
+                if layout is None:
+                    continue
+                key = str(csv_path)
+                seen.add(key)
+                st = csv_path.stat()
+                old = known.get(key)
+                if old is not None and old['size'] == st.st_size and old['mtime_ns'] == st.st_mtime_ns:
+                    counts['unchanged'] += 1
+                    continue
+                digest = file_hash(csv_path)
+                if old is not None and old['sha1'] == digest:
+                    # touched or re-copied, same content
+                    self.db.execute("UPDATE runs SET mtime_ns = ?, size = ? WHERE path = ?",
+                                    (st.st_mtime_ns, st.st_size, key))
+                    counts['unchanged'] += 1
+                    continue
+                self._index(csv_path, root, layout, st, digest)
+                counts['updated' if old is not None else 'added'] += 1
+                if verbose:
+                    print(f"  indexed {csv_path.relative_to(root)}")
+
+            gone = [p for p in known if p not in seen]
+            self.db.executemany("DELETE FROM runs WHERE path = ?", [(p,) for p in gone])
+            counts['removed'] = len(gone)
+        return counts
+
+    def _index(self, csv_path, root, layout, st, digest):
+        meta = {**layout, **{k: v for k, v in _sidecar_meta(csv_path, root).items()
+                             if k in ('campaign', 'device', 'firmware', 'date', 'repetition')}}
+        run_date = meta.get('date') or datetime.date.fromtimestamp(st.st_mtime).isoformat()
+        row = {
+            'path': str(csv_path),
+            'root': str(root),
+            'campaign': meta['campaign'],
+            'payload_bytes': meta['payload_bytes'],
+            'mode': meta['mode'],
+            'repetition': int(meta['repetition']),
+            'device': meta.get('device'),
+            'firmware': meta.get('firmware'),
+            'run_date': str(run_date),
+            **trace_totals(csv_path),
+            'size': st.st_size,
+            'mtime_ns': st.st_mtime_ns,
+            'sha1': digest,
+            'indexed_at': datetime.datetime.now().isoformat(timespec='seconds'),
+        }
+        cols = ", ".join(row)
+        marks = ", ".join("?" * len(row))
+        updates = ", ".join(f"{c} = excluded.{c}" for c in row if c != 'path')
+        self.db.execute(f"INSERT INTO runs ({cols}) VALUES ({marks}) "
+                        f"ON CONFLICT(path) DO UPDATE SET {updates}", tuple(row.values()))
+
+    @staticmethod
+    def _where(root=None, where=None, **filters):
+        clauses, params = [], []
+        if root is not None:
+            clauses.append("root = ?")
+            params.append(str(Path(root).resolve()))
+        for col, value in filters.items():
+            if col not in FILTERS:
+                raise ValueError(f"unknown filter {col!r}; use one of {FILTERS}")
+            if value is None:
+                continue
+            if isinstance(value, (list, tuple, set)):
+                clauses.append(f"{col} IN ({', '.join('?' * len(value))})")
+                params.extend(value)
+            else:
+                clauses.append(f"{col} = ?")
+                params.append(value)
+        if where:
+            clauses.append(f"({where})")
+        return (" WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+    def select(self, root=None, where=None, **filters):
+        """Runs matching the filters (values may be lists), ordered by size, mode, path.
+
+        `where` is an extra raw SQL condition, e.g. "run_date >= '2024-11-01'".
+        """
+        sql, params = self._where(root, where, **filters)
+        return self.db.execute(
+            f"SELECT * FROM runs{sql} ORDER BY payload_bytes, mode, path", params).fetchall()
+
+    def aggregate(self, by=('mode', 'payload_bytes'), values=VALUES, root=None, where=None, **filters):
+        """GROUP BY over the stored per-run totals: runs, then mean/min/max of each value."""
+        for col in (*by, *values):
+            if col not in FILTERS + VALUES:
+                raise ValueError(f"unknown column {col!r}")
+        aggs = ", ".join(f"AVG({v}) AS {v}_mean, MIN({v}) AS {v}_min, MAX({v}) AS {v}_max"
+                         for v in values)
+        group = ", ".join(by)
+        sql, params = self._where(root, where, **filters)
+        return self.db.execute(
+            f"SELECT {group}, COUNT(*) AS runs, {aggs} FROM runs{sql} "
+            f"GROUP BY {group} ORDER BY {group}", params).fetchall()
+
+
+def run_rows(data_dir=DATA_DIR, sync=True, **filters):
+    """Catalog rows (as dicts) for the runs under data_dir; filters as for Catalog.select()."""
+    with Catalog() as cat:
+        if sync:
+            cat.sync(data_dir)
+        return [dict(r) for r in cat.select(root=data_dir, **filters)]
+
+
+def run_files(data_dir=DATA_DIR, sync=True, **filters):
+    """[(payload_size, mode, csv_path)] for the runs under data_dir, via the catalog."""
+    return [(r['payload_bytes'], r['mode'], Path(r['path']))
+            for r in run_rows(data_dir, sync, **filters)]
+
+
+def bench(runs, groups=('mode', 'payload_bytes'), repeat=5):
+    """Time select/aggregate over a synthetic catalog of `runs` rows."""
+    with tempfile.TemporaryDirectory() as tmp:
+        cat = Catalog(Path(tmp) / "bench.sqlite")
+        rng = np.random.default_rng(0)
+        sizes = [1, 2, 10, 50, 100, 512, 1024]
+        rows = [(f"/bench/c{i % 20}/{sizes[i % 7]} Bytes/{MODES[i % 3]}_r{i}.csv", "/bench",
+                 f"c{i % 20}", sizes[i % 7], MODES[i % 3], i, f"dev{i % 4}", "v1",
+                 "2024-11-01", 2000, 20000.0, float(e), 500, float(e) / 4, 0, 0, "", "")
+                for i, e in enumerate(rng.normal(3000, 300, runs))]
+        t0 = time.perf_counter()
+        with cat.db:
+            cat.db.executemany(
+                "INSERT INTO runs (path, root, campaign, payload_bytes, mode, repetition, device, "
+                "firmware, run_date, samples, duration_ms, energy_mJ, transfer_samples, "
+                "transfer_energy_mJ, size, mtime_ns, sha1, indexed_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+        t_insert = time.perf_counter() - t0
+
+        def best(func):
+            times = []
+            for _ in range(repeat):
+                t = time.perf_counter()
+                out = func()
+                times.append(time.perf_counter() - t)
+            return min(times), len(out)
+
+        t_agg, n_groups = best(lambda: cat.aggregate(by=groups))
+        t_sel, n_sel = best(lambda: cat.select(mode='WiFi', payload_bytes=512))
+        cat.close()
+    print(f"{runs:,} runs: insert {t_insert * 1000:.1f} ms, "
+          f"aggregate by {','.join(groups)} {t_agg * 1000:.2f} ms ({n_groups} groups), "
+          f"select WiFi/512 {t_sel * 1000:.2f} ms ({n_sel} runs)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--db', help=f"catalog file (default {CATALOG_PATH})")
+    sub = parser.add_subparsers(dest='cmd', required=True)
+
+    p = sub.add_parser('sync', help="index new or changed traces")
+    p.add_argument('data_dir', nargs='?', default=str(DATA_DIR))
+
+    for name in ('list', 'agg'):
+        p = sub.add_parser(name, help="list runs" if name == 'list' else "aggregate per-run totals")
+        p.add_argument('--data-dir', default=str(DATA_DIR))
+        p.add_argument('--mode', action='append', help="repeatable")
+        p.add_argument('--size', type=int, action='append', help="payload bytes, repeatable")
+        p.add_argument('--campaign')
+        p.add_argument('--device')
+        p.add_argument('--firmware')
+        p.add_argument('--where', help="extra SQL condition")
+        p.add_argument('--no-sync', action='store_true', help="query without syncing first")
+        if name == 'agg':
+            p.add_argument('--by', default='mode,payload_bytes', help="comma list of group columns")
+
+    p = sub.add_parser('bench', help="time aggregation over a synthetic catalog")
+    p.add_argument('--runs', type=int, default=20000)
+    args = parser.parse_args()
+
+    if args.cmd == 'bench':
+        bench(args.runs)
+        return
+
+    with Catalog(args.db) as cat:
+        if args.cmd == 'sync':
+            t0 = time.perf_counter()
+            counts = cat.sync(args.data_dir, verbose=True)
+            print(", ".join(f"{v} {k}" for k, v in counts.items()) +
+                  f" in {time.perf_counter() - t0:.2f}s ({cat.path})")
+            return
+
+        if not args.no_sync:
+            cat.sync(args.data_dir)
+        filters = {'mode': args.mode, 'payload_bytes': args.size, 'campaign': args.campaign,
+                   'device': args.device, 'firmware': args.firmware}
+        if args.cmd == 'list':
+            rows = cat.select(root=args.data_dir, where=args.where, **filters)
+            print(f"{'size':>6} {'mode':<9} {'rep':>4} {'campaign':<12} {'date':<10} "
+                  f"{'samples':>8} {'energy mJ':>10}  path")
+            for r in rows:
+                print(f"{r['payload_bytes']:>6} {r['mode']:<9} {r['repetition']:>4} {r['campaign']:<12} "
+                      f"{r['run_date']:<10} {r['samples']:>8} {r['energy_mJ']:>10.1f}  "
+                      f"{os.path.relpath(r['path'], args.data_dir)}")
+            print(f"\n{len(rows)} runs")
+        else:
+            rows = cat.aggregate(by=args.by.split(','), root=args.data_dir, where=args.where, **filters)
+            if rows:
+                keys = rows[0].keys()
+                print("  ".join(keys))
+                for r in rows:
+                    print("  ".join(f"{r[k]:.2f}" if isinstance(r[k], float) else str(r[k]) for k in keys))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,390 @@
+#!/usr/bin/env python3
+"""Out-of-core analysis of logger traces too big to load at once.
+
+metrics.py and segments.py hold a whole trace (plus boolean-mask copies of
+it) in memory. That is fine for the 10 ms bench captures, but not for
+multi-GB logs from long or high-rate runs. Here a trace is read in chunks of
+a fixed number of rows, parsed straight into the cache's narrow dtypes
+(int32 / float32 / uint8). Each chunk is folded into a ChunkedTrace
+accumulator with vectorized numpy, so peak memory is set by the chunk size,
+not the file size.
+
+State carried from one chunk to the next:
+
+  - the last sample (timestamp, power, marker). It closes the sample
+    interval that spans the chunk boundary and tells whether the first
+    rows continue the open segment;
+  - the open segment (marker, start, samples, energy so far);
+  - a histogram of sample intervals, for the exact median dt;
+  - per-phase sample counts and power/current sums, and the first/last
+    timestamps.
+
+Power and current are logged with two decimals, so sums are kept as
+integer hundredths (and trapezoid energies as integer 1/200 uJ). The
+results are therefore bit-identical whatever the chunk size. They match
+metrics.py and segments.py run on the whole CSV to float rounding.
+
+    python chunked.py                           # every test under Data/
+    python chunked.py big_run.csv --rows 250000 --segments
+    python chunked.py --check                   # compare with the in-memory path
+    python chunked.py --rss 1M,4M,16M           # peak RSS vs input size
+"""
+
+import argparse
+import sys
+import time
+from collections import Counter
+
+import numpy as np
+import pandas as pd
+
+from ingest import iter_test_runs
+from metrics import ITERATIONS, columns
+from paths import DATA_DIR
+from segments import SEGMENT_COLUMNS
+from stream_energy import hist_median
+from trace_cache import CHUNK_ROWS, read_chunks
+
+ENERGY_UNITS_PER_UJ = 200   # (p100[k] + p100[k+1]) * dt: mW/100 x ms, doubled by the trapezoid
+RSS_SLACK_MB = 16           # allowed growth of the chunked peak RSS across sizes in --rss
+
+
+def _hundredths(values):
+    return np.rint(values.astype(np.float64) * 100).astype(np.int64)
+
+
+class ChunkedTrace:
+    """Metrics and marker segments of one trace, folded in chunk by chunk."""
+
+    def __init__(self, payload_size=0, mode=None, iterations=ITERATIONS):
+        self.payload_size = payload_size
+        self.mode = mode
+        self.iterations = iterations
+        self.samples = 0
+        self.phase_samples = [0, 0]
+        self.power_sum = [0, 0]      # hundredths of mW
+        self.current_sum = [0, 0]    # hundredths of mA
+        self.dt_hist = Counter()
+        self.t_min = self.t_max = None
+        self.transfer_t_min = self.transfer_t_max = None
+        self._last = None            # (timestamp, power hundredths, marker) of the last sample
+        self._open = None            # [marker, start_idx, samples, start_ms, energy units, start power]
+        self._closed = []            # per-chunk tuples of closed-segment arrays
+
+    def update(self, chunk):
+        """Fold one {column: ndarray} block (see trace_cache.read_chunks) into the totals."""
+        t = chunk['timestamp_ms'].astype(np.int64)
+        m = chunk['marker']
+        if len(t) == 0:
+            return self
+        p = _hundredths(chunk['power_mW'])
+        c = _hundredths(chunk['current_mA'])
+
+        for marker in (0, 1):
+            mask = m == marker
+            count = int(np.count_nonzero(mask))
+            if count:
+                self.phase_samples[marker] += count
+                self.power_sum[marker] += int(p[mask].sum())
+                self.current_sum[marker] += int(c[mask].sum())
+                if marker == 1:
+                    tt = t[mask]
+                    self._extend_range('transfer_t', int(tt.min()), int(tt.max()))
+        self._extend_range('t', int(t.min()), int(t.max()))
+
+        # Prepend the carried sample so the boundary interval is counted once
+        carried = self._last is not None
+        if carried:
+            lt, lp, lm = self._last
+            t = np.concatenate(([lt], t))
+            p = np.concatenate(([lp], p))
+            m = np.concatenate(([lm], m))
+        base = self.samples - carried   # global index of t[0]
+        n = len(t)
+
+        dt = np.diff(t)
+        values, counts = np.unique(dt, return_counts=True)
+        for v, k in zip(values.tolist(), counts.tolist()):
+            self.dt_hist[v] += k
+        cum = np.concatenate(([0], np.cumsum((p[1:] + p[:-1]) * dt)))
+
+        edges = np.flatnonzero(m[1:] != m[:-1]) + 1
+        starts = np.concatenate(([0], edges))
+        ends = np.concatenate((edges, [n - 1]))
+        energy = cum[ends] - cum[starts]
+        run_samples = np.diff(np.concatenate((starts, [n])))
+        run_samples[0] -= carried
+
+        if self._open is None:
+            self._open = [int(m[0]), base, 0, int(t[0]), 0, int(p[0])]
+        self._open[2] += int(run_samples[0])
+        self._open[4] += int(energy[0])
+        if len(starts) > 1:
+            mid = starts[1:-1]
+            self._closed.append((
+                np.concatenate(([self._open[0]], m[mid])),
+                np.concatenate(([self._open[1]], base + mid)),
+                np.concatenate(([self._open[2]], run_samples[1:-1])),
+                np.concatenate(([self._open[3]], t[mid])),
+                t[starts[1:]],
+                np.concatenate(([self._open[4]], energy[1:-1])),
+                np.concatenate(([self._open[5]], p[mid])),
+            ))
+            s = starts[-1]
+            self._open = [int(m[s]), base + int(s), int(run_samples[-1]), int(t[s]), int(energy[-1]),
+                          int(p[s])]
+
+        self.samples += n - carried
+        self._last = (int(t[-1]), int(p[-1]), int(m[-1]))
+        return self
+
+    def _extend_range(self, name, lo, hi):
+        cur_lo, cur_hi = getattr(self, f"{name}_min"), getattr(self, f"{name}_max")
+        setattr(self, f"{name}_min", lo if cur_lo is None else min(cur_lo, lo))
+        setattr(self, f"{name}_max", hi if cur_hi is None else max(cur_hi, hi))
+
+    def median_dt(self):
+        return hist_median(self.dt_hist)
+
+    def row(self):
+        """Metric record with the same columns as metrics.trace_metrics()."""
+        dt = self.median_dt()
+        n_idle, n_tx = self.phase_samples
+        span_ms = self.t_max - self.t_min if self.samples else 0
+        power = [s / 100 for s in self.power_sum]
+        current = [s / 100 for s in self.current_sum]
+
+        total = (power[0] + power[1]) * dt / 1000
+        transfer = power[1] * dt / 1000 if n_tx else 0
+        overhead = power[0] * dt / 1000 if n_idle else 0
+        tx_power = power[1] / n_tx if n_tx else 0
+        idle_power = power[0] / n_idle if n_idle else 0
+        tx_current = current[1] / n_tx if n_tx else 0
+        idle_current = current[0] / n_idle if n_idle else 0
+        window_ms = self.transfer_t_max - self.transfer_t_min if n_tx else 0
+        window_mJ = tx_power * window_ms / 1000
+        transfer_ms = n_tx * dt if n_tx else 0
+        total_bytes = self.payload_size * self.iterations
+
+        return {
+            'mode': self.mode,
+            'payload_bytes': self.payload_size,
+            'total_samples': self.samples,
+            'transfer_samples': n_tx,
+            'overhead_samples': n_idle,
+            'total_duration_s': span_ms / 1000,
+            'transfer_duration_s': transfer_ms / 1000,
+            'overhead_duration_s': n_idle * dt / 1000 if n_idle else 0,
+            'total_energy_mJ': total,
+            'transfer_energy_mJ': transfer,
+            'overhead_energy_mJ': overhead,
+            'overhead_pct': overhead / total * 100 if total > 0 else 0,
+            'transfer_avg_power_mW': tx_power,
+            'overhead_avg_power_mW': idle_power,
+            'transfer_avg_current_mA': tx_current,
+            'overhead_avg_current_mA': idle_current,
+            'delta_current_mA': tx_current - idle_current,
+            'delta_power_mW': tx_power - idle_power,
+            'window_duration_ms': window_ms,
+            'window_energy_mJ': window_mJ if n_tx else 0,
+            'window_energy_per_byte_uJ': (window_mJ * 1000 / self.payload_size
+                                          if n_tx and self.payload_size > 0 else 0),
+            'mean_power_energy_mJ': (power[0] + power[1]) / self.samples * span_ms / 1000 if n_tx else 0,
+            'throughput_kbps': total_bytes * 8 / (transfer_ms / 1000) / 1000 if transfer_ms > 0 else 0,
+            'energy_per_byte_uJ': total * 1000 / total_bytes if total_bytes > 0 else 0,
+        }
+
+    def segments(self):
+        """Constant-marker segments, as segments.segment_frame() would return them."""
+        parts = list(self._closed)
+        if self._open is not None:
+            o = self._open
+            parts.append(([o[0]], [o[1]], [o[2]], [o[3]], [self._last[0]], [o[4]], [o[5]]))
+        if not parts:
+            return pd.DataFrame(columns=SEGMENT_COLUMNS)
+        marker, start_idx, samples, start_ms, end_ms, energy, start_power = (
+            np.concatenate(col) for col in zip(*parts))
+        start_ms = start_ms.astype(np.float64)
+        end_ms = end_ms.astype(np.float64)
+        duration_ms = end_ms - start_ms
+        energy_mJ = energy / ENERGY_UNITS_PER_UJ / 1000
+        with np.errstate(divide='ignore', invalid='ignore'):
+            avg_power = np.where(duration_ms > 0, energy_mJ * 1000 / duration_ms, start_power / 100)
+        return pd.DataFrame({
+            'segment': np.arange(len(marker)),
+            'marker': marker.astype(np.uint8),
+            'start_idx': start_idx.astype(np.int64),
+            'samples': samples.astype(np.int64),
+            'start_ms': start_ms,
+            'end_ms': end_ms,
+            'duration_ms': duration_ms,
+            'energy_mJ': energy_mJ,
+            'avg_power_mW': avg_power,
+        }, columns=SEGMENT_COLUMNS)
+
+
+def analyze_file(csv_file, payload_size=0, mode=None, rows=CHUNK_ROWS):
+    """ChunkedTrace for one logger CSV, read `rows` samples at a time."""
+    acc = ChunkedTrace(payload_size, mode)
+    for chunk in read_chunks(csv_file, rows):
+        acc.update(chunk)
+    return acc
+
+
+def chunked_table(data_dir=DATA_DIR, rows=CHUNK_ROWS):
+    """(metrics table, segments table) for every test under data_dir, out of core."""
+    rows_out, frames = [], []
+    for run in iter_test_runs(data_dir):
+        payload_size, mode = run['payload_bytes'], run['mode']
+        acc = analyze_file(run['path'], payload_size, mode, rows)
+        rows_out.append({'campaign': run['campaign'], 'repetition': run['repetition'], **acc.row()})
+        seg = acc.segments()
+        seg.insert(0, 'payload_bytes', payload_size)
+        seg.insert(0, 'mode', mode)
+        frames.append(seg)
+    segments = (pd.concat(frames, ignore_index=True) if frames
+                else pd.DataFrame(columns=['mode', 'payload_bytes'] + SEGMENT_COLUMNS))
+    return pd.DataFrame(rows_out, columns=columns()), segments
+
+
+def in_memory_table(data_dir=DATA_DIR):
+    """metrics.py and segments.py run on each whole CSV, parsed as float64 by pandas."""
+    from metrics import METRICS, Trace
+    from segments import segment_frame
+
+    rows, frames = [], []
+    for run in iter_test_runs(data_dir):
+        payload_size, mode = run['payload_bytes'], run['mode']
+        df = pd.read_csv(run['path'])
+        tr = Trace(df, payload_size, mode)
+        row = {'mode': mode, 'payload_bytes': payload_size, 'campaign': run['campaign'],
+               'repetition': run['repetition']}
+        for func, _ in METRICS.values():
+            row.update(func(tr))
+        rows.append(row)
+        seg = segment_frame(df['timestamp_ms'], df['power_mW'], df['marker'])
+        seg.insert(0, 'payload_bytes', payload_size)
+        seg.insert(0, 'mode', mode)
+        frames.append(seg)
+    return pd.DataFrame(rows, columns=columns()), pd.concat(frames, ignore_index=True)
+
+
+def check(data_dir=DATA_DIR, chunk_rows=(7, 1000, CHUNK_ROWS), rtol=1e-9):
+    """Compare the chunked results with the in-memory path; returns the number of failures.
+
+    The reference parses each CSV whole in float64. The cached traces are
+    float32, so metrics.py on the cache differs from both by ~1e-7.
+    """
+    ref_metrics, ref_segments = in_memory_table(data_dir)
+    first = None
+    bad = 0
+    for rows in chunk_rows:
+        t0 = time.perf_counter()
+        got_metrics, got_segments = chunked_table(data_dir, rows)
+        elapsed = time.perf_counter() - t0
+        if first is None:
+            first = (got_metrics, got_segments)
+        identical = got_metrics.equals(first[0]) and got_segments.equals(first[1])
+        worst = 0.0
+        for ref, got in ((ref_metrics, got_metrics), (ref_segments, got_segments)):
+            num = ref.select_dtypes('number').columns
+            a = ref[num].to_numpy(np.float64)
+            b = got[num].to_numpy(np.float64) if len(got) == len(ref) else np.full_like(a, np.nan)
+            with np.errstate(divide='ignore', invalid='ignore'):
+                err = np.abs(a - b) / np.abs(a)
+            err[a == b] = 0
+            worst = max(worst, float(np.max(err, initial=0.0)))
+        ok = identical and worst <= rtol
+        bad += not ok
+        print(f"rows={rows:>9,}  {len(got_metrics)} tests, {len(got_segments)} segments  "
+              f"max rel err {worst:.1e}  {'identical' if identical else 'DIFFERS'} across chunk sizes  "
+              f"{elapsed:.2f}s  {'ok' if ok else 'FAIL'}")
+    return bad
+
+
+def _prepare_rss_data(samples, seed):
+    """benchmark.prepare_data() plus a catalog sync, so the stages measure analysis only."""
+    import benchmark
+    from catalog import Catalog
+
+    ctx = benchmark.prepare_data(samples, seed)
+    with Catalog() as cat:
+        cat.sync(ctx['data_dir'])
+    return ctx
+
+
+def rss(sizes, seed=0):
+    """Peak RSS of the chunked vs in-memory path on synthetic traces of growing size.
+
+    Returns True when the chunked peak stays within RSS_SLACK_MB across sizes.
+    """
+    import multiprocessing
+
+    import benchmark  # keeps its cache/catalog under .bench/
+
+    print(f"{'samples':>12} {'CSV MB':>8} {'chunked s':>10} {'chunked MB':>11} {'in-memory s':>12} {'in-memory MB':>13}")
+    peaks = []
+    for samples in sizes:
+        # generate and index in a throwaway process: forked stage children
+        # would inherit its peak RSS
+        with multiprocessing.get_context('fork').Pool(1) as pool:
+            ctx = pool.apply(_prepare_rss_data, (samples, seed))
+        benchmark.measure('ingest_cold', ctx)   # build the cache so 'metrics' measures analysis only
+        got = {stage: benchmark.measure(stage, ctx) for stage in ('chunked', 'metrics')}
+        for stage, r in got.items():
+            if 'error' in r:
+                print(f"{stage}: {r['error']}")
+                return False
+        ch, mem = got['chunked'], got['metrics']
+        peaks.append(ch['peak_rss_mb'])
+        print(f"{samples:>12,} {ctx['bytes'] / 1e6:>8.1f} {ch['seconds']:>10.2f} {ch['peak_rss_mb']:>11.1f} "
+              f"{mem['seconds']:>12.2f} {mem['peak_rss_mb']:>13.1f}", flush=True)
+    growth = max(peaks) - min(peaks)
+    flat = growth <= RSS_SLACK_MB
+    print(f"\nchunked peak RSS grows {growth:.1f} MB across sizes "
+          f"({'flat' if flat else 'NOT flat'}, limit {RSS_SLACK_MB} MB)")
+    return flat
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('csv', nargs='*', help="logger CSVs (default: every test under Data/)")
+    parser.add_argument('--rows', type=int, default=CHUNK_ROWS, help="rows per chunk")
+    parser.add_argument('--segments', action='store_true', help="print the segments too")
+    parser.add_argument('--check', action='store_true',
+                        help="compare with metrics.py / segments.py at several chunk sizes")
+    parser.add_argument('--rss', metavar='SAMPLES',
+                        help="peak RSS vs input size on synthetic traces, e.g. 250k,1M,4M")
+    parser.add_argument('--seed', type=int, default=0, help="--rss: synthetic trace seed")
+    args = parser.parse_args()
+
+    if args.check:
+        sys.exit(1 if check(DATA_DIR, chunk_rows=(7, 1000, args.rows)) else 0)
+    if args.rss:
+        from synth_trace import parse_count
+        sys.exit(0 if rss([parse_count(s) for s in args.rss.split(',')], args.seed) else 1)
+
+    if args.csv:
+        for csv_path in args.csv:
+            acc = analyze_file(csv_path, rows=args.rows)
+            print(f"\n=== {csv_path} ===")
+            for k, v in acc.row().items():
+                if k not in ('mode', 'payload_bytes'):
+                    print(f"{k:<28} {v}")
+            if args.segments:
+                print(acc.segments().to_string(index=False))
+        return
+
+    table, segments = chunked_table(DATA_DIR, args.rows)
+    if len(table) == 0:
+        print("No data found!")
+        return
+    print(table[['mode', 'payload_bytes', 'total_samples', 'total_energy_mJ',
+                 'transfer_energy_mJ', 'energy_per_byte_uJ', 'throughput_kbps']].to_string(index=False))
+    print(f"\n{len(segments)} segments")
+    if args.segments:
+        print(segments.to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,372 @@
+#!/usr/bin/env python3
+"""Live current / power / marker view of a Logger stream.
+
+    python dashboard.py /dev/ttyUSB0 --interval 10         # Logger in stream mode
+    python dashboard.py --file "../Data/512 Bytes/WiFi.csv" --speed 4
+    python dashboard.py --synthetic BLE_CONN --window 60
+    python dashboard.py --headless --frames 900 --speed 20 --json fps.json
+
+Redraw cost is bounded by the screen, not by the session. Samples go into
+a fixed-size SampleRing holding the last --window seconds. Each frame reduces
+that window to the min and max of every pixel column (downsample.minmax_columns),
+so each line always has 2 x width points. Only the lines and the status text
+are redrawn: axes, ticks and grid are a background bitmap restored with
+blitting, and are re-rendered only when the y range has to grow or shrink.
+The status line is re-rendered STATUS_HZ times a second into a second
+background, so a frame costs three line draws.
+
+--headless renders the same frames on the Agg backend, fed by a synthetic
+(or replayed) trace on a simulated clock, and reports frames per second and
+per-frame render times. The first and last tenth of the run are reported
+separately, so a cost that grows with session length shows up.
+"""
+
+import argparse
+import json
+import sys
+import time
+
+import matplotlib
+import numpy as np
+
+from capture_daemon import SampleRing, parse_lines
+from chunked import ChunkedTrace
+from downsample import minmax_columns
+from synth_trace import INTERVAL_MS, MAX_TIMESTAMP_MS, PROFILES, generate
+from trace_cache import COLUMNS, read_chunks
+
+WINDOW_S = 30
+FPS = 30
+FIGSIZE = (12, 7)
+DPI = 100
+FEED_CHUNK = 1 << 14
+Y_HEADROOM = 1.25
+Y_SHRINK = 0.4     # rescale down once the window's peak is below this fraction of the axis
+STATUS_HZ = 4      # text rendering costs as much as the three lines; refresh it less often
+
+
+def _empty_rows():
+    return {name: np.empty(0, dtype) for name, dtype in COLUMNS.items()}
+
+
+class ReplayFeed:
+    """Release samples from an iterator of column chunks against a clock.
+
+    poll(elapsed_ms) returns every sample up to `speed` x elapsed_ms after
+    the first one, so a file or synthetic trace plays back like a live stream.
+    """
+
+    def __init__(self, chunks, speed=1.0):
+        self.speed = speed
+        self.done = False
+        self._chunks = iter(chunks)
+        self._pending = None
+        self._t0 = None
+
+    def poll(self, elapsed_ms):
+        out = []
+        while not self.done:
+            if self._pending is None:
+                self._pending = next(self._chunks, None)
+                if self._pending is None:
+                    self.done = True
+                    break
+                if self._t0 is None and len(self._pending['timestamp_ms']):
+                    self._t0 = int(self._pending['timestamp_ms'][0])
+            t = self._pending['timestamp_ms']
+            k = int(np.searchsorted(t, self._t0 + elapsed_ms * self.speed, side='right')) if len(t) else 0
+            if k:
+                out.append({name: self._pending[name][:k] for name in COLUMNS})
+            if k < len(t):
+                self._pending = {name: self._pending[name][k:] for name in COLUMNS}
+                break
+            self._pending = None
+        if not out:
+            return _empty_rows()
+        return {name: np.concatenate([o[name] for o in out]).astype(dtype, copy=False)
+                for name, dtype in COLUMNS.items()}
+
+    def close(self):
+        pass
+
+
+class SerialFeed:
+    """Non-blocking reader for a Logger (or fake_logger.py pty) in stream mode."""
+
+    def __init__(self, port, baud=115200, interval_ms=None, send_commands=True):
+        import serial
+
+        self.ser = serial.Serial(port, baud, timeout=0)
+        self.send_commands = send_commands
+        self.done = False
+        self.bad_lines = 0
+        self._partial = b""
+        if send_commands:
+            interval = f"interval {interval_ms}\n" if interval_ms else ""
+            self.ser.write(f"{interval}stream\n".encode())
+
+    def poll(self, elapsed_ms=None):
+        data = self.ser.read(65536)
+        if not data:
+            return _empty_rows()
+        *lines, self._partial = (self._partial + data).split(b"\n")
+        rows, bad, ended = parse_lines(line.decode(errors='replace') for line in lines)
+        self.bad_lines += bad
+        self.done = ended
+        return rows
+
+    def close(self):
+        if self.send_commands:
+            self.ser.write(b"stop\n")
+        self.ser.close()
+
+
+def synthetic_feed(mode='WiFi', interval_ms=INTERVAL_MS, speed=1.0, seed=0):
+    samples = MAX_TIMESTAMP_MS // interval_ms   # as long as int32 timestamps allow
+    return ReplayFeed(generate(samples, mode, interval_ms, seed=seed, chunk=FEED_CHUNK), speed)
+
+
+def file_feed(csv_path, speed=1.0):
+    return ReplayFeed(read_chunks(csv_path, FEED_CHUNK), speed)
+
+
+class Dashboard:
+    """Three blitted panels (current, power, marker) over a rolling window."""
+
+    def __init__(self, window_s=WINDOW_S, interval_ms=INTERVAL_MS, blit=True, figsize=FIGSIZE, dpi=DPI):
+        # pyplot is imported here so main() can pick the backend first
+        import matplotlib.pyplot as plt
+
+        self.window_s = window_s
+        self.blit = blit
+        self.ring = SampleRing(int(np.ceil(window_s * 1000 / interval_ms)) + 1)
+        self.totals = ChunkedTrace()
+        self.full_redraws = 0
+        self.frames = 0
+        self.points = 0
+        self._background = None      # axes, ticks and grid
+        self._with_status = None     # _background plus the current status text
+        self._status_due = 0.0
+        self._frame_ms = 0.0
+
+        self.fig, self.axes = plt.subplots(3, 1, figsize=figsize, dpi=dpi, sharex=True,
+                                           gridspec_kw={'height_ratios': [3, 3, 1]})
+        styles = ['b-', 'r-', 'g-']
+        self.lines = [ax.plot([], [], style, linewidth=0.8, animated=blit)[0]
+                      for ax, style in zip(self.axes, styles)]
+        for ax, label in zip(self.axes, ['Current (mA)', 'Power (mW)', 'Marker']):
+            ax.set_ylabel(label)
+            ax.grid(True, alpha=0.3)
+        self.axes[0].set_xlim(-window_s, 0)
+        self.axes[0].set_ylim(0, 100)
+        self.axes[1].set_ylim(0, 400)
+        self.axes[2].set_ylim(-0.1, 1.1)
+        self.axes[2].set_yticks([0, 1])
+        self.axes[2].set_xlabel('Seconds before newest sample')
+        self.status = self.fig.text(0.01, 0.985, "", va='top', family='monospace', animated=blit)
+        self.fig.tight_layout(rect=(0, 0, 1, 0.96))
+        self.fig.canvas.mpl_connect('draw_event', self._on_draw)
+
+    @property
+    def columns(self):
+        return max(1, int(self.axes[0].bbox.width))
+
+    def _on_draw(self, event):
+        # a full draw (first frame, resize, rescale) renders everything but the
+        # animated artists; that is the background later frames are blitted onto
+        if self.blit:
+            self._background = self.fig.canvas.copy_from_bbox(self.fig.bbox)
+            self._with_status = None
+            self._draw_animated()
+
+    def _draw_animated(self):
+        for artist in (*self.lines, self.status):
+            self.fig.draw_artist(artist)
+
+    def _refresh_status(self, canvas):
+        canvas.restore_region(self._background)
+        self.fig.draw_artist(self.status)
+        self._with_status = canvas.copy_from_bbox(self.fig.bbox)
+
+    def update(self, rows):
+        """Add newly received samples."""
+        if len(rows['timestamp_ms']):
+            self.ring.extend(rows)
+            self.totals.update(rows)
+
+    def _set_data(self):
+        """Decimate the window into the lines; True if a y axis needs a new range.
+
+        The status text is only updated when it is due (STATUS_HZ).
+        """
+        view = self.ring.latest()
+        if len(view['timestamp_ms']) == 0:
+            return False
+        t = view['timestamp_ms']
+        x = (t.astype(np.float64) - float(t[-1])) / 1000
+        rescale = False
+        columns = self.columns
+        for ax, line, name in zip(self.axes, self.lines, ['current_mA', 'power_mW', 'marker']):
+            xs, ys = minmax_columns(x, view[name], -self.window_s, 0, columns)
+            line.set_data(xs, ys)
+            if name == 'marker' or np.isnan(ys).all():
+                continue
+            lo, hi = ax.get_ylim()
+            peak = float(np.nanmax(ys))
+            if peak > hi or peak < hi * Y_SHRINK:
+                ax.set_ylim(min(0.0, float(np.nanmin(ys))), max(peak * Y_HEADROOM, 1.0))
+                rescale = True
+        self.points = 2 * columns
+
+        now = time.monotonic()
+        if now < self._status_due:
+            return rescale
+        self._status_due = now + 1 / STATUS_HZ
+        self._with_status = None
+        # device-time rate and power over the last second, session energy from the running totals
+        recent = t > t[-1] - 1000
+        rate = int(recent.sum())
+        power = float(view['power_mW'][recent].mean())
+        energy = self.totals.row()['total_energy_mJ'] if self.totals.samples > 1 else 0.0
+        self.status.set_text(f"{self.totals.samples:>10,} samples  {rate:>5} Hz  {power:8.1f} mW  "
+                             f"{energy:12.1f} mJ  frame {self._frame_ms:5.2f} ms")
+        return rescale
+
+    def render(self):
+        """Redraw one frame; returns the render time in seconds."""
+        t0 = time.perf_counter()
+        rescale = self._set_data()
+        canvas = self.fig.canvas
+        if not self.blit or rescale or self._background is None:
+            if self.blit:
+                self.full_redraws += 1
+            canvas.draw()
+        else:
+            if self._with_status is None:
+                self._refresh_status(canvas)
+            canvas.restore_region(self._with_status)
+            for line in self.lines:
+                self.fig.draw_artist(line)
+            canvas.blit(self.fig.bbox)
+        canvas.flush_events()
+        elapsed = time.perf_counter() - t0
+        self._frame_ms = 0.9 * self._frame_ms + 0.1 * elapsed * 1000
+        self.frames += 1
+        return elapsed
+
+
+def run_live(dash, feed, fps=FPS):
+    import matplotlib.pyplot as plt
+
+    t0 = time.monotonic()
+
+    def tick():
+        dash.update(feed.poll((time.monotonic() - t0) * 1000))
+        dash.render()
+
+    timer = dash.fig.canvas.new_timer(interval=int(1000 / fps))
+    timer.add_callback(tick)
+    timer.start()
+    try:
+        plt.show()
+    finally:
+        feed.close()
+
+
+def run_headless(dash, feed, frames, fps=FPS):
+    """Render `frames` frames as fast as possible, advancing the feed 1/fps s per frame."""
+    render_s = np.empty(frames)
+    t_start = time.perf_counter()
+    for i in range(frames):
+        dash.update(feed.poll(i * 1000 / fps))
+        render_s[i] = dash.render()
+    wall = time.perf_counter() - t_start
+    feed.close()
+
+    ms = render_s * 1000
+    tenth = max(1, frames // 10)
+    return {
+        'frames': frames,
+        'wall_s': round(wall, 3),
+        'fps': round(frames / wall, 1),
+        'render_fps': round(frames / render_s.sum(), 1),
+        'render_ms': {
+            'p50': round(float(np.percentile(ms, 50)), 3),
+            'p95': round(float(np.percentile(ms, 95)), 3),
+            'p99': round(float(np.percentile(ms, 99)), 3),
+            'max': round(float(ms.max()), 3),
+            'first_tenth_mean': round(float(ms[:tenth].mean()), 3),
+            'last_tenth_mean': round(float(ms[-tenth:].mean()), 3),
+        },
+        'samples': dash.totals.samples,
+        'session_s': round(dash.totals.samples * dash.totals.median_dt() / 1000, 1)
+        if dash.totals.samples > 1 else 0,
+        'window_samples': dash.ring.capacity,
+        'points_per_line': dash.points,
+        'full_redraws': dash.full_redraws,
+        'blit': dash.blit,
+    }
+
+
+def print_report(r):
+    ms = r['render_ms']
+    print(f"{r['frames']} frames in {r['wall_s']:.2f}s: {r['fps']:.1f} fps "
+          f"({r['render_fps']:.1f} fps render only, blit {'on' if r['blit'] else 'off'})")
+    print(f"render ms: p50 {ms['p50']:.2f}  p95 {ms['p95']:.2f}  p99 {ms['p99']:.2f}  max {ms['max']:.2f}")
+    print(f"first tenth {ms['first_tenth_mean']:.2f} ms/frame, last tenth {ms['last_tenth_mean']:.2f} ms/frame")
+    print(f"{r['samples']:,} samples ({r['session_s']:.0f} s of trace), window {r['window_samples']:,} samples, "
+          f"{r['points_per_line']} points/line, {r['full_redraws']} full redraws")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('port', nargs='?', help="Logger serial port (or a fake_logger.py pty)")
+    parser.add_argument('--file', help="replay a logger CSV")
+    parser.add_argument('--synthetic', metavar='MODE', choices=list(PROFILES),
+                        help="synthetic trace (the --headless default)")
+    parser.add_argument('--baud', type=int, default=115200)
+    parser.add_argument('--interval', type=int, default=INTERVAL_MS, help="sample interval (ms)")
+    parser.add_argument('--no-commands', action='store_true',
+                        help="don't send 'interval'/'stream'/'stop' (port is already streaming)")
+    parser.add_argument('--speed', type=float, default=1.0, help="replay speed for --file/--synthetic")
+    parser.add_argument('--window', type=float, default=WINDOW_S, help="seconds on screen")
+    parser.add_argument('--fps', type=float, default=FPS, help="target frame rate")
+    parser.add_argument('--no-blit', action='store_true', help="full redraw every frame (for comparison)")
+    parser.add_argument('--headless', action='store_true', help="render off-screen and report fps")
+    parser.add_argument('--frames', type=int, default=600, help="--headless: frames to render")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--json', help="--headless: write the report here")
+    parser.add_argument('--min-fps', type=float, default=0,
+                        help="--headless: exit non-zero below this many frames per second")
+    args = parser.parse_args()
+
+    if args.headless:
+        matplotlib.use('Agg')
+
+    if args.port:
+        feed = SerialFeed(args.port, args.baud, args.interval, not args.no_commands)
+    elif args.file:
+        feed = file_feed(args.file, args.speed)
+    elif args.synthetic or args.headless:
+        feed = synthetic_feed(args.synthetic or 'WiFi', args.interval, args.speed, args.seed)
+    else:
+        parser.error("give a serial port, --file or --synthetic")
+
+    dash = Dashboard(args.window, args.interval, blit=not args.no_blit)
+    if not args.headless:
+        run_live(dash, feed, args.fps)
+        return
+
+    report = run_headless(dash, feed, args.frames, args.fps)
+    print_report(report)
+    if args.json:
+        with open(args.json, 'w') as fh:
+            json.dump(report, fh, indent=2)
+        print(f"\nSaved: {args.json}")
+    if args.min_fps and report['fps'] < args.min_fps:
+        print(f"FAIL: {report['fps']:.1f} fps < {args.min_fps:g}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""Largest-triangle-three-buckets (LTTB) downsampling for plotting traces.
+
+LTTB keeps the first and last point and, from each of n_out - 2 equal-width
+buckets in between, the point that forms the largest triangle with the
+previously kept point and the mean of the next bucket. Peaks and steps
+survive, which plain decimation loses.
+
+lttb_segments() runs LTTB separately between marker edges, so the samples
+on both sides of every 0->1 / 1->0 edge are always kept and transfer-phase
+shading lines up with the full-resolution trace exactly.
+
+minmax_columns() is the cheaper reduction for live plots: the min and max
+of every pixel column, with no Python loop, and always the same number of
+output points.
+"""
+
+import numpy as np
+
+from segments import marker_edges
+
+
+def lttb(x, y, n_out):
+    """Indices of the n_out points LTTB keeps from (x, y); all indices if n_out >= len(x)."""
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    n = len(x)
+    if n_out >= n or n <= 2:
+        return np.arange(n)
+    if n_out <= 2:
+        return np.array([0, n - 1])[:max(n_out, 0)]
+
+    # n_out - 2 buckets covering samples 1 .. n-2, plus the centroid each one
+    # is compared against (the mean of the next bucket; the last point for the last)
+    bounds = np.linspace(1, n - 1, n_out - 1).astype(np.intp)
+    counts = np.diff(bounds)
+    cx = np.append(np.add.reduceat(x[1:n - 1], bounds[:-1] - 1)[1:] / counts[1:], x[n - 1])
+    cy = np.append(np.add.reduceat(y[1:n - 1], bounds[:-1] - 1)[1:] / counts[1:], y[n - 1])
+
+    out = np.empty(n_out, dtype=np.intp)
+    out[0], out[-1] = 0, n - 1
+    a = 0
+    lo_list = bounds.tolist()
+    for i in range(n_out - 2):
+        lo, hi = lo_list[i], lo_list[i + 1]
+        ax, ay = x[a], y[a]
+        # twice the triangle area; the constant factor doesn't change the argmax
+        area = np.abs((ax - cx[i]) * (y[lo:hi] - ay) - (ax - x[lo:hi]) * (cy[i] - ay))
+        a = lo + int(area.argmax())
+        out[i + 1] = a
+    return out
+
+
+def lttb_segments(x, y, marker, n_out):
+    """LTTB indices for (x, y) that always include the samples either side of each marker edge.
+
+    The point budget is shared between constant-marker segments in
+    proportion to their length, with at least the two end points of each.
+    """
+    n = len(x)
+    if n_out >= n:
+        return np.arange(n)
+    edges = marker_edges(marker)
+    starts = np.concatenate(([0], edges))
+    ends = np.concatenate((edges, [n]))
+    parts = []
+    for lo, hi in zip(starts.tolist(), ends.tolist()):
+        k = max(2, round(n_out * (hi - lo) / n))
+        parts.append(lo + lttb(x[lo:hi], y[lo:hi], k))
+    return np.concatenate(parts)
+
+
+def minmax_columns(x, y, x0, x1, columns):
+    """(xs, ys) with the min and max of y in each of `columns` equal-width bins of [x0, x1].
+
+    x must be sorted. The output always has 2 x columns points, so a line's
+    data arrays never change size. Empty columns are NaN, which breaks the
+    line at gaps instead of bridging them.
+    """
+    x = np.asarray(x)
+    y = np.asarray(y)
+    edges = np.linspace(x0, x1, columns + 1)
+    bounds = np.searchsorted(x, edges)
+    bounds[-1] = np.searchsorted(x, x1, side='right')   # the newest sample sits exactly on x1
+    counts = np.diff(bounds)
+    filled = np.flatnonzero(counts)
+
+    ys = np.full((columns, 2), np.nan)
+    if len(filled):
+        starts = bounds[filled] - bounds[0]
+        window = y[bounds[0]:bounds[-1]]
+        ys[filled, 0] = np.minimum.reduceat(window, starts)
+        ys[filled, 1] = np.maximum.reduceat(window, starts)
+    xs = np.repeat((edges[:-1] + edges[1:]) / 2, 2)
+    return xs, ys.ravel()
@@ -0,0 +1,238 @@
+#!/usr/bin/env python3
+"""Pseudo-terminal stand-in for Logger_ESP, for exercising host-side tools without hardware.
+
+Opens a pty and speaks the Logger's serial protocol on it: `start`, `stop`,
+`status`, `csv`, `dump`, `stream` and `interval <ms>`. In stream mode it emits
+`timestamp_ms,voltage_V,current_mA,power_mW,marker` lines on a wall-clock
+schedule at the configured interval, with optional randomly dropped
+samples so gap detection can be checked against a known truth.
+
+    python fake_logger.py --interval 5 --drop 0.01
+    # prints the pty path, e.g. /dev/pts/4; point capture_daemon.py at it
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import time
+import tty
+
+import numpy as np
+
+from binary_dump import RECORD_DTYPE, encode_dump, frame_dump
+from logger_format import CSV_END, CSV_HEADER, CSV_START, STREAM_END, STREAM_START
+
+# Power levels roughly matching the measured WiFi traces
+IDLE_MA, TRANSFER_MA, VOLTAGE = 41.0, 68.0, 3.33
+
+
+class FakeLogger:
+    """Logger_ESP serial protocol on the master side of a pty."""
+
+    def __init__(self, interval_ms=50, drop_prob=0.0, burst_ms=5000, idle_ms=3000,
+                 buffer_size=6000, seed=None):
+        self.interval_ms = interval_ms
+        self.drop_prob = drop_prob
+        self.burst_ms = burst_ms
+        self.idle_ms = idle_ms
+        self.buffer_size = buffer_size
+        self.rng = random.Random(seed)
+
+        self.master, self.slave = os.openpty()
+        tty.setraw(self.slave)
+        self.path = os.ttyname(self.slave)
+
+        self.streaming = False
+        self.logging = False
+        self.buffer = []
+        self.sent = 0        # samples written to the pty
+        self.dropped = 0     # samples deliberately skipped
+        self.gap_drops = 0   # ... of which between two sent samples (what a receiver can detect)
+        self._pending_drops = None   # drops since the last sent sample; None until one is sent
+        self.overflow_bytes = 0
+        self._boot = time.monotonic()
+        self._next_ms = 0.0          # device time of the next sample
+        self._log_epoch = 0          # like logStartTime / streamStartTime on the device
+        self._stream_epoch = 0
+        self._cmd = b""
+        self._out = bytearray()
+        self._task = None
+
+    # --- synthetic signal ---
+
+    def sample(self, timestamp_ms):
+        period = self.burst_ms + self.idle_ms
+        marker = 1 if (timestamp_ms % period) >= self.idle_ms else 0
+        base = TRANSFER_MA if marker else IDLE_MA
+        current = base + self.rng.gauss(0, 2.0)
+        voltage = VOLTAGE - current * 0.0005
+        return (timestamp_ms, voltage, current, voltage * current, marker)
+
+    @staticmethod
+    def format(s):
+        return "%d,%.3f,%.2f,%.2f,%d\n" % s
+
+    # --- pty I/O ---
+
+    def _write(self, text):
+        # Like a real UART with nobody reading: whatever doesn't fit is lost
+        data = text.encode() if isinstance(text, str) else text
+        while data:
+            try:
+                n = os.write(self.master, data)
+            except BlockingIOError:
+                self.overflow_bytes += len(data)
+                return
+            data = data[n:]
+
+    def _send(self, data):
+        # Bulk replies (csv, dump): Serial.write blocks on a full TX buffer, so nothing is lost
+        self._out += data.encode() if isinstance(data, str) else data
+        self._on_writable()
+
+    def _on_writable(self):
+        loop = asyncio.get_running_loop()
+        try:
+            n = os.write(self.master, self._out)
+        except BlockingIOError:
+            n = 0
+        del self._out[:n]
+        if self._out:
+            loop.add_writer(self.master, self._on_writable)
+        else:
+            loop.remove_writer(self.master)
+
+    def _on_readable(self):
+        try:
+            chunk = os.read(self.master, 1024)
+        except OSError:
+            return
+        self._cmd += chunk
+        while b"\n" in self._cmd:
+            line, _, self._cmd = self._cmd.partition(b"\n")
+            self.handle_command(line.decode(errors='replace').strip().lower())
+
+    def handle_command(self, cmd):
+        now_ms = self._emit_due()     # samples taken before this command belong to the old state
+        if cmd == "start":
+            self.buffer.clear()
+            self.logging = True
+            self._log_epoch = now_ms
+            self._write(">>> LOGGING STARTED <<<\n")
+        elif cmd == "stop":
+            self.logging = False
+            if self.streaming:
+                self.streaming = False
+                self._write(STREAM_END + "\n")
+            self._write(f">>> STOPPED - {len(self.buffer)} samples <<<\n")
+        elif cmd == "stream":
+            self._stream_epoch = now_ms
+            self._pending_drops = None
+            self.streaming = True
+            self._write(STREAM_START + "\n" + CSV_HEADER + "\n")
+        elif cmd.startswith("interval"):
+            try:
+                ms = int(cmd[8:])
+            except ValueError:
+                ms = 0
+            if ms > 0:
+                self.interval_ms = ms
+            self._write(f"Interval: {self.interval_ms}ms\n")
+        elif cmd == "status":
+            self._write(f"Logging: {'YES' if self.logging else 'NO'}, "
+                        f"Streaming: {'YES' if self.streaming else 'NO'}, "
+                        f"Samples: {len(self.buffer)}/{self.buffer_size}, "
+                        f"Interval: {self.interval_ms}ms\n")
+        elif cmd == "csv":
+            out = ["\n" + CSV_START + "\n", CSV_HEADER + "\n"]
+            out.extend(self.format(s) for s in self.buffer)
+            out.append(CSV_END + "\n")
+            self._send("".join(out))
+        elif cmd == "dump":
+            records = np.array(self.buffer, dtype=RECORD_DTYPE)
+            self._send(frame_dump(encode_dump(records, self.interval_ms)))
+
+    def millis(self):
+        return int((time.monotonic() - self._boot) * 1000)
+
+    def _emit_due(self):
+        """Take every sample due by now, as the device's loop() would have; returns now."""
+        now_ms = self.millis()
+        if not (self.streaming or self.logging):
+            self._next_ms = max(self._next_ms, now_ms)
+            return now_ms
+        lines = []
+        while self._next_ms <= now_ms:
+            s = self.sample(int(self._next_ms))
+            self._next_ms += self.interval_ms
+            if self.logging and len(self.buffer) < self.buffer_size:
+                self.buffer.append((s[0] - self._log_epoch,) + s[1:])
+            if not self.streaming:
+                continue
+            if self.drop_prob and self.rng.random() < self.drop_prob:
+                self.dropped += 1
+                if self._pending_drops is not None:
+                    self._pending_drops += 1
+                continue
+            self.gap_drops += self._pending_drops or 0
+            self._pending_drops = 0
+            lines.append(self.format((s[0] - self._stream_epoch,) + s[1:]))
+        if lines:
+            self.sent += len(lines)
+            self._write("".join(lines))
+        return now_ms
+
+    async def _emit_loop(self):
+        tick = min(0.01, self.interval_ms / 2000)
+        while True:
+            await asyncio.sleep(tick)
+            self._emit_due()
+
+    def start(self):
+        """Attach to the running event loop."""
+        os.set_blocking(self.master, False)
+        asyncio.get_running_loop().add_reader(self.master, self._on_readable)
+        self._task = asyncio.create_task(self._emit_loop())
+
+    def close(self):
+        if self._task:
+            self._task.cancel()
+            asyncio.get_running_loop().remove_reader(self.master)
+            asyncio.get_running_loop().remove_writer(self.master)
+        os.close(self.master)
+        os.close(self.slave)
+
+
+async def _serve(args):
+    fake = FakeLogger(args.interval, args.drop, seed=args.seed)
+    fake.start()
+    print(fake.path, flush=True)
+    if args.autostream:
+        fake.handle_command("stream")
+    try:
+        if args.seconds:
+            await asyncio.sleep(args.seconds)
+        else:
+            await asyncio.Event().wait()
+    finally:
+        print(f"sent {fake.sent}, dropped {fake.dropped}, overflow {fake.overflow_bytes} bytes")
+        fake.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--interval', type=int, default=50, help="sample interval (ms)")
+    parser.add_argument('--drop', type=float, default=0.0, help="probability of skipping a sample")
+    parser.add_argument('--seconds', type=float, default=0, help="exit after N seconds (0 = run forever)")
+    parser.add_argument('--autostream', action='store_true', help="start streaming without a 'stream' command")
+    parser.add_argument('--seed', type=int, default=None)
+    args = parser.parse_args()
+    try:
+        asyncio.run(_serve(args))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""Find the tests under a data directory and compute per-file records, optionally in parallel."""
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import trace_cache
+
+
+def iter_test_files(data_dir, **filters):
+    """Return [(payload_size, mode, csv_path)] sorted by payload size then mode.
+
+    Runs come from the run catalog (catalog.py), synced with data_dir first;
+    filters (mode=, payload_bytes=, campaign=, device=, ...) select a subset.
+    """
+    from catalog import run_files
+    return run_files(data_dir, **filters)
+
+
+def iter_test_runs(data_dir, **filters):
+    """Like iter_test_files(), but whole catalog rows: payload_bytes, mode, path, campaign, repetition, ..."""
+    from catalog import run_rows
+    return run_rows(data_dir, **filters)
+
+
+def resolve_workers(workers):
+    """None/0 means one worker per CPU; anything else is clamped to >= 1."""
+    if not workers:
+        return os.cpu_count() or 1
+    return max(1, int(workers))
+
+
+def _apply(args):
+    func, *run = args
+    return func(*run)
+
+
+def _apply_in_worker(args):
+    # Ship the worker's cache hit/miss delta back so the parent can report it
+    before = trace_cache.cache_stats()
+    record = _apply(args)
+    after = trace_cache.cache_stats()
+    return record, {k: after[k] - before[k] for k in after}
+
+
+def map_test_files(func, data_dir, workers=1, **filters):
+    """Run func(payload_size, mode, csv_path, campaign, repetition) over every selected run.
+
+    filters select runs as in iter_test_files(). func must be a module-level
+    function so it can be pickled into worker processes. Records come back
+    in iter_test_files() order regardless of the worker count; None results
+    (skipped files) are dropped.
+    """
+    tests = iter_test_runs(data_dir, **filters)
+    workers = min(resolve_workers(workers), max(1, len(tests)))
+
+    jobs = [(func, r['payload_bytes'], r['mode'], r['path'], r['campaign'], r['repetition']) for r in tests]
+    if workers == 1:
+        records = map(_apply, jobs)
+    else:
+        chunksize = max(1, len(jobs) // (workers * 4))
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(_apply_in_worker, jobs, chunksize=chunksize))
+        records = [record for record, _ in results]
+        for _, delta in results:
+            trace_cache.add_cache_stats(delta)
+
+    return [r for r in records if r is not None]
@@ -0,0 +1,13 @@
+"""Text formats of the Logger_ESP serial protocol, shared by the capture and conversion tools.
+
+Standard library only, so importing it costs nothing.
+"""
+
+CSV_HEADER = "timestamp_ms,voltage_V,current_mA,power_mW,marker"
+# np.savetxt formats matching the firmware's "%lu,%.3f,%.2f,%.2f,%d"
+CSV_FORMAT = ['%d', '%.3f', '%.2f', '%.2f', '%d']
+
+CSV_START = ">>> CSV START <<<"
+CSV_END = ">>> CSV END <<<"
+STREAM_START = ">>> STREAM START <<<"
+STREAM_END = ">>> STREAM END <<<"
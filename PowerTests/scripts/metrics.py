@@ -0,0 +1,237 @@
+#!/usr/bin/env python3
+"""Single-pass metrics engine: every registered metric over one load of each trace.
+
+analyze_data.py and analyze_full_energy.py used to load every CSV and split
+it into phases separately. Here each trace is loaded once into a Trace,
+whose derived quantities (median dt, phase masks, phase frames) are computed
+on first use and shared. Every function registered with @metric then runs
+over that same Trace, and the result is one wide table with a row per test.
+The two scripts select and rename columns from it.
+
+Adding a metric is one decorated function:
+
+    @metric('peak_power_mW')
+    def peak_power(tr):
+        return {'peak_power_mW': tr.df['power_mW'].max()}
+
+Both energy definitions the scripts have always used are kept side by side
+so their published numbers don't move:
+  window_energy_mJ   mean transfer power x (last - first transfer timestamp)
+  transfer_energy_mJ sum(power x median dt) over transfer samples
+
+    python metrics.py -j 0              # write results/metrics.csv
+    python metrics.py --list            # registered metrics and their columns
+"""
+
+import argparse
+from functools import cached_property
+
+import pandas as pd
+
+from ingest import map_test_files
+from paths import DATA_DIR, RESULTS_DIR, add_run_args, run_filters
+from trace_cache import load_trace, print_cache_stats
+
+ITERATIONS = 100  # transfers per test (DUT_ESP firmware)
+RUN_COLUMNS = ['mode', 'payload_bytes', 'campaign', 'repetition']   # which catalog run a row is
+
+METRICS = {}  # name -> (func, columns), in registration order
+
+
+def metric(*columns):
+    """Register func(trace) -> {column: value} as a metric producing `columns`."""
+    def register(func):
+        METRICS[func.__name__] = (func, columns)
+        return func
+    return register
+
+
+class Trace:
+    """One loaded test trace plus lazily computed, shared derived quantities."""
+
+    def __init__(self, df, payload_size, mode, iterations=ITERATIONS):
+        self.df = df
+        self.payload_size = payload_size
+        self.mode = mode
+        self.iterations = iterations
+
+    @cached_property
+    def dt(self):
+        """Median sample interval (ms)."""
+        return self.df['timestamp_ms'].diff().median()
+
+    @cached_property
+    def transfer(self):
+        return self.df[self.df['marker'] == 1]
+
+    @cached_property
+    def idle(self):
+        return self.df[self.df['marker'] == 0]
+
+    @cached_property
+    def energy_mJ(self):
+        """Whole-trace energy, sum(power x dt) (mW x ms = uJ)."""
+        return (self.df['power_mW'] * self.dt).sum() / 1000
+
+    @cached_property
+    def span_ms(self):
+        return self.df['timestamp_ms'].max() - self.df['timestamp_ms'].min()
+
+
+# --- registered metrics ---
+
+@metric('total_samples', 'transfer_samples', 'overhead_samples')
+def samples(tr):
+    return {'total_samples': len(tr.df), 'transfer_samples': len(tr.transfer),
+            'overhead_samples': len(tr.idle)}
+
+
+@metric('total_duration_s', 'transfer_duration_s', 'overhead_duration_s')
+def duration(tr):
+    # phase durations count samples x dt, so they add up to the total energy's time base
+    return {
+        'total_duration_s': tr.span_ms / 1000,
+        'transfer_duration_s': len(tr.transfer) * tr.dt / 1000 if len(tr.transfer) else 0,
+        'overhead_duration_s': len(tr.idle) * tr.dt / 1000 if len(tr.idle) else 0,
+    }
+
+
+@metric('total_energy_mJ', 'transfer_energy_mJ', 'overhead_energy_mJ', 'overhead_pct')
+def energy(tr):
+    """Energy as sum(power x dt) per phase."""
+    total = tr.energy_mJ
+    transfer = (tr.transfer['power_mW'] * tr.dt).sum() / 1000 if len(tr.transfer) else 0
+    overhead = (tr.idle['power_mW'] * tr.dt).sum() / 1000 if len(tr.idle) else 0
+    return {
+        'total_energy_mJ': total,
+        'transfer_energy_mJ': transfer,
+        'overhead_energy_mJ': overhead,
+        'overhead_pct': overhead / total * 100 if total > 0 else 0,
+    }
+
+
+@metric('transfer_avg_power_mW', 'overhead_avg_power_mW', 'transfer_avg_current_mA',
+        'overhead_avg_current_mA', 'delta_current_mA', 'delta_power_mW')
+def phase_power(tr):
+    """Per-phase means and the transfer - idle delta printed by plot_single_test()."""
+    t, i = tr.transfer, tr.idle
+    out = {
+        'transfer_avg_power_mW': t['power_mW'].mean() if len(t) else 0,
+        'overhead_avg_power_mW': i['power_mW'].mean() if len(i) else 0,
+        'transfer_avg_current_mA': t['current_mA'].mean() if len(t) else 0,
+        'overhead_avg_current_mA': i['current_mA'].mean() if len(i) else 0,
+    }
+    out['delta_current_mA'] = out['transfer_avg_current_mA'] - out['overhead_avg_current_mA']
+    out['delta_power_mW'] = out['transfer_avg_power_mW'] - out['overhead_avg_power_mW']
+    return out
+
+
+@metric('window_duration_ms', 'window_energy_mJ', 'window_energy_per_byte_uJ', 'mean_power_energy_mJ')
+def transfer_window(tr):
+    """analyze_data.py's definitions: mean power x first-to-last timestamp span."""
+    t = tr.transfer
+    if len(t) == 0:
+        return {'window_duration_ms': 0, 'window_energy_mJ': 0,
+                'window_energy_per_byte_uJ': 0, 'mean_power_energy_mJ': 0}
+    duration_ms = t['timestamp_ms'].max() - t['timestamp_ms'].min()
+    energy_mJ = t['power_mW'].mean() * duration_ms / 1000
+    return {
+        'window_duration_ms': duration_ms,
+        'window_energy_mJ': energy_mJ,
+        # per byte of a single payload, not of all iterations
+        'window_energy_per_byte_uJ': energy_mJ * 1000 / tr.payload_size if tr.payload_size > 0 else 0,
+        'mean_power_energy_mJ': tr.df['power_mW'].mean() * tr.span_ms / 1000,
+    }
+
+
+@metric('throughput_kbps', 'energy_per_byte_uJ')
+def efficiency(tr):
+    """Throughput over the transfer phase and total energy per payload byte sent."""
+    transfer_ms = len(tr.transfer) * tr.dt if len(tr.transfer) else 0
+    total_bytes = tr.payload_size * tr.iterations
+    return {
+        'throughput_kbps': total_bytes * 8 / (transfer_ms / 1000) / 1000 if transfer_ms > 0 else 0,
+        'energy_per_byte_uJ': tr.energy_mJ * 1000 / total_bytes if total_bytes > 0 else 0,
+    }
+
+
+# --- engine ---
+
+def columns(names=None):
+    """Output columns for the selected metrics (all by default)."""
+    names = list(METRICS) if names is None else names
+    return RUN_COLUMNS + [c for n in names for c in METRICS[n][1]]
+
+
+def trace_metrics(payload_size, mode, csv_file, campaign='', repetition=1, names=None):
+    """Load one trace and run every selected metric on it; None if it fails."""
+    try:
+        tr = Trace(load_trace(csv_file), payload_size, mode)
+        row = {'mode': mode, 'payload_bytes': payload_size, 'campaign': campaign, 'repetition': repetition}
+        for name in (METRICS if names is None else names):
+            row.update(METRICS[name][0](tr))
+        return row
+    except Exception as e:
+        print(f"Error: {csv_file}: {e}")
+        return None
+
+
+def metrics_table(workers=1, data_dir=DATA_DIR, **filters):
+    """One row per run with every registered metric, ordered by payload size then mode.
+
+    filters (campaign=, repetition=, device=, where=, ...) select runs from the catalog.
+    """
+    rows = map_test_files(trace_metrics, data_dir, workers, **filters)
+    return pd.DataFrame(rows, columns=columns())
+
+
+def mean_over_runs(df):
+    """One row per (mode, payload_bytes): numeric columns averaged over its runs, plus `runs`.
+
+    Analyses that compare modes at a size use this, so repeated runs count
+    equally instead of whichever row comes first.
+    """
+    grouped = df.groupby(['mode', 'payload_bytes'], sort=False)
+    out = grouped.mean(numeric_only=True).drop(columns='repetition', errors='ignore')
+    out.insert(0, 'runs', grouped.size())
+    return out.reset_index()
+
+
+def runs_note(means):
+    """'(mean of N runs per mode and size)' if mean_over_runs() averaged anything, else ''."""
+    lo, hi = int(means['runs'].min()), int(means['runs'].max())
+    if hi <= 1:
+        return ""
+    return f"(mean of {lo if lo == hi else f'{lo}-{hi}'} runs per mode and size)"
+
+
+def view(table, mapping, where=None):
+    """Select and rename table columns: mapping is {output column: table column}."""
+    if where is not None:
+        table = table[where(table)]
+    return table[list(mapping.values())].set_axis(list(mapping), axis=1).reset_index(drop=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('-j', '--workers', type=int, default=1,
+                        help='worker processes for ingestion (0 = one per CPU)')
+    parser.add_argument('--list', action='store_true', help='list registered metrics and exit')
+    add_run_args(parser)
+    args = parser.parse_args()
+
+    if args.list:
+        for name, (func, cols) in METRICS.items():
+            print(f"{name:<18} {', '.join(cols)}")
+        return
+
+    table = metrics_table(args.workers, **run_filters(args))
+    print(table.to_string(index=False))
+    output_file = RESULTS_DIR / 'metrics.csv'
+    table.to_csv(output_file, index=False)
+    print(f"\nSaved: {output_file}")
+    print_cache_stats()
+
+
+if __name__ == "__main__":
+    main()
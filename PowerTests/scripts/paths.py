@@ -0,0 +1,40 @@
+"""Default PowerTests directories, and the command-line options that override them or select runs.
+
+Kept to the standard library so any script can import it, however light
+it needs to start.
+"""
+
+from pathlib import Path
+
+BASE_DIR = Path(__file__).parent.parent
+DATA_DIR = BASE_DIR / "Data"
+RESULTS_DIR = BASE_DIR / "results"
+IMAGES_DIR = BASE_DIR / "images"
+
+# catalog.py filters add_run_args() exposes
+RUN_FILTERS = ('campaign', 'repetition', 'device', 'firmware', 'where')
+
+
+def add_path_args(parser):
+    """--data-dir/--results-dir/--images-dir, shared by xifi.py and the per-analysis scripts."""
+    parser.add_argument('--data-dir', type=Path, default=DATA_DIR,
+                        help="tree of '<size> Bytes/<mode>.csv' traces (default: %(default)s)")
+    parser.add_argument('--results-dir', type=Path, default=RESULTS_DIR,
+                        help="where result CSVs go (default: %(default)s)")
+    parser.add_argument('--images-dir', type=Path, default=IMAGES_DIR,
+                        help="where figures go (default: %(default)s)")
+
+
+def add_run_args(parser):
+    """--campaign/--repetition/--device/--firmware/--where: which catalog runs an analysis reads."""
+    group = parser.add_argument_group("run selection (see catalog.py)")
+    group.add_argument('--campaign', action='append', help="repeatable; '' is the top-level runs")
+    group.add_argument('--repetition', type=int, action='append', help="repeatable")
+    group.add_argument('--device', action='append', help="repeatable")
+    group.add_argument('--firmware', action='append', help="repeatable")
+    group.add_argument('--where', help="extra SQL condition, e.g. \"run_date >= '2024-11-01'\"")
+
+
+def run_filters(args):
+    """Catalog filters from the add_run_args() options that were given."""
+    return {name: getattr(args, name) for name in RUN_FILTERS if getattr(args, name, None) is not None}
@@ -1,22 +1,43 @@
 #!/usr/bin/env python3
-"""Plot power measurement data from XiFi Logger CSV files."""
+"""Plot power measurement data from XiFi Logger CSV files.
 
-import pandas as pd
+    python plot_power.py Data/512\\ Bytes/WiFi.csv          # plot + idle/transfer stats
+    python plot_power.py --batch -j 0                      # every trace under Data/
+    python plot_power.py --batch Data/capture/*.csv --force
+
+Batch mode renders each trace downsampled with LTTB to about two points per
+horizontal pixel (marker edges kept exact, see downsample.py), in a process
+pool where each worker reuses one figure, and skips PNGs that are newer
+than both their CSV and the plotting code.
+"""
+
+import argparse
 import matplotlib
 matplotlib.use('Agg')
 import matplotlib.pyplot as plt
-import sys
+from matplotlib.patches import Patch
 import os
+import time
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 
-BASE_DIR = Path(__file__).parent.parent
-IMAGES_DIR = BASE_DIR / "images"
+import downsample
+from downsample import lttb_segments
+from ingest import iter_test_files, resolve_workers
+from paths import DATA_DIR, IMAGES_DIR, add_path_args, add_run_args, run_filters
+from trace_cache import load_trace, load_trace_arrays, print_cache_stats
+
+TRACES_DIR = IMAGES_DIR / "traces"
+
+FIGSIZE = (12, 8)
+DPI = 150
+POINTS_PER_PIXEL = 2
 
 def plot_single_test(csv_path):
     """Plot a single test CSV file."""
-    df = pd.read_csv(csv_path)
+    df = load_trace(csv_path)
 
-    fig, axes = plt.subplots(3, 1, figsize=(12, 8), sharex=True)
+    fig, axes = plt.subplots(3, 1, figsize=FIGSIZE, sharex=True)
     fig.suptitle(os.path.basename(csv_path), fontsize=14)
 
     time_s = df['timestamp_ms'] / 1000
@@ -63,19 +84,160 @@ def plot_single_test(csv_path):
 
     return df
 
-if __name__ == "__main__":
-    if len(sys.argv) < 2:
-        print("Usage: python plot_power.py <csv_file>")
-        print("       python plot_power.py <csv_file1> <csv_file2> ...")
-        sys.exit(1)
+class FigureTemplate:
+    """The plot_single_test() layout, built once and refilled for every trace."""
+
+    def __init__(self):
+        self.fig, self.axes = plt.subplots(3, 1, figsize=FIGSIZE, sharex=True)
+        self.title = self.fig.suptitle("", fontsize=14)
+        styles = ['b-', 'r-', 'g-']
+        self.lines = [ax.plot([], [], style, linewidth=0.5)[0]
+                      for ax, style in zip(self.axes, styles)]
+        for ax, label in zip(self.axes, ['Current (mA)', 'Power (mW)', 'Voltage (V)']):
+            ax.set_ylabel(label)
+            ax.grid(True, alpha=0.3)
+        self.axes[0].legend(handles=[Patch(color='green', alpha=0.3, label='Transfer')])
+        self.axes[2].set_xlabel('Time (s)')
+        self.fills = []
+
+    def points(self):
+        """Point budget for one line: POINTS_PER_PIXEL per horizontal pixel of the axes."""
+        width_px = self.axes[0].get_position().width * FIGSIZE[0] * DPI
+        return int(width_px * POINTS_PER_PIXEL)
+
+    def render(self, csv_path, out_path, points=None):
+        """Draw one trace and save it; returns the number of points drawn per line."""
+        cols = load_trace_arrays(csv_path)
+        time_s = cols['timestamp_ms'] / 1000
+        marker = cols['marker']
+        points = points or self.points()
+
+        for fill in self.fills:
+            fill.remove()
+        self.fills = []
+        # batch runs cover many WiFi.csv files, so include the size directory
+        self.title.set_text(f"{Path(csv_path).parent.name}/{Path(csv_path).name}")
+
+        drawn = 0
+        for i, (ax, line, name) in enumerate(zip(self.axes, self.lines,
+                                                 ['current_mA', 'power_mW', 'voltage_V'])):
+            y = cols[name]
+            idx = lttb_segments(time_s, y, marker, points)
+            line.set_data(time_s[idx], y[idx])
+            if i < 2:
+                self.fills.append(ax.fill_between(time_s[idx], 0, y[idx], where=marker[idx] == 1,
+                                                  alpha=0.3, color='green'))
+            ax.relim()
+            ax.autoscale_view()
+            drawn = max(drawn, len(idx))
+
+        self.fig.tight_layout()
+        self.fig.savefig(out_path, dpi=DPI)
+        return drawn
+
+
+_template = None
+
+
+def _code_mtime():
+    return max(os.stat(__file__).st_mtime, os.stat(downsample.__file__).st_mtime)
+
+
+def output_path(csv_path, out_dir=TRACES_DIR):
+    """images/traces/<size dir>_<mode>.png, e.g. 512Bytes_WiFi.png."""
+    csv_path = Path(csv_path)
+    return Path(out_dir) / f"{csv_path.parent.name.replace(' ', '')}_{csv_path.stem.replace(' ', '')}.png"
 
-    for csv_path in sys.argv[1:]:
+
+def is_fresh(csv_path, out_path, code_mtime):
+    try:
+        out_mtime = os.stat(out_path).st_mtime
+    except FileNotFoundError:
+        return False
+    return out_mtime >= max(os.stat(csv_path).st_mtime, code_mtime)
+
+
+def render_job(args):
+    """Worker entry point: (csv, out, points, force) -> (csv, out, status, seconds, points)."""
+    global _template
+    csv_path, out_path, points, force = args
+    if not force and is_fresh(csv_path, out_path, _code_mtime()):
+        return csv_path, out_path, 'fresh', 0.0, 0
+    t0 = time.perf_counter()
+    if _template is None:
+        _template = FigureTemplate()
+    drawn = _template.render(csv_path, out_path, points)
+    return csv_path, out_path, 'rendered', time.perf_counter() - t0, drawn
+
+
+def render_batch(csv_paths=None, out_dir=TRACES_DIR, workers=1, force=False, points=None,
+                 data_dir=DATA_DIR, **filters):
+    """Render every CSV (default: the data_dir runs matching filters); returns render_job() results in order."""
+    if csv_paths is None:
+        csv_paths = [path for _, _, path in iter_test_files(data_dir, **filters)]
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    jobs = [(str(p), str(output_path(p, out_dir)), points, force) for p in csv_paths]
+
+    workers = min(resolve_workers(workers), max(1, len(jobs)))
+    if workers == 1:
+        return [render_job(job) for job in jobs]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(render_job, jobs))
+
+
+def plot_files(csv_paths, images_dir=IMAGES_DIR):
+    """Full-resolution plot + stats for each CSV, saved as <images_dir>/<name>_plot.png."""
+    for csv_path in csv_paths:
         if os.path.exists(csv_path):
             plot_single_test(csv_path)
             # Save plot to images directory
             basename = os.path.splitext(os.path.basename(csv_path))[0]
-            output_path = IMAGES_DIR / f"{basename}_plot.png"
-            plt.savefig(output_path, dpi=150)
-            print(f"\nSaved: {output_path}")
+            png_path = Path(images_dir) / f"{basename}_plot.png"
+            png_path.parent.mkdir(parents=True, exist_ok=True)
+            plt.savefig(png_path, dpi=DPI)
+            plt.close()
+            print(f"\nSaved: {png_path}")
         else:
             print(f"File not found: {csv_path}")
+
+
+def run(args):
+    """Batch or single-file plotting for parsed arguments (shared with xifi.py plot)."""
+    if args.batch:
+        t0 = time.perf_counter()
+        out_dir = args.out_dir or Path(args.images_dir) / TRACES_DIR.name
+        results = render_batch(args.csv or None, out_dir, args.workers, args.force, args.points,
+                               args.data_dir, **run_filters(args))
+        rendered = [r for r in results if r[2] == 'rendered']
+        for csv_path, out_path, _, seconds, drawn in rendered:
+            print(f"{out_path}  ({drawn} pts, {seconds:.2f}s)")
+        print(f"\n{len(rendered)} rendered, {len(results) - len(rendered)} up to date, "
+              f"{time.perf_counter() - t0:.2f}s total")
+        return
+
+    plot_files(args.csv, args.images_dir)
+    print_cache_stats()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Plot power measurement data from XiFi Logger CSV files")
+    parser.add_argument('csv', nargs='*', help="Logger CSV files")
+    parser.add_argument('--batch', action='store_true',
+                        help="downsampled batch rendering (default: every CSV under --data-dir)")
+    parser.add_argument('-j', '--workers', type=int, default=1, help="batch worker processes (0 = one per CPU)")
+    parser.add_argument('--force', action='store_true', help="re-render up-to-date PNGs")
+    parser.add_argument('--points', type=int, default=None, help="points per line (default: 2 per pixel)")
+    parser.add_argument('--out-dir', default=None, help="batch output directory (default: <images-dir>/traces)")
+    add_path_args(parser)
+    add_run_args(parser)
+    args = parser.parse_args()
+
+    if not args.batch and not args.csv:
+        parser.print_usage()
+        raise SystemExit(1)
+    run(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""Split logger traces into constant-marker segments and integrate energy per segment.
+
+Every 0->1 / 1->0 marker edge starts a new segment. Energy is integrated
+with the trapezoidal rule over the real sample timestamps, so jitter in the
+logger's sample interval doesn't bias the result. Everything is vectorized:
+one pass of np.diff / np.cumsum over the trace, no per-sample Python loop.
+
+Sample interval k (t[k] -> t[k+1]) is attributed to the segment that owns
+sample k, so segments tile the whole trace and their energies sum to the
+trapezoidal energy of the full trace.
+"""
+
+import sys
+
+import numpy as np
+import pandas as pd
+
+from ingest import iter_test_files
+from paths import DATA_DIR, RESULTS_DIR
+from trace_cache import load_trace_arrays, print_cache_stats
+
+SEGMENT_COLUMNS = ['segment', 'marker', 'start_idx', 'samples',
+                   'start_ms', 'end_ms', 'duration_ms', 'energy_mJ', 'avg_power_mW']
+
+
+def marker_edges(marker):
+    """Indices i where marker[i] != marker[i-1] (start of every segment but the first)."""
+    marker = np.asarray(marker)
+    return np.flatnonzero(marker[1:] != marker[:-1]) + 1
+
+
+def segment_trace(timestamp_ms, power_mW, marker):
+    """Return {column: ndarray} with one entry per constant-marker segment.
+
+    Energy is mW x ms = uJ, reported in mJ. The last segment ends at the
+    last sample; every other segment ends at the first sample of the next.
+    """
+    t = np.asarray(timestamp_ms, dtype=np.float64)
+    p = np.asarray(power_mW, dtype=np.float64)
+    marker = np.asarray(marker)
+    n = len(t)
+
+    if n == 0:
+        return {name: np.empty(0) for name in SEGMENT_COLUMNS}
+
+    edges = marker_edges(marker)
+    starts = np.concatenate(([0], edges))
+    ends = np.concatenate((edges, [n - 1]))  # sample index where each segment's time span ends
+
+    # Cumulative trapezoidal energy, C[k] = energy from t[0] to t[k]
+    interval_uJ = (p[1:] + p[:-1]) * 0.5 * np.diff(t)
+    cum_uJ = np.concatenate(([0.0], np.cumsum(interval_uJ)))
+
+    energy_mJ = (cum_uJ[ends] - cum_uJ[starts]) / 1000
+    start_ms = t[starts]
+    end_ms = t[ends]
+    duration_ms = end_ms - start_ms
+    samples = np.diff(np.concatenate((starts, [n])))
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        avg_power = np.where(duration_ms > 0, energy_mJ * 1000 / duration_ms, p[starts])
+
+    return {
+        'segment': np.arange(len(starts)),
+        'marker': marker[starts],
+        'start_idx': starts,
+        'samples': samples,
+        'start_ms': start_ms,
+        'end_ms': end_ms,
+        'duration_ms': duration_ms,
+        'energy_mJ': energy_mJ,
+        'avg_power_mW': avg_power,
+    }
+
+
+def segment_frame(timestamp_ms, power_mW, marker):
+    """segment_trace() as a DataFrame."""
+    return pd.DataFrame(segment_trace(timestamp_ms, power_mW, marker), columns=SEGMENT_COLUMNS)
+
+
+def trace_energy_mJ(timestamp_ms, power_mW):
+    """Trapezoidal energy of a whole trace in mJ."""
+    t = np.asarray(timestamp_ms, dtype=np.float64)
+    p = np.asarray(power_mW, dtype=np.float64)
+    return float(np.sum((p[1:] + p[:-1]) * 0.5 * np.diff(t))) / 1000
+
+
+def segment_file(csv_file):
+    """Load one logger CSV (through the trace cache) and segment it."""
+    cols = load_trace_arrays(csv_file)
+    return segment_frame(cols['timestamp_ms'], cols['power_mW'], cols['marker'])
+
+
+def segment_all(data_dir=DATA_DIR):
+    """One row per segment for every test under data_dir."""
+    frames = []
+    for payload_size, mode, csv_file in iter_test_files(data_dir):
+        seg = segment_file(csv_file)
+        seg.insert(0, 'payload_bytes', payload_size)
+        seg.insert(0, 'mode', mode)
+        frames.append(seg)
+    if not frames:
+        return pd.DataFrame(columns=['mode', 'payload_bytes'] + SEGMENT_COLUMNS)
+    return pd.concat(frames, ignore_index=True)
+
+
+def main():
+    if len(sys.argv) > 1:
+        for csv_path in sys.argv[1:]:
+            print(f"\n=== {csv_path} ===")
+            print(segment_file(csv_path).to_string(index=False))
+        print_cache_stats()
+        return
+
+    df = segment_all()
+    if len(df) == 0:
+        print("No data found!")
+        return
+
+    transfer = df[df['marker'] == 1]
+    print(f"{len(df)} segments ({len(transfer)} transfer) across "
+          f"{df.groupby(['mode', 'payload_bytes']).ngroups} tests")
+
+    print("\n### TRANSFER BURSTS ###\n")
+    summary = transfer.groupby(['mode', 'payload_bytes']).agg(
+        bursts=('segment', 'size'),
+        burst_energy_mJ=('energy_mJ', 'mean'),
+        burst_duration_ms=('duration_ms', 'mean'),
+        transfer_energy_mJ=('energy_mJ', 'sum'),
+    ).reset_index()
+    print(summary.to_string(index=False))
+
+    output_file = RESULTS_DIR / 'segments.csv'
+    df.to_csv(output_file, index=False)
+    print(f"\nSaved: {output_file}")
+    print_cache_stats()
+
+
+if __name__ == "__main__":
+    main()
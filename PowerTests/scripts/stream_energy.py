@@ -0,0 +1,315 @@
+#!/usr/bin/env python3
+"""Incremental energy analysis of a live Logger_ESP CSV stream.
+
+Consumes the `timestamp_ms,voltage_V,current_mA,power_mW,marker` lines that
+the Logger prints for its `csv` command (between `>>> CSV START <<<` and
+`>>> CSV END <<<`) or serves on `/csv`, one line or chunk at a time. Only
+running sums, Welford mean/variance accumulators and a histogram of sample
+intervals are kept, so memory stays bounded however long the capture runs.
+
+The sample-interval histogram gives the exact median dt, which keeps the
+results identical to analyze_full_energy() on the same data.
+"""
+
+import argparse
+import contextlib
+import math
+import sys
+import time
+from collections import Counter
+
+from logger_format import CSV_END, CSV_HEADER, CSV_START
+from metrics import ITERATIONS
+
+
+class Welford:
+    """Running mean and sample standard deviation."""
+
+    __slots__ = ('n', 'mean', 'm2')
+
+    def __init__(self):
+        self.n = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+
+    def update(self, x):
+        self.n += 1
+        delta = x - self.mean
+        self.mean += delta / self.n
+        self.m2 += delta * (x - self.mean)
+
+    @property
+    def std(self):
+        # ddof=1 to match pandas .std()
+        return math.sqrt(self.m2 / (self.n - 1)) if self.n > 1 else float('nan')
+
+
+class PhaseStats:
+    """Accumulators for one marker phase (transfer or overhead)."""
+
+    def __init__(self):
+        self.samples = 0
+        self.power_sum = 0.0
+        self.power = Welford()
+        self.current = Welford()
+
+    def update(self, current_mA, power_mW):
+        self.samples += 1
+        self.power_sum += power_mW
+        self.power.update(power_mW)
+        self.current.update(current_mA)
+
+
+def hist_median(hist):
+    """Exact median of the values counted in a {value: count} histogram."""
+    n = sum(hist.values())
+    if n == 0:
+        return float('nan')
+    lo_rank, hi_rank = (n - 1) // 2, n // 2
+    lo = hi = None
+    seen = 0
+    for value in sorted(hist):
+        seen += hist[value]
+        if lo is None and seen > lo_rank:
+            lo = value
+        if seen > hi_rank:
+            hi = value
+            break
+    return (lo + hi) / 2
+
+
+class StreamingEnergy:
+    """Bounded-memory equivalent of analyze_full_energy() for one test."""
+
+    def __init__(self, payload_size=0, mode=None, iterations=ITERATIONS):
+        self.payload_size = payload_size
+        self.mode = mode
+        self.iterations = iterations
+        self.phases = {0: PhaseStats(), 1: PhaseStats()}
+        self.dt_hist = Counter()
+        self.first_ts = None
+        self.last_ts = None
+        self.bad_lines = 0
+        self._partial = ""
+
+    @property
+    def samples(self):
+        return self.phases[0].samples + self.phases[1].samples
+
+    def add_sample(self, timestamp_ms, current_mA, power_mW, marker):
+        if self.last_ts is not None:
+            self.dt_hist[timestamp_ms - self.last_ts] += 1
+        else:
+            self.first_ts = timestamp_ms
+        self.last_ts = timestamp_ms
+        self.phases[1 if marker else 0].update(current_mA, power_mW)
+
+    def update_line(self, line):
+        """Feed one CSV line; header, framing and status lines are ignored."""
+        line = line.strip()
+        if not line or not line[0].isdigit():
+            return False
+        parts = line.split(',')
+        if len(parts) != 5:
+            self.bad_lines += 1
+            return False
+        try:
+            self.add_sample(int(parts[0]), float(parts[2]), float(parts[3]), int(parts[4]))
+        except ValueError:
+            self.bad_lines += 1
+            return False
+        return True
+
+    def update_chunk(self, text):
+        """Feed an arbitrary chunk of text; a trailing partial line is held back."""
+        text = self._partial + text
+        lines = text.split('\n')
+        self._partial = lines.pop()
+        for line in lines:
+            self.update_line(line)
+
+    def flush(self):
+        if self._partial:
+            self.update_line(self._partial)
+            self._partial = ""
+
+    def feed(self, lines):
+        for line in lines:
+            self.update_line(line)
+        return self
+
+    def median_dt(self):
+        """Exact median of sample intervals (same as Series.diff().median())."""
+        return hist_median(self.dt_hist)
+
+    def result(self):
+        """Metric record with the same keys as analyze_full_energy()."""
+        dt = self.median_dt()
+        transfer, overhead = self.phases[1], self.phases[0]
+        payload_size = self.payload_size
+
+        total_duration_ms = (self.last_ts - self.first_ts) if self.samples else 0
+        total_energy_mJ = (transfer.power_sum + overhead.power_sum) * dt / 1000
+
+        transfer_duration_ms = transfer.samples * dt if transfer.samples > 0 else 0
+        transfer_energy_mJ = transfer.power_sum * dt / 1000 if transfer.samples > 0 else 0
+        overhead_duration_ms = overhead.samples * dt if overhead.samples > 0 else 0
+        overhead_energy_mJ = overhead.power_sum * dt / 1000 if overhead.samples > 0 else 0
+
+        throughput_bps = ((payload_size * 8 * self.iterations) / (transfer_duration_ms / 1000)
+                          if transfer_duration_ms > 0 else 0)
+
+        return {
+            'mode': self.mode,
+            'payload_bytes': payload_size,
+            'total_duration_s': total_duration_ms / 1000,
+            'transfer_duration_s': transfer_duration_ms / 1000,
+            'overhead_duration_s': overhead_duration_ms / 1000,
+            'total_energy_mJ': total_energy_mJ,
+            'transfer_energy_mJ': transfer_energy_mJ,
+            'overhead_energy_mJ': overhead_energy_mJ,
+            'transfer_avg_power_mW': transfer.power.mean if transfer.samples > 0 else 0,
+            'overhead_avg_power_mW': overhead.power.mean if overhead.samples > 0 else 0,
+            'throughput_kbps': throughput_bps / 1000,
+            'energy_per_byte_uJ': ((total_energy_mJ * 1000) / (payload_size * self.iterations)
+                                   if payload_size > 0 else 0),
+        }
+
+    def phase_summary(self):
+        """Per-phase mean ± std, as printed by plot_power.py."""
+        out = {}
+        for marker, name in ((0, 'idle'), (1, 'transfer')):
+            ph = self.phases[marker]
+            out[name] = {
+                'samples': ph.samples,
+                'current_mA': (ph.current.mean, ph.current.std),
+                'power_mW': (ph.power.mean, ph.power.std),
+            }
+        return out
+
+
+def csv_section(lines):
+    """Yield only the data lines of a Logger dump.
+
+    Everything before the first `>>> CSV START <<<` marker or CSV header line
+    (boot banner, command echoes) is dropped, and a marked section ends at
+    `>>> CSV END <<<`. A bare CSV (file or /csv body) starts with its header,
+    so it is passed through whole.
+    """
+    in_section = False
+    for line in lines:
+        stripped = line.strip()
+        if stripped == CSV_START:
+            in_section = True
+            continue
+        if stripped == CSV_END:
+            if in_section:
+                return
+            continue
+        if stripped == CSV_HEADER:
+            in_section = True
+            continue
+        if in_section:
+            yield stripped
+
+
+def serial_lines(port, baud=115200, request=True, idle_s=10.0):
+    """Yield decoded lines from the Logger's serial port, sending `csv` first.
+
+    Raises TimeoutError if nothing arrives for idle_s seconds before the
+    CSV end marker (None waits forever).
+    """
+    import serial
+
+    with serial.Serial(port, baud, timeout=1) as ser:
+        if request:
+            ser.write(b"csv\n")
+        last = time.monotonic()
+        while True:
+            raw = ser.readline()
+            if not raw:
+                if idle_s is not None and time.monotonic() - last > idle_s:
+                    raise TimeoutError(f"no data from {port} for {idle_s:g}s before '{CSV_END}'")
+                continue
+            last = time.monotonic()
+            line = raw.decode(errors='replace')
+            yield line
+            if line.strip() == CSV_END:
+                return
+
+
+def http_lines(url, chunk_size=4096):
+    """Yield lines from the Logger's /csv endpoint as they arrive."""
+    from urllib.request import urlopen
+
+    with urlopen(url) as resp:
+        partial = b""
+        while True:
+            chunk = resp.read(chunk_size)
+            if not chunk:
+                break
+            partial += chunk
+            *lines, partial = partial.split(b"\n")
+            for line in lines:
+                yield line.decode(errors='replace')
+        if partial:
+            yield partial.decode(errors='replace')
+
+
+def print_progress(acc):
+    r = acc.result()
+    print(f"[{acc.samples} samples] total {r['total_energy_mJ']:.1f} mJ "
+          f"(transfer {r['transfer_energy_mJ']:.1f}, overhead {r['overhead_energy_mJ']:.1f}) "
+          f"over {r['total_duration_s']:.1f}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    src = parser.add_mutually_exclusive_group(required=True)
+    src.add_argument('--serial', metavar='PORT', help="Logger serial port (sends 'csv')")
+    src.add_argument('--url', help="Logger /csv URL, e.g. http://192.168.4.2/csv")
+    src.add_argument('--file', help="Saved dump or CSV ('-' for stdin)")
+    parser.add_argument('--baud', type=int, default=115200)
+    parser.add_argument('--size', type=int, default=0, help="payload bytes per iteration")
+    parser.add_argument('--mode', default=None, help="BLE_ADV, BLE_CONN or WiFi")
+    parser.add_argument('--every', type=int, default=1000,
+                        help="print running totals every N samples (0 = only at the end)")
+    parser.add_argument('--timeout', type=float, default=10.0,
+                        help="--serial: give up after this many idle seconds (default: %(default)s)")
+    args = parser.parse_args()
+
+    acc = StreamingEnergy(args.size, args.mode)
+    with contextlib.ExitStack() as stack:
+        if args.serial:
+            lines = serial_lines(args.serial, args.baud, idle_s=args.timeout)
+        elif args.url:
+            lines = http_lines(args.url)
+        elif args.file == '-':
+            lines = sys.stdin
+        else:
+            lines = stack.enter_context(open(args.file))
+        try:
+            for line in csv_section(lines):
+                if acc.update_line(line) and args.every and acc.samples % args.every == 0:
+                    print_progress(acc)
+        except TimeoutError as e:
+            print(f"Warning: {e}; the totals below cover what arrived")
+
+    if acc.samples == 0:
+        print("No samples received!")
+        return
+
+    print_progress(acc)
+    print()
+    for key, value in acc.result().items():
+        print(f"{key:<24} {value}")
+    for name, ph in acc.phase_summary().items():
+        print(f"{name:<9} {ph['samples']} samples, "
+              f"{ph['current_mA'][0]:.2f} ± {ph['current_mA'][1]:.2f} mA, "
+              f"{ph['power_mW'][0]:.2f} ± {ph['power_mW'][1]:.2f} mW")
+    if acc.bad_lines:
+        print(f"Skipped {acc.bad_lines} malformed lines")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+"""Synthetic Logger_ESP traces for benchmarking at scale.
+
+Generates traces in the Logger CSV format whose phases follow the measured
+tests: idle, radio init spike, connection setup, transfer (marker=1, with
+per-packet bursts) and teardown. The per-mode levels and durations are read
+off the traces in Data/ (e.g. 85 mW idle, ~1.3 W BLE init spike, 100 mW
+WiFi transfer floor with ~310 mW bursts). The test cycle repeats until the
+requested sample count is reached, so a trace can hold thousands or hundreds
+of millions of samples. Generation is vectorized and written in chunks,
+which keeps memory flat.
+
+    python synth_trace.py out.csv --samples 10M --mode WiFi
+    python synth_trace.py --tree /tmp/synth/Data --samples 1M   # Data/<size>/<mode>.csv layout
+"""
+
+import argparse
+from pathlib import Path
+
+import numpy as np
+
+from logger_format import CSV_HEADER
+
+INTERVAL_MS = 10          # the sample interval of the recorded tests
+CHUNK_SAMPLES = 1 << 20
+MAX_TIMESTAMP_MS = 2**31 - 1  # trace_cache stores timestamps as int32
+
+# (power mW, duration ms, marker) per phase, plus transfer burst level/probability
+PROFILES = {
+    'WiFi': {
+        'phases': [(85, 4000, 0), (1000, 500, 0), (100, 1500, 0), (100, 5000, 1), (138, 1500, 0)],
+        'burst_mW': 310, 'burst_prob': 0.4,
+    },
+    'BLE_CONN': {
+        'phases': [(85, 4000, 0), (1270, 300, 0), (282, 5500, 0), (192, 5000, 1), (226, 2000, 0)],
+        'burst_mW': 600, 'burst_prob': 0.05,
+    },
+    'BLE_ADV': {
+        'phases': [(85, 2500, 0), (1270, 300, 0), (190, 700, 0), (190, 13000, 1), (225, 2900, 0)],
+        'burst_mW': 540, 'burst_prob': 0.05,
+    },
+}
+
+IDLE_VOLTAGE = 3.345
+SAG_V_PER_MA = 0.0004     # bus voltage drop per mA drawn
+NOISE_MW = 1.5
+
+
+def parse_count(text):
+    """'10k', '2.5M', '100M' or plain integers -> int."""
+    text = str(text).strip()
+    scale = {'k': 10**3, 'm': 10**6, 'g': 10**9}.get(text[-1].lower(), 1)
+    return int(float(text[:-1] if scale > 1 else text) * scale)
+
+
+def cycle_template(mode, interval_ms=INTERVAL_MS, iterations=None):
+    """(base power, marker, is_transfer) arrays for one test cycle.
+
+    iterations toggles the marker once per packet inside the transfer
+    phase (iterations high/low pairs) instead of holding it high.
+    """
+    profile = PROFILES[mode]
+    power, marker = [], []
+    for mW, ms, mark in profile['phases']:
+        n = max(1, ms // interval_ms)
+        power.append(np.full(n, mW, dtype=np.float64))
+        if mark and iterations:
+            marker.append(((np.arange(n) * 2 * iterations // n) % 2 == 0).astype(np.uint8))
+        else:
+            marker.append(np.full(n, mark, dtype=np.uint8))
+    power = np.concatenate(power)
+    transfer = np.concatenate([np.full(max(1, ms // interval_ms), mark, dtype=bool)
+                               for _, ms, mark in profile['phases']])
+    return power, np.concatenate(marker), transfer
+
+
+def generate(samples, mode='WiFi', interval_ms=INTERVAL_MS, iterations=None, seed=0,
+             chunk=CHUNK_SAMPLES):
+    """Yield {column: array} chunks totalling `samples` rows in the Logger CSV schema."""
+    if (samples - 1) * interval_ms > MAX_TIMESTAMP_MS:
+        raise ValueError(f"{samples} samples at {interval_ms} ms overflow int32 timestamps; "
+                         f"use a shorter interval or fewer samples")
+    rng = np.random.default_rng(seed)
+    base, marker_t, transfer_t = cycle_template(mode, interval_ms, iterations)
+    profile = PROFILES[mode]
+    period = len(base)
+
+    for start in range(0, samples, chunk):
+        idx = np.arange(start, min(start + chunk, samples))
+        phase = idx % period
+        power = base[phase] + rng.normal(0, NOISE_MW, len(idx))
+        bursts = transfer_t[phase] & (rng.random(len(idx)) < profile['burst_prob'])
+        power[bursts] = profile['burst_mW'] + rng.normal(0, 10, int(bursts.sum()))
+        # INA219 quantizes power to 1 mW at this calibration
+        power = np.round(np.maximum(power, 0))
+        voltage = IDLE_VOLTAGE - SAG_V_PER_MA * power / IDLE_VOLTAGE
+        # +-1 ms jitter like millis() scheduling, still strictly increasing
+        jitter = rng.integers(-1, 2, len(idx)) if interval_ms > 2 else 0
+        yield {
+            'timestamp_ms': idx * interval_ms + 1 + jitter,
+            'voltage_V': voltage,
+            'current_mA': power / voltage,
+            'power_mW': power,
+            'marker': marker_t[phase],
+        }
+
+
+def format_chunk(cols):
+    """Logger CSV text for one chunk (same rounding as the firmware's printf)."""
+    n = len(cols['timestamp_ms'])
+    table = np.column_stack([cols['timestamp_ms'], cols['voltage_V'], cols['current_mA'],
+                             cols['power_mW'], cols['marker']]).ravel().tolist()
+    return ("%d,%.3f,%.2f,%.2f,%d\n" * n) % tuple(table)
+
+
+def write_csv(path, samples, mode='WiFi', **kw):
+    """Write one synthetic trace to path; returns the number of bytes written."""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    size = 0
+    with open(path, 'w') as fh:
+        fh.write(CSV_HEADER + "\n")
+        for cols in generate(samples, mode, **kw):
+            size += fh.write(format_chunk(cols))
+    return size
+
+
+def write_tree(data_dir, samples, modes=tuple(PROFILES), sizes=(512,), seed=0, **kw):
+    """Write a Data/<size> Bytes/<mode>.csv tree with `samples` rows per file."""
+    paths = []
+    for i, size in enumerate(sizes):
+        for j, mode in enumerate(modes):
+            path = Path(data_dir) / f"{size} Bytes" / f"{mode}.csv"
+            write_csv(path, samples, mode, seed=seed + 100 * i + j, **kw)
+            paths.append(path)
+    return paths
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('csv', nargs='?', help="output CSV (omit with --tree)")
+    parser.add_argument('--tree', help="write a Data/<size> Bytes/<mode>.csv tree here instead")
+    parser.add_argument('--samples', default='100k', help="samples per trace, e.g. 50k, 10M")
+    parser.add_argument('--mode', choices=sorted(PROFILES), default='WiFi')
+    parser.add_argument('--interval', type=int, default=INTERVAL_MS, help="sample interval (ms)")
+    parser.add_argument('--iterations', type=int, default=None,
+                        help="toggle the marker per packet (N packets per cycle) instead of holding it high")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    samples = parse_count(args.samples)
+    kw = {'interval_ms': args.interval, 'iterations': args.iterations}
+    if args.tree:
+        paths = write_tree(args.tree, samples, seed=args.seed, **kw)
+        print(f"Wrote {len(paths)} traces x {samples} samples under {args.tree}")
+    elif args.csv:
+        size = write_csv(args.csv, samples, args.mode, seed=args.seed, **kw)
+        print(f"Wrote {samples} samples ({size / 1e6:.1f} MB) to {args.csv}")
+    else:
+        parser.error("give an output CSV or --tree")
+
+
+if __name__ == "__main__":
+    main()
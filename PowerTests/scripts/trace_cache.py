@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+"""Columnar binary cache for XiFi Logger CSV traces.
+
+Each logger CSV is parsed once and stored as one raw .npy file per column
+(int32 timestamp_ms, float32 voltage/current/power, uint8 marker). Later
+runs memory-map those columns instead of re-parsing the CSV. An entry is
+rebuilt only when the source file's size/mtime changes *and* its content
+hash no longer matches.
+
+The CSV is parsed in fixed-size chunks straight into the narrow dtypes, so
+building an entry takes the same memory for a 10 MB trace as for a 10 GB one.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from paths import BASE_DIR
+
+CACHE_DIR = Path(os.environ.get("XIFI_TRACE_CACHE", BASE_DIR / ".trace_cache"))
+
+CACHE_VERSION = 1
+
+# Column name -> on-disk dtype (matches the Logger's CSV header)
+COLUMNS = {
+    'timestamp_ms': np.int32,
+    'voltage_V': np.float32,
+    'current_mA': np.float32,
+    'power_mW': np.float32,
+    'marker': np.uint8,
+}
+
+CHUNK_ROWS = 1 << 18
+
+
+_stats = {'hits': 0, 'misses': 0}
+
+
+def cache_stats():
+    """Return a copy of the hit/miss counters for this process."""
+    return dict(_stats)
+
+
+def add_cache_stats(delta):
+    """Fold counters reported by a worker process into this process."""
+    for k in _stats:
+        _stats[k] += delta.get(k, 0)
+
+
+def reset_cache_stats():
+    _stats['hits'] = 0
+    _stats['misses'] = 0
+
+
+def print_cache_stats():
+    print(f"Trace cache: {_stats['hits']} hits, {_stats['misses']} misses ({CACHE_DIR})")
+
+
+def file_hash(path):
+    h = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            h.update(block)
+    return h.hexdigest()
+
+
+def _entry_dir(csv_path, cache_dir):
+    """Cache directory for a source CSV, keyed on its absolute path."""
+    resolved = str(Path(csv_path).resolve())
+    key = hashlib.sha1(resolved.encode()).hexdigest()[:16]
+    stem = Path(csv_path).stem.strip().replace(" ", "_")
+    return Path(cache_dir) / f"{stem}-{key}"
+
+
+def _read_meta(entry):
+    try:
+        with open(entry / "meta.json") as f:
+            meta = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if meta.get('version') != CACHE_VERSION:
+        return None
+    return meta
+
+
+def _write_meta(entry, meta):
+    tmp = entry / "meta.json.tmp"
+    with open(tmp, 'w') as f:
+        json.dump(meta, f)
+    os.replace(tmp, entry / "meta.json")
+
+
+def read_chunks(csv_path, rows=CHUNK_ROWS):
+    """Yield {column: ndarray} blocks of at most `rows` samples from a logger CSV.
+
+    Columns are parsed directly into the COLUMNS dtypes (about 14 bytes a
+    sample), so memory is bounded by `rows` however big the file is.
+    """
+    reader = pd.read_csv(csv_path, usecols=list(COLUMNS), dtype=COLUMNS, chunksize=rows)
+    with reader:
+        for df in reader:
+            yield {name: df[name].to_numpy() for name in COLUMNS}
+
+
+def _build_entry(csv_path, entry, stat, digest):
+    """Parse the CSV chunk by chunk and write its columns into a fresh cache entry."""
+    tmp = entry.with_name(entry.name + ".tmp")
+    shutil.rmtree(tmp, ignore_errors=True)
+    tmp.mkdir(parents=True)
+
+    # The row count is only known at the end: append raw columns, then wrap them in .npy
+    raw = {name: open(tmp / f"{name}.raw", 'wb') for name in COLUMNS}
+    samples = 0
+    try:
+        for chunk in read_chunks(csv_path):
+            for name, fh in raw.items():
+                fh.write(chunk[name].tobytes())
+            samples += len(chunk['marker'])
+    finally:
+        for fh in raw.values():
+            fh.close()
+
+    for name, dtype in COLUMNS.items():
+        out = np.lib.format.open_memmap(tmp / f"{name}.npy", mode='w+', dtype=dtype, shape=(samples,))
+        if samples:
+            src = np.memmap(tmp / f"{name}.raw", dtype=dtype, mode='r', shape=(samples,))
+            for pos in range(0, samples, CHUNK_ROWS):
+                out[pos:pos + CHUNK_ROWS] = src[pos:pos + CHUNK_ROWS]
+            del src
+        out.flush()
+        del out
+        os.remove(tmp / f"{name}.raw")
+
+    _write_meta(tmp, {
+        'version': CACHE_VERSION,
+        'source': str(Path(csv_path).resolve()),
+        'size': stat.st_size,
+        'mtime_ns': stat.st_mtime_ns,
+        'sha1': digest,
+        'samples': samples,
+    })
+
+    shutil.rmtree(entry, ignore_errors=True)
+    os.replace(tmp, entry)
+
+
+def load_trace_arrays(csv_path, cache_dir=None):
+    """Return {column: read-only memmapped ndarray} for a logger CSV.
+
+    Builds the cache entry on first use or when the source has changed.
+    """
+    csv_path = Path(csv_path)
+    entry = _entry_dir(csv_path, cache_dir or CACHE_DIR)
+    stat = csv_path.stat()
+    meta = _read_meta(entry)
+
+    fresh = (meta is not None
+             and meta['size'] == stat.st_size
+             and meta['mtime_ns'] == stat.st_mtime_ns)
+
+    digest = None
+    if not fresh and meta is not None and meta['size'] == stat.st_size:
+        # Touched but maybe unchanged (e.g. re-copied): fall back to the hash
+        digest = file_hash(csv_path)
+        if digest == meta['sha1']:
+            meta['mtime_ns'] = stat.st_mtime_ns
+            _write_meta(entry, meta)
+            fresh = True
+
+    if fresh:
+        _stats['hits'] += 1
+    else:
+        _stats['misses'] += 1
+        _build_entry(csv_path, entry, stat, digest or file_hash(csv_path))
+
+    return {name: np.load(entry / f"{name}.npy", mmap_mode='r') for name in COLUMNS}
+
+
+def load_trace(csv_path, cache_dir=None):
+    """Drop-in replacement for pd.read_csv(csv_path) on logger CSVs."""
+    arrays = load_trace_arrays(csv_path, cache_dir)
+    return pd.DataFrame(arrays, copy=False)
+
+
+def clear_cache(cache_dir=None):
+    shutil.rmtree(cache_dir or CACHE_DIR, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    import sys
+
+    if len(sys.argv) > 1 and sys.argv[1] == "clear":
+        clear_cache()
+        print(f"Cleared: {CACHE_DIR}")
+        sys.exit(0)
+
+    # Warm the cache for every CSV under Data/
+    for csv_file in sorted((BASE_DIR / "Data").glob("*/*.csv")):
+        arrays = load_trace_arrays(csv_file)
+        print(f"{csv_file.relative_to(BASE_DIR)}: {len(arrays['timestamp_ms'])} samples")
+    print_cache_stats()
@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""One entry point for the XiFi power analyses.
+
+    python xifi.py summary                   # per-mode transfer metrics, saves analysis_results.csv
+    python xifi.py crossover                 # payload size where each mode starts winning
+    python xifi.py full-energy               # full-test energy table, saves full_energy_results.csv
+    python xifi.py hybrid                    # BLE-then-WiFi scenario for a 10 KB transfer
+    python xifi.py plot                      # both summary figures
+    python xifi.py plot Data/1\\ Bytes/WiFi.csv
+    python xifi.py plot --batch -j 0         # downsampled PNG per trace
+    python xifi.py summary --data-dir /mnt/run2/Data --results-dir /tmp/out --no-save
+    python xifi.py crossover --campaign 2024-11 --repetition 2   # select runs from the catalog
+
+Only the standard library is imported up front. Each subcommand imports
+the analysis modules it needs when it runs, and the text commands never
+import matplotlib. `python benchmark.py startup` times them as cold
+processes against STARTUP_BUDGET_S.
+"""
+
+import argparse
+
+from paths import add_path_args, add_run_args, run_filters
+
+TEXT_COMMANDS = ('summary', 'crossover', 'full-energy', 'hybrid')
+
+
+def load(args, loader):
+    """Run loader(workers, data_dir); None (after saying so) if there is no data."""
+    print("Loading data from:", args.data_dir)
+    df = loader(args.workers, args.data_dir, **run_filters(args))
+    if len(df) == 0:
+        print("No data found!")
+        return None
+    print(f"Loaded {len(df)} test results")
+    return df
+
+
+def save(args, df, name):
+    if args.no_save:
+        return
+    output_file = args.results_dir / name
+    output_file.parent.mkdir(parents=True, exist_ok=True)
+    df.to_csv(output_file, index=False)
+    print(f"\nSaved: {output_file}")
+
+
+def cmd_summary(args):
+    from analyze_data import load_all_data, print_summary
+
+    df = load(args, load_all_data)
+    if df is not None:
+        print_summary(df)
+        save(args, df, 'analysis_results.csv')
+
+
+def cmd_crossover(args):
+    from analyze_data import find_crossover, load_all_data
+
+    df = load(args, load_all_data)
+    if df is not None:
+        find_crossover(df)
+
+
+def cmd_full_energy(args):
+    from analyze_full_energy import analyze_full_energy, print_analysis
+
+    df = load(args, analyze_full_energy)
+    if df is not None:
+        print_analysis(df)
+        save(args, df, 'full_energy_results.csv')
+
+
+def cmd_hybrid(args):
+    from analyze_full_energy import analyze_full_energy, analyze_hybrid_scenario
+
+    df = load(args, analyze_full_energy)
+    if df is not None:
+        analyze_hybrid_scenario(df)
+
+
+def cmd_plot(args):
+    if args.batch or args.csv:
+        import plot_power
+
+        plot_power.run(args)
+        return
+
+    import analyze_data
+    import analyze_full_energy
+    from trace_cache import print_cache_stats
+
+    df = load(args, analyze_data.load_all_data)
+    if df is None:
+        return
+    analyze_data.plot_comparison(df, args.images_dir)
+    full = analyze_full_energy.analyze_full_energy(args.workers, args.data_dir, **run_filters(args))
+    analyze_full_energy.plot_full_analysis(full, args.images_dir)
+    print_cache_stats()
+
+
+COMMANDS = {
+    'summary': (cmd_summary, "transfer-phase metrics per mode and the best mode by payload size"),
+    'crossover': (cmd_crossover, "best mode (energy per byte) at each payload size"),
+    'full-energy': (cmd_full_energy, "whole-test energy, duration and throughput per mode"),
+    'hybrid': (cmd_hybrid, "cost of a BLE handshake followed by a WiFi bulk transfer"),
+    'plot': (cmd_plot, "summary figures, single-trace plots or a downsampled batch"),
+}
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    sub = parser.add_subparsers(dest='command', required=True, metavar='command')
+    for name, (func, help_text) in COMMANDS.items():
+        p = sub.add_parser(name, help=help_text, description=help_text)
+        p.set_defaults(func=func)
+        p.add_argument('-j', '--workers', type=int, default=1,
+                       help="worker processes for ingestion (0 = one per CPU)")
+        add_path_args(p)
+        add_run_args(p)
+        if name in ('summary', 'full-energy'):
+            p.add_argument('--no-save', action='store_true', help="print only, do not write the results CSV")
+        if name == 'plot':
+            p.add_argument('csv', nargs='*', help="Logger CSVs to plot at full resolution")
+            p.add_argument('--batch', action='store_true',
+                           help="downsampled batch rendering (default: every CSV under --data-dir)")
+            p.add_argument('--force', action='store_true', help="re-render up-to-date PNGs")
+            p.add_argument('--points', type=int, default=None, help="points per line (default: 2 per pixel)")
+            p.add_argument('--out-dir', default=None, help="batch output directory (default: <images-dir>/traces)")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    args.func(args)
+    if args.command != 'plot':      # plot_power.run() reports its own
+        from trace_cache import print_cache_stats
+
+        print_cache_stats()
+
+
+if __name__ == "__main__":
+    main()
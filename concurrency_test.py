@@ -1,3 +1,6 @@
+# The dual-link router below now lives in the importable dual_link/ package
+# (Router, SerialEndpoint, scheduling policies); see `python -m dual_link.bench`.
+#
 # # concurrent_io_test.py
 # import asyncio, time, random, json
 # import serial
@@ -135,15 +138,24 @@
 #     except serial.SerialException as e:
 #         print("Serial error:", e)
 
-import serial, time
+# Neighbor discovery used to be a blocking +++ / ATND / sleep loop in
+# transparent mode. dual_link.xbee talks to the radio in API mode instead
+# (run dual_link.xbee.configure_api_mode() once), with concurrent commands
+# and a neighbor table that expires nodes not seen for `ttl` seconds:
+#
+#     python -m dual_link.xbee COM4 --interval 5
+#     python -m dual_link.xbee --fake 5          # pty fake XBee, no hardware
 
-ser = serial.Serial('COM4', 9600, timeout=1)  # Adjust COM port
-while True:
-    ser.write(b'+++')
-    time.sleep(1)
-    ser.write(b'ATND\r')
-    time.sleep(2)
-    data = ser.read_all().decode(errors='ignore')
-    print(data)
-    time.sleep(5)
+import asyncio
 
+from dual_link.xbee import XBee
+
+
+async def watch_neighbors(port='COM4', baud=9600):  # Adjust COM port
+    xbee = await XBee.open(port, baud, ttl=30,
+                           on_neighbor=lambda event, n: print(f"[{event}] {n}"))
+    await xbee.watch_neighbors(interval=5)
+
+
+if __name__ == "__main__":
+    asyncio.run(watch_neighbors())
@@ -0,0 +1,40 @@
+"""XBee + ESP32 dual-link routing (grown out of concurrency_test.py)."""
+
+import importlib
+
+from .endpoint import SerialEndpoint, new_stats, open_serial, open_socket
+from .framing import FrameError, LengthPrefixedParser, LineParser
+from .policies import (SMALL_THRESHOLD, CheapestLinkPolicy, EarliestCompletionPolicy,
+                       FunctionPolicy, RoundRobinPolicy, ThresholdPolicy, choose_interface)
+from .router import BAUD_ESP32, BAUD_XBEE, PORT_ESP32, PORT_XBEE, Link, Router
+
+# Imported on first access, so `python -m dual_link.<module>` doesn't find
+# its own module already loaded by the package.
+_LAZY = {
+    'BatchReport': 'batching', 'Coalescer': 'batching',
+    'CostModel': 'cost_model', 'ModeCost': 'cost_model',
+    'Telemetry': 'telemetry',
+    'ATCommandError': 'xbee', 'Neighbor': 'xbee', 'NeighborTable': 'xbee', 'XBee': 'xbee', 'XBeeError': 'xbee',
+}
+
+__all__ = [
+    'SerialEndpoint', 'new_stats', 'open_serial', 'open_socket',
+    'SMALL_THRESHOLD', 'choose_interface', 'FunctionPolicy', 'ThresholdPolicy',
+    'RoundRobinPolicy', 'EarliestCompletionPolicy', 'CheapestLinkPolicy',
+    'CostModel', 'ModeCost', 'Coalescer', 'BatchReport',
+    'LineParser', 'LengthPrefixedParser', 'FrameError',
+    'Router', 'Link', 'PORT_XBEE', 'BAUD_XBEE', 'PORT_ESP32', 'BAUD_ESP32', 'Telemetry',
+    'XBee', 'XBeeError', 'ATCommandError', 'Neighbor', 'NeighborTable',
+]
+
+
+def __getattr__(name):
+    if name in _LAZY:
+        value = getattr(importlib.import_module(f".{_LAZY[name]}", __name__), name)
+        globals()[name] = value
+        return value
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
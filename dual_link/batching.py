@@ -0,0 +1,222 @@
+"""Deadline-aware coalescing of small payloads into single WiFi bursts.
+
+Every WiFi send pays the session cost (init + teardown, ~1.5 J measured)
+on top of a few mJ of transfer energy, so sending small messages one by
+one over WiFi wastes almost all of its energy. The Coalescer sits in front
+of the Router and holds messages until one of these happens:
+
+  size       - accumulated bytes reach max_batch_bytes
+  break_even - one WiFi burst for the batch costs no more than sending each
+               message on the fallback link (cost-model comparison)
+  deadline   - the earliest deadline in the batch, less the burst's
+               expected latency, is reached
+  large      - a payload above small_bytes arrives; it opens a session
+               anyway, so it carries the held messages with it
+  flush      - flush() / close()
+
+A batch is sent on whichever route is cheaper at that moment: one burst on
+the batch link, or each message on the fallback link. Each flush produces
+a BatchReport with the energy saved versus sending every message alone on
+the batch link, so latency can be traded for joules explicitly.
+"""
+
+import asyncio
+
+from .cost_model import CostModel
+from .policies import SMALL_THRESHOLD
+
+
+class BatchReport:
+    """Outcome of one flush."""
+
+    __slots__ = ('reason', 'link', 'messages', 'bytes', 'energy_mJ', 'alone_mJ',
+                 'saved_mJ', 'max_wait_s', 'mean_wait_s')
+
+    def __init__(self, reason, link, messages, nbytes, energy_mJ, alone_mJ, waits):
+        self.reason = reason
+        self.link = link
+        self.messages = messages
+        self.bytes = nbytes
+        self.energy_mJ = energy_mJ
+        self.alone_mJ = alone_mJ
+        self.saved_mJ = alone_mJ - energy_mJ
+        self.max_wait_s = max(waits) if waits else 0.0
+        self.mean_wait_s = sum(waits) / len(waits) if waits else 0.0
+
+    def as_dict(self):
+        return {k: getattr(self, k) for k in self.__slots__}
+
+    def __repr__(self):
+        return (f"BatchReport({self.reason}: {self.messages} msgs/{self.bytes} B on {self.link}, "
+                f"{self.energy_mJ:.1f} mJ, saved {self.saved_mJ:.1f} mJ, "
+                f"max wait {self.max_wait_s * 1000:.0f} ms)")
+
+
+class Coalescer:
+    """Batch small payloads ahead of a Router.
+
+        co = Coalescer(router)
+        report = await co.submit(b"...", deadline_s=20.0)
+    """
+
+    def __init__(self, router, model=None, link="esp32", mode="WiFi",
+                 fallback_link="xbee", fallback_mode="BLE_CONN",
+                 small_bytes=SMALL_THRESHOLD, max_batch_bytes=4096,
+                 default_deadline_s=30.0, on_batch=None):
+        self.router = router
+        self.model = model or CostModel()
+        self.link = link
+        self.mode = mode
+        self.fallback_link = fallback_link
+        self.fallback_mode = fallback_mode
+        self.small_bytes = small_bytes
+        self.max_batch_bytes = max_batch_bytes
+        self.default_deadline_s = default_deadline_s
+        self.on_batch = on_batch
+
+        self.reports = []
+        self.totals = {'batches': 0, 'messages': 0, 'energy_mJ': 0.0, 'saved_mJ': 0.0}
+        self._pending = []          # (payload, submitted_at, future)
+        self._bytes = 0
+        self._deadline = None       # earliest absolute deadline in the batch
+        self._timer = None
+        self._tasks = set()
+
+    # --- cost helpers (all O(1): costs are linear in total bytes) ---
+
+    def _burst_mJ(self, n, nbytes):
+        c = self.model.modes[self.mode]
+        return c.session_mJ + n * c.e0_mJ + c.e1_mJ * nbytes
+
+    def _fallback_mJ(self, n, nbytes):
+        c = self.model.modes[self.fallback_mode]
+        return n * c.e0_mJ + c.e1_mJ * nbytes
+
+    def _alone_mJ(self, n, nbytes):
+        # every message pays its own session
+        return self._burst_mJ(n, nbytes) + (n - 1) * self.model.modes[self.mode].session_mJ
+
+    def _burst_latency_s(self, n, nbytes):
+        c = self.model.modes[self.mode]
+        return c.session_s + n * c.t0_s + c.t1_s * nbytes
+
+    # --- public API ---
+
+    def submit(self, payload: bytes, deadline_s=None):
+        """Hold payload for batching; returns a future resolving to its BatchReport."""
+        loop = asyncio.get_running_loop()
+        self.model.maybe_reload()
+        now = loop.time()
+        fut = loop.create_future()
+        self._pending.append((payload, now, fut))
+        self._bytes += len(payload)
+
+        deadline = now + (self.default_deadline_s if deadline_s is None else deadline_s)
+        if self._deadline is None or deadline < self._deadline:
+            self._deadline = deadline
+
+        n = len(self._pending)
+        if len(payload) > self.small_bytes:
+            self._flush("large")
+        elif self._bytes >= self.max_batch_bytes:
+            self._flush("size")
+        elif self._burst_mJ(n, self._bytes) <= self._fallback_mJ(n, self._bytes):
+            self._flush("break_even")
+        else:
+            self._arm_timer()
+        return fut
+
+    def flush(self):
+        if self._pending:
+            self._flush("flush")
+
+    async def close(self):
+        self.flush()
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    # --- internals ---
+
+    def _arm_timer(self):
+        loop = asyncio.get_running_loop()
+        fire_at = self._deadline - self._burst_latency_s(len(self._pending), self._bytes)
+        if self._timer is not None:
+            if self._timer.when() <= fire_at:
+                return
+            self._timer.cancel()
+        if fire_at <= loop.time():
+            self._timer = None
+            self._flush("deadline")
+        else:
+            self._timer = loop.call_at(fire_at, self._flush, "deadline")
+
+    def _flush(self, reason):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        n, nbytes = len(batch), self._bytes
+        self._bytes = 0
+        self._deadline = None
+        if not batch:
+            return
+
+        burst = self._burst_mJ(n, nbytes)
+        fallback = self._fallback_mJ(n, nbytes)
+        # A large payload has to go out on the batch link regardless
+        if reason == "large" or burst <= fallback or self.fallback_link not in self.router.links:
+            link, energy = self.link, burst
+        else:
+            link, energy = self.fallback_link, fallback
+
+        now = asyncio.get_running_loop().time()
+        report = BatchReport(reason, link, n, nbytes, energy, self._alone_mJ(n, nbytes),
+                             [now - t for _, t, _ in batch])
+        self.reports.append(report)
+        self.totals['batches'] += 1
+        self.totals['messages'] += n
+        self.totals['energy_mJ'] += energy
+        self.totals['saved_mJ'] += report.saved_mJ
+        if self.on_batch:
+            self.on_batch(report)
+
+        sends = []
+        for i, (payload, _, _) in enumerate(batch):
+            try:
+                sends.append(self.router.send(payload, link))
+            except asyncio.QueueFull:
+                # Bounded link with overflow='await' (this may run from the
+                # deadline timer, so nothing can wait here): the rest of the
+                # batch waits for room in a task, in order.
+                queued = [asyncio.get_running_loop().create_future() for _ in batch[i:]]
+                self._start(self._put_in_order([p for p, _, _ in batch[i:]], link, queued))
+                sends.extend(self._sent(q) for q in queued)
+                break
+        self._start(self._complete(sends, batch, report))
+
+    def _start(self, coro):
+        task = asyncio.ensure_future(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _put_in_order(self, payloads, link, queued):
+        for payload, q in zip(payloads, queued):
+            try:
+                q.set_result(await self.router.put(payload, link))
+            except Exception as e:
+                q.set_exception(e)
+
+    @staticmethod
+    async def _sent(queued):
+        return await (await queued)
+
+    @staticmethod
+    async def _complete(sends, batch, report):
+        results = await asyncio.gather(*sends, return_exceptions=True)
+        for (_, _, fut), res in zip(batch, results):
+            if fut.done():
+                continue
+            if isinstance(res, BaseException):
+                fut.set_exception(res)
+            else:
+                fut.set_result(report)
@@ -0,0 +1,126 @@
+"""Throughput check for the dual-link router over loopback stand-ins.
+
+    python -m dual_link.bench --messages 50000 --transport socket
+    python -m dual_link.bench --messages 20000 --transport pty --policy earliest
+
+Drives messages shaped like concurrency_test.py's traffic_generator through
+a Router as fast as the event loop allows, then checks that every link's
+sink received exactly the messages routed to it, in order.
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import time
+
+from .policies import (CheapestLinkPolicy, EarliestCompletionPolicy, RoundRobinPolicy,
+                       ThresholdPolicy)
+from .router import BAUD_ESP32, BAUD_XBEE, Router
+from .standins import pty_standin, socket_standin
+
+SIZES = [16, 32, 48, 64, 128, 256, 512]
+
+POLICIES = {
+    'threshold': ThresholdPolicy,
+    'roundrobin': RoundRobinPolicy,
+    'earliest': EarliestCompletionPolicy,
+    'cheapest': CheapestLinkPolicy,
+}
+
+
+def make_payloads(n, seed=0):
+    """Mixed-size JSON payloads like traffic_generator(), padded to their nominal size."""
+    rng = random.Random(seed)
+    out = []
+    for i in range(n):
+        size = rng.choice(SIZES)
+        msg = json.dumps({"id": i, "size": size, "note": "test"})
+        out.append(msg.ljust(size, " ").encode())
+    return out
+
+
+async def open_standins(router, transport, keep=True, echo=False, on_line=None):
+    """Attach xbee/esp32 stand-ins to router; on_line(name, line, t_ns) sees each sink line."""
+    sinks, closers = {}, []
+    for name, baud in (("xbee", BAUD_XBEE), ("esp32", BAUD_ESP32)):
+        cb = None if on_line is None else (lambda line, t, name=name: on_line(name, line, t))
+        if transport == "pty":
+            path, sink, close = pty_standin(name, echo, keep, cb)
+            await router.open_serial(name, path, baud)
+        else:
+            sock, sink, close = await socket_standin(name, echo, keep, cb)
+            await router.open_socket(name, sock, baud)
+        sinks[name] = sink
+        closers.append(close)
+    return sinks, closers
+
+
+async def run_bench(messages=20000, transport="socket", policy="threshold", window=1024, **router_opts):
+    router = Router(POLICIES[policy](), **router_opts)
+    sinks, closers = await open_standins(router, transport)
+    payloads = make_payloads(messages)
+
+    routed = {name: [] for name in router.links}
+    dropped = 0
+
+    async def settle(pending):
+        nonlocal dropped
+        for p, f in pending:
+            name = await f
+            if name is None:        # dropped by a bounded queue (overflow='drop')
+                dropped += 1
+            else:
+                routed[name].append(p.rstrip(b"\n"))
+        pending.clear()
+
+    t0 = time.perf_counter()
+    pending = []
+    for payload in payloads:
+        pending.append((payload, router.send(payload)))
+        if len(pending) >= window:
+            # bounded in-flight window so a slow transport can't grow memory unbounded
+            await settle(pending)
+    await settle(pending)
+    t_sent = time.perf_counter()
+
+    await asyncio.wait_for(
+        asyncio.gather(*(sinks[n].wait_for(len(routed[n])) for n in routed)), timeout=60)
+    t_done = time.perf_counter()
+
+    ok = all(sinks[n].lines == routed[n] for n in routed)
+    await router.close()
+    for close in closers:
+        close()
+
+    elapsed = t_done - t0
+    return {
+        'messages': messages,
+        'transport': transport,
+        'policy': policy,
+        'send_s': round(t_sent - t0, 4),
+        'total_s': round(elapsed, 4),
+        'msgs_per_s': round(messages / elapsed),
+        'per_link': {n: len(routed[n]) for n in routed},
+        'dropped': dropped,
+        'bytes': {n: router.stats[n]["tx_bytes"] for n in routed},
+        'in_order': ok,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Dual-link router throughput check")
+    parser.add_argument('--messages', type=int, default=20000)
+    parser.add_argument('--transport', choices=['socket', 'pty'], default='socket')
+    parser.add_argument('--policy', choices=sorted(POLICIES), default='threshold')
+    args = parser.parse_args()
+
+    result = asyncio.run(run_bench(args.messages, args.transport, args.policy))
+    for key, value in result.items():
+        print(f"{key:<12} {value}")
+    if not result['in_order']:
+        raise SystemExit("FAIL: sinks did not receive the routed messages in order")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,228 @@
+"""Fitted per-protocol energy/latency cost model from full_energy_results.csv.
+
+For each mode (BLE_ADV, BLE_CONN, WiFi) the measured tests are reduced to
+
+    session cost   = init + teardown energy/time (overhead phase, per burst)
+    message cost   = e0 + e1 * payload_bytes      (transfer phase / iterations)
+    message time   = t0 + t1 * payload_bytes
+
+Per-message lines are fitted with Theil-Sen (median of pairwise slopes) so
+a single odd test (e.g. BLE_CONN at 512 bytes) doesn't drag the fit, and
+session costs are the median over all payload sizes.
+
+Because every cost is linear in size, the cheapest mode changes only at the
+analytic crossover points of those lines. A per-byte lookup table up to
+`table_bytes`, stretched to cover the last crossover, plus the mode that
+wins beyond it, turns "which link is cheapest for this message" into a
+single list index. A crossover past `max_table_bytes` (nearly parallel
+lines) leaves no single tail mode; sizes past the table are then compared
+line by line.
+
+    python -m dual_link.cost_model [results.csv]
+"""
+
+import csv
+import itertools
+import os
+import statistics
+import time
+from pathlib import Path
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+RESULTS_CSV = ROOT_DIR / "PowerTests" / "results" / "full_energy_results.csv"
+
+ITERATIONS = 100  # transfers per test (DUT_ESP.ino ITERATIONS)
+MODES = ('BLE_ADV', 'BLE_CONN', 'WiFi')
+
+
+def theil_sen(xs, ys):
+    """Robust (intercept, slope) line fit."""
+    slopes = [(y2 - y1) / (x2 - x1)
+              for (x1, y1), (x2, y2) in itertools.combinations(zip(xs, ys), 2)
+              if x2 != x1]
+    slope = statistics.median(slopes) if slopes else 0.0
+    intercept = statistics.median(y - slope * x for x, y in zip(xs, ys))
+    return intercept, slope
+
+
+class ModeCost:
+    """Fitted costs for one mode."""
+
+    def __init__(self, mode, session_mJ, session_s, e0_mJ, e1_mJ, t0_s, t1_s):
+        self.mode = mode
+        self.session_mJ = session_mJ
+        self.session_s = session_s
+        self.e0_mJ = e0_mJ      # per-message fixed energy
+        self.e1_mJ = e1_mJ      # per-byte energy
+        self.t0_s = t0_s
+        self.t1_s = t1_s
+
+    def energy_mJ(self, size, messages=1, warm=True):
+        """Energy to send `messages` payloads of `size` bytes in one burst."""
+        e = messages * (self.e0_mJ + self.e1_mJ * size)
+        return e if warm else e + self.session_mJ
+
+    def latency_s(self, size, messages=1, warm=True):
+        t = messages * (self.t0_s + self.t1_s * size)
+        return t if warm else t + self.session_s
+
+    def __repr__(self):
+        return (f"ModeCost({self.mode}: session {self.session_mJ:.1f} mJ / {self.session_s:.2f} s, "
+                f"message {self.e0_mJ:.3f} mJ + {self.e1_mJ * 1000:.3f} uJ/B, "
+                f"{self.t0_s * 1000:.2f} ms + {self.t1_s * 1e6:.3f} us/B)")
+
+
+def fit_modes(rows, iterations=ITERATIONS):
+    """Fit ModeCost per mode from full_energy_results rows (dicts of strings or numbers)."""
+    by_mode = {}
+    for r in rows:
+        by_mode.setdefault(r['mode'], []).append(r)
+
+    fits = {}
+    for mode, rs in by_mode.items():
+        size = [float(r['payload_bytes']) for r in rs]
+        msg_mJ = [float(r['transfer_energy_mJ']) / iterations for r in rs]
+        msg_s = [float(r['transfer_duration_s']) / iterations for r in rs]
+        e0, e1 = theil_sen(size, msg_mJ)
+        t0, t1 = theil_sen(size, msg_s)
+        fits[mode] = ModeCost(
+            mode,
+            session_mJ=statistics.median(float(r['overhead_energy_mJ']) for r in rs),
+            session_s=statistics.median(float(r['overhead_duration_s']) for r in rs),
+            e0_mJ=e0, e1_mJ=e1, t0_s=t0, t1_s=t1,
+        )
+    return fits
+
+
+def crossover_bytes(a, b, warm=True):
+    """Payload size where modes a and b cost the same energy (None if parallel).
+
+    Returns a float; sizes above it favour the mode with the smaller slope.
+    """
+    da = a.e0_mJ + (0 if warm else a.session_mJ)
+    db = b.e0_mJ + (0 if warm else b.session_mJ)
+    if a.e1_mJ == b.e1_mJ:
+        return None
+    return (db - da) / (a.e1_mJ - b.e1_mJ)
+
+
+class CostModel:
+    """Cost model with O(1) cheapest-link lookups and auto-reload on CSV change."""
+
+    def __init__(self, path=RESULTS_CSV, table_bytes=4096, check_every_s=1.0, max_table_bytes=1 << 16):
+        self.path = Path(path)
+        self.table_bytes = table_bytes
+        self.max_table_bytes = max_table_bytes
+        self.check_every_s = check_every_s
+        self.version = 0
+        self.modes = {}
+        self._tables = {}
+        self._mtime_ns = None
+        self._next_check = 0.0
+        self.reload()
+
+    def reload(self):
+        with open(self.path, newline='') as f:
+            rows = list(csv.DictReader(f))
+        self.modes = fit_modes(rows)
+        self._mtime_ns = os.stat(self.path).st_mtime_ns
+        self._tables.clear()
+        self.version += 1
+
+    def maybe_reload(self):
+        """Reload if the CSV changed; stat()s at most once per check_every_s."""
+        now = time.monotonic()
+        if now < self._next_check:
+            return False
+        self._next_check = now + self.check_every_s
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except OSError:
+            return False
+        if mtime == self._mtime_ns:
+            return False
+        self.reload()
+        return True
+
+    def crossovers(self, modes=None, warm=True):
+        """{(a, b): bytes} for every pair of modes whose lines cross at size >= 0."""
+        names = [m for m in (modes or self.modes) if m in self.modes]
+        out = {}
+        for a, b in itertools.combinations(names, 2):
+            x = crossover_bytes(self.modes[a], self.modes[b], warm)
+            if x is not None and x >= 0:
+                out[(a, b)] = x
+        return out
+
+    def _best(self, size, modes, warm):
+        return min((self.modes[m] for m in modes), key=lambda c: c.energy_mJ(size, warm=warm)).mode
+
+    def _build_table(self, modes, warm):
+        last = max(self.crossovers(modes, warm).values(), default=0.0)
+        end = max(self.table_bytes, min(int(last) + 1, self.max_table_bytes))
+        table = [self._best(size, modes, warm) for size in range(end + 1)]
+        if last >= end:
+            return table, None
+        # Past the last crossover the lower envelope is a single line: the
+        # smallest slope (ties broken by the smaller intercept).
+        costs = [self.modes[m] for m in modes]
+        tail = min(costs, key=lambda c: (c.e1_mJ, c.energy_mJ(0, warm=warm))).mode
+        return table, tail
+
+    def table(self, modes=None, warm=True):
+        """(per-size best-mode list, mode for sizes beyond the table or None).
+
+        The table reaches past every crossover up to max_table_bytes; tail
+        is None when one lies beyond even that.
+        """
+        key = (tuple(modes or sorted(self.modes)), warm)
+        if key not in self._tables:
+            self._tables[key] = self._build_table(key[0], warm)
+        return self._tables[key]
+
+    def cheapest(self, size, modes=None, warm=True):
+        """Mode with the lowest energy for a payload of `size` bytes."""
+        self.maybe_reload()
+        table, tail = self.table(modes, warm)
+        if size < len(table):
+            return table[size]
+        return tail if tail is not None else self._best(size, modes or self.modes, warm)
+
+    def energy_mJ(self, mode, size, messages=1, warm=True):
+        return self.modes[mode].energy_mJ(size, messages, warm)
+
+    def latency_s(self, mode, size, messages=1, warm=True):
+        return self.modes[mode].latency_s(size, messages, warm)
+
+
+def main():
+    import sys
+
+    model = CostModel(sys.argv[1] if len(sys.argv) > 1 else RESULTS_CSV)
+    print(f"Fitted from: {model.path}\n")
+    for mode in MODES:
+        if mode in model.modes:
+            print(model.modes[mode])
+
+    for warm in (True, False):
+        label = "warm link (per message)" if warm else "cold link (session + message)"
+        print(f"\n### CROSSOVERS: {label} ###")
+        xs = model.crossovers(warm=warm)
+        if not xs:
+            print("  none at sizes >= 0")
+        for (a, b), x in sorted(xs.items(), key=lambda kv: kv[1]):
+            print(f"  {a} = {b} at {x:.1f} bytes")
+
+        table, tail = model.table(warm=warm)
+        runs, start = [], 0
+        for size in range(1, len(table) + 1):
+            if size == len(table) or table[size] != table[start]:
+                runs.append((start, size - 1, table[start]))
+                start = size
+        for lo, hi, mode in runs:
+            print(f"  {lo:>5}-{hi:<5} bytes: {mode}")
+        print(f"  >{len(table) - 1:<10} bytes: {tail or 'compared per size'}")
+
+
+if __name__ == "__main__":
+    main()
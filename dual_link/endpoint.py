@@ -0,0 +1,131 @@
+"""Serial endpoints for the XBee / ESP32 links (from concurrency_test.py)."""
+
+import asyncio
+
+from .framing import FrameError, LineParser
+
+
+def new_stats(*names):
+    """Per-link byte counters in the shape concurrency_test.py used."""
+    return {name: {"tx_bytes": 0, "rx_bytes": 0} for name in names}
+
+
+class SerialEndpoint(asyncio.Protocol):
+    """Framed protocol for one link.
+
+    Incoming bytes go through a framing parser (newline-delimited by
+    default, see framing.py) and each frame is handed to
+    on_line_cb(name, frame). With decode=True the frame is stripped text;
+    with decode=False it is a read-only memoryview into the parser buffer,
+    which avoids a copy and a decode per frame. Works over any asyncio
+    transport: a pyserial-asyncio serial port, a pty or a socket stand-in.
+
+    The transport's write-buffer watermarks drive `writable`: it is cleared
+    by pause_writing() and set again by resume_writing(), so a sender that
+    waits on it never grows the transport buffer past the high watermark.
+    """
+
+    def __init__(self, name, on_line_cb=None, stats=None, verbose=False,
+                 framing=None, decode=True):
+        self.name = name
+        self.on_line_cb = on_line_cb
+        self.transport = None
+        self.parser = framing if framing is not None else LineParser()
+        self.decode = decode
+        self.parse_errors = 0
+        self.stats = stats if stats is not None else new_stats(name)
+        self.verbose = verbose
+        self.writable = asyncio.Event()
+        self.writable.set()
+        self.pauses = 0
+        self._write_limits = None
+        self.connected = asyncio.get_running_loop().create_future()
+
+    def set_write_limits(self, high, low=None):
+        """Transport write-buffer watermarks (bytes) for pause/resume_writing."""
+        self._write_limits = (high, low)
+        if self.transport is not None:
+            self.transport.set_write_buffer_limits(high, low)
+
+    def connection_made(self, transport):
+        self.transport = transport
+        if self._write_limits:
+            transport.set_write_buffer_limits(*self._write_limits)
+        if not self.connected.done():
+            self.connected.set_result(True)
+        if self.verbose:
+            print(f"[{self.name}] opened")
+
+    def data_received(self, data):
+        self.stats[self.name]["rx_bytes"] += len(data)
+        try:
+            frames = self.parser.feed(data)
+        except FrameError as e:
+            # length-prefixed stream is out of sync; nothing to resync on
+            self.parse_errors += 1
+            if self.verbose:
+                print(f"[{self.name}] framing error: {e}")
+            if self.transport:
+                self.transport.close()
+            return
+        cb = self.on_line_cb
+        if cb is None:
+            return
+        if self.decode:
+            for frame in frames:
+                cb(self.name, str(frame, "utf-8", "replace").strip())
+        else:
+            for frame in frames:
+                cb(self.name, frame)
+
+    def pause_writing(self):
+        self.pauses += 1
+        self.writable.clear()
+
+    def resume_writing(self):
+        self.writable.set()
+
+    def connection_lost(self, exc):
+        self.transport = None
+        self.writable.set()  # let waiting senders run into the ConnectionError
+        if self.verbose:
+            print(f"[{self.name}] closed: {exc}")
+
+    def write(self, payload: bytes):
+        """Write raw bytes; returns the number of bytes handed to the transport."""
+        if self.transport is None:
+            raise ConnectionError(f"{self.name} is not connected")
+        self.stats[self.name]["tx_bytes"] += len(payload)
+        self.transport.write(payload)
+        return len(payload)
+
+    def write_frame(self, payload: bytes):
+        """Frame payload for this endpoint's framing and write it."""
+        return self.write(self.parser.encode(payload))
+
+    def write_line(self, text: str):
+        return self.write_frame(text.encode())
+
+    def close(self):
+        if self.transport:
+            self.transport.close()
+
+
+async def open_serial(loop, port, baud, name, on_line_cb=None, stats=None, framing=None):
+    """Open a serial port (or pty path) and return its SerialEndpoint."""
+    import serial_asyncio
+
+    def factory():
+        return SerialEndpoint(name, on_line_cb, stats, framing=framing)
+    transport, protocol = await serial_asyncio.create_serial_connection(
+        loop, factory, port, baudrate=baud
+    )
+    return protocol  # we return the Protocol so we can write()
+
+
+async def open_socket(loop, sock, name, on_line_cb=None, stats=None, framing=None):
+    """Wrap a connected socket (e.g. one end of socket.socketpair()) as an endpoint."""
+    def factory():
+        return SerialEndpoint(name, on_line_cb, stats, framing=framing)
+    transport, protocol = await loop.create_connection(factory, sock=sock)
+    return protocol
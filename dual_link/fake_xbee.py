@@ -0,0 +1,159 @@
+"""Pseudo-terminal stand-in for an API-mode XBee coordinator.
+
+Answers AT command frames (NI, SH, SL, MY, NT, AP, ...; anything unknown
+gets status 2, "invalid command"), reports ATND neighbors one frame at a
+time spread over the NT window followed by the empty end-of-discovery
+frame, and acknowledges TX requests with a TX status, optionally echoing
+the payload back as an RX packet from the destination. Frames can be
+corrupted or dropped at random to exercise the driver's checksum resync
+and timeouts.
+
+    fake = FakeXBee.with_neighbors(5, nt_s=1.0)
+    fake.start()                       # needs a running event loop
+    xbee = await XBee.open(fake.path)
+"""
+
+import asyncio
+import os
+import random
+import struct
+import tty
+
+from .xbee import (AT_COMMAND, AT_RESPONSE, BROADCAST_64, RX_PACKET, TX_REQUEST, TX_STATUS,
+                   APIFrameParser, Neighbor)
+
+
+class FakeXBee:
+    """XBee API protocol on the master side of a pty."""
+
+    def __init__(self, ni="COORD", addr64=0x0013A20040000001, nt_s=1.0, escaped=False,
+                 echo=False, corrupt_prob=0.0, drop_prob=0.0, seed=None):
+        self.neighbors = {}
+        self.echo = echo
+        self.corrupt_prob = corrupt_prob
+        self.drop_prob = drop_prob
+        self.rng = random.Random(seed)
+        self.registers = {
+            "NI": ni.encode(),
+            "SH": struct.pack(">I", addr64 >> 32),
+            "SL": struct.pack(">I", addr64 & 0xFFFFFFFF),
+            "MY": b"\x00\x00",
+            "NT": bytes([max(1, round(nt_s * 10))]),
+            "AP": bytes([2 if escaped else 1]),
+            "VR": b"\x40\x5F",
+        }
+        self.parser = APIFrameParser(escaped=escaped)
+
+        self.master, self.slave = os.openpty()
+        tty.setraw(self.slave)
+        self.path = os.ttyname(self.slave)
+
+        self.commands = 0     # AT command frames received
+        self.tx_frames = 0    # TX requests received
+        self.corrupted = 0
+        self.dropped = 0
+        self._tasks = set()
+
+    @classmethod
+    def with_neighbors(cls, count, **kw):
+        fake = cls(**kw)
+        for i in range(count):
+            fake.add_neighbor(Neighbor(0x0013A20041000000 + i, 0x1000 + i, f"NODE{i}",
+                                       parent16=0, device_type=1 if i % 2 else 2))
+        return fake
+
+    def add_neighbor(self, neighbor):
+        self.neighbors[neighbor.addr64] = neighbor
+
+    def remove_neighbor(self, addr64):
+        self.neighbors.pop(addr64, None)
+
+    @property
+    def nt_s(self):
+        return self.registers["NT"][0] / 10
+
+    # --- pty plumbing ---
+
+    def start(self):
+        loop = asyncio.get_running_loop()
+        os.set_blocking(self.master, False)
+        loop.add_reader(self.master, self._on_readable)
+
+    def close(self):
+        for task in self._tasks:
+            task.cancel()
+        try:
+            asyncio.get_running_loop().remove_reader(self.master)
+        except RuntimeError:
+            pass
+        os.close(self.master)
+        os.close(self.slave)
+
+    def _on_readable(self):
+        try:
+            data = os.read(self.master, 4096)
+        except (BlockingIOError, OSError):
+            return
+        for frame in self.parser.feed(data):
+            self._handle(bytes(frame))
+
+    def _send(self, frame_data):
+        if self.drop_prob and self.rng.random() < self.drop_prob:
+            self.dropped += 1
+            return
+        raw = bytearray(self.parser.encode(frame_data))
+        if self.corrupt_prob and self.rng.random() < self.corrupt_prob:
+            raw[self.rng.randrange(3, len(raw))] ^= 0x5A
+            self.corrupted += 1
+        try:
+            os.write(self.master, raw)
+        except BlockingIOError:
+            pass
+
+    def _spawn(self, coro):
+        task = asyncio.get_running_loop().create_task(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    # --- protocol ---
+
+    def _handle(self, frame):
+        api_id, fid = frame[0], frame[1]
+        if api_id == AT_COMMAND:
+            self.commands += 1
+            command, param = frame[2:4], frame[4:]
+            if command == b"ND":
+                self._spawn(self._discover(fid))
+                return
+            name = command.decode(errors="replace")
+            if name not in self.registers:
+                self._send(bytes([AT_RESPONSE, fid]) + command + b"\x02")
+            elif param:
+                self.registers[name] = param
+                self._send(bytes([AT_RESPONSE, fid]) + command + b"\x00")
+            else:
+                self._send(bytes([AT_RESPONSE, fid]) + command + b"\x00" + self.registers[name])
+        elif api_id == TX_REQUEST:
+            self.tx_frames += 1
+            dest64, dest16 = struct.unpack_from(">QH", frame, 2)
+            payload = frame[14:]
+            known = dest64 == BROADCAST_64 or dest64 in self.neighbors
+            # TX status: fid, 16-bit address, retries, delivery status, discovery status
+            status = 0x00 if known else 0x25   # 0x25: route not found
+            self._send(bytes([TX_STATUS, fid]) + struct.pack(">HBBB", dest16, 0, status, 0))
+            if self.echo and known and dest64 != BROADCAST_64:
+                src = self.neighbors[dest64]
+                self._send(bytes([RX_PACKET]) + struct.pack(">QHB", dest64, src.addr16, 1)
+                           + payload)
+
+    async def _discover(self, fid):
+        """One ND reply per neighbor at random points in the NT window, then the terminator."""
+        window = self.nt_s
+        delays = sorted(self.rng.uniform(0, window) for _ in self.neighbors)
+        elapsed = 0.0
+        for delay, neighbor in zip(delays, list(self.neighbors.values())):
+            await asyncio.sleep(delay - elapsed)
+            elapsed = delay
+            self._send(bytes([AT_RESPONSE, fid]) + b"ND\x00" + neighbor.encode())
+        await asyncio.sleep(window - elapsed)
+        self._send(bytes([AT_RESPONSE, fid]) + b"ND\x00")
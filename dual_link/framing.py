@@ -0,0 +1,160 @@
+"""Incremental frame parsers for serial byte streams.
+
+Both parsers append incoming data into a preallocated bytearray and keep a
+read offset (`pos`) and a write offset (`end`). Frames are located with
+bytearray.find / struct.unpack_from directly on the buffer and returned as
+memoryview slices, with no per-line copy or decode. The buffer is only
+compacted when incoming data no longer fits: the unparsed tail is copied
+into a fresh buffer (grown if needed), which happens rarely enough that
+each byte is copied O(1) times. The old SerialEndpoint re-sliced the whole
+remainder after every line, which is quadratic in lines per chunk.
+
+Bytes already handed out are never overwritten (writes only go past `end`,
+and compaction moves to a new buffer), so frame views stay valid for as
+long as the caller keeps them. They are read-only views; call bytes(view)
+if a frame must outlive a large amount of traffic without pinning a buffer.
+"""
+
+import abc
+import struct
+
+DEFAULT_MAX_FRAME = 64 * 1024
+DEFAULT_CAPACITY = 64 * 1024
+
+
+class FrameError(ValueError):
+    """Stream violated the framing (oversized frame, bad length)."""
+
+
+class _Parser(abc.ABC):
+    def __init__(self, max_frame=DEFAULT_MAX_FRAME, capacity=DEFAULT_CAPACITY):
+        self.max_frame = max_frame
+        self.buf = bytearray(capacity)
+        self.pos = 0
+        self.end = 0
+        self.frames = 0
+        self.errors = 0
+        self.compactions = 0
+
+    def __len__(self):
+        """Bytes buffered but not yet returned as frames."""
+        return self.end - self.pos
+
+    def _reserve(self, n):
+        if self.end + n <= len(self.buf):
+            return
+        pending = self.end - self.pos
+        size = len(self.buf)
+        while size < 2 * (pending + n):
+            size *= 2
+        new = bytearray(size)
+        new[:pending] = self.buf[self.pos:self.end]
+        self.buf, self.pos, self.end = new, 0, pending
+        self.compactions += 1
+
+    def feed(self, data):
+        """Append data and return a list of complete frames (read-only memoryviews)."""
+        n = len(data)
+        self._reserve(n)
+        # same-length slice assignment never resizes, so outstanding views are safe
+        self.buf[self.end:self.end + n] = data
+        self.end += n
+        return self._parse()
+
+    @abc.abstractmethod
+    def _parse(self):
+        """Consume complete frames from buf[pos:end]; returns them as a list."""
+
+    @abc.abstractmethod
+    def encode(self, payload):
+        """Frame a payload for the far side's parser."""
+
+
+class LineParser(_Parser):
+    """Newline-delimited frames; the delimiter (and a trailing '\\r') is stripped.
+
+    A line longer than max_frame is dropped (up to its delimiter) and
+    counted in `errors` instead of growing the buffer without bound.
+    """
+
+    def __init__(self, delimiter=b"\n", strip_cr=True, **kw):
+        super().__init__(**kw)
+        self.delimiter = delimiter
+        self.strip_cr = strip_cr
+        self._discarding = False
+
+    def _parse(self):
+        buf, pos, end, delim = self.buf, self.pos, self.end, self.delimiter
+        view = memoryview(buf).toreadonly()
+        out = []
+        while True:
+            stop = buf.find(delim, pos, end)
+            if stop < 0:
+                if end - pos > self.max_frame:
+                    # runaway line: drop what we have and skip to the next delimiter
+                    if not self._discarding:
+                        self.errors += 1
+                        self._discarding = True
+                    pos = end
+                break
+            if self._discarding:
+                self._discarding = False
+            elif stop - pos > self.max_frame:
+                self.errors += 1
+            else:
+                cut = stop
+                if self.strip_cr and cut > pos and buf[cut - 1] == 13:
+                    cut -= 1
+                out.append(view[pos:cut])
+            pos = stop + len(delim)
+        self.pos = pos
+        self.frames += len(out)
+        return out
+
+    def encode(self, payload):
+        """Frame a payload for this parser; only a trailing delimiter is allowed in it."""
+        delim = self.delimiter
+        body = len(payload) - len(delim) if payload.endswith(delim) else len(payload)
+        if payload.find(delim, 0, body) >= 0:
+            raise FrameError(f"payload contains the delimiter {delim!r}; it would arrive as several frames")
+        return payload if body < len(payload) else payload + delim
+
+
+class LengthPrefixedParser(_Parser):
+    """Binary frames preceded by a fixed-size unsigned length header.
+
+    `header` is a struct format for the length field ('<H' = little-endian
+    uint16 by default). The length counts payload bytes only.
+    """
+
+    def __init__(self, header="<H", **kw):
+        super().__init__(**kw)
+        self.header = struct.Struct(header)
+
+    def _parse(self):
+        buf, pos, end = self.buf, self.pos, self.end
+        hsize = self.header.size
+        unpack = self.header.unpack_from
+        view = memoryview(buf).toreadonly()
+        out = []
+        while end - pos >= hsize:
+            (length,) = unpack(buf, pos)
+            if length > self.max_frame:
+                if out:
+                    break  # hand out the good frames; the next feed() raises
+                self.errors += 1
+                raise FrameError(f"frame length {length} exceeds max_frame {self.max_frame}")
+            start = pos + hsize
+            if end - start < length:
+                break
+            out.append(view[start:start + length])
+            pos = start + length
+        self.pos = pos
+        self.frames += len(out)
+        return out
+
+    def encode(self, payload):
+        """Frame a payload for this parser."""
+        if len(payload) > self.max_frame:
+            raise FrameError(f"payload of {len(payload)} bytes exceeds max_frame {self.max_frame}")
+        return self.header.pack(len(payload)) + payload
@@ -0,0 +1,84 @@
+"""Parser microbenchmark: old partition-based line splitting vs framing.py.
+
+    python -m dual_link.framing_bench
+    python -m dual_link.framing_bench --mb 16 --chunk 256 --line 48
+
+Feeds the same byte stream to each parser in fixed-size chunks (as a
+serial transport delivers them) and reports MB/s and frames/s, plus the
+headroom over the 115200 baud ESP32 link (~11.5 KB/s of payload).
+"""
+
+import argparse
+import random
+import time
+
+from .framing import LengthPrefixedParser, LineParser
+
+LINK_BYTES_PER_S = 115200 / 10
+
+
+class PartitionParser:
+    """The pre-framing SerialEndpoint.data_received loop, kept for comparison."""
+
+    def __init__(self):
+        self.buf = bytearray()
+
+    def feed(self, data):
+        self.buf.extend(data)
+        out = []
+        while b'\n' in self.buf:
+            line, _, rest = self.buf.partition(b'\n')
+            self.buf = bytearray(rest)
+            out.append(line)
+        return out
+
+
+def make_stream(total_bytes, line_len, seed=0):
+    """(newline-framed stream, length-prefixed stream, frame count) of ~total_bytes."""
+    rng = random.Random(seed)
+    payloads = []
+    size = 0
+    while size < total_bytes:
+        n = max(1, int(rng.uniform(0.5, 1.5) * line_len))
+        payloads.append(bytes(rng.choices(b"0123456789abcdef,", k=n)))
+        size += n + 1
+    lines, prefixed = LineParser(), LengthPrefixedParser()
+    return (b"".join(lines.encode(p) for p in payloads),
+            b"".join(prefixed.encode(p) for p in payloads),
+            len(payloads))
+
+
+def run(parser, stream, chunk):
+    frames = 0
+    t0 = time.perf_counter()
+    for i in range(0, len(stream), chunk):
+        frames += len(parser.feed(stream[i:i + chunk]))
+    return time.perf_counter() - t0, frames
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Framing parser microbenchmark")
+    parser.add_argument('--mb', type=float, default=8, help="stream size in MB")
+    parser.add_argument('--chunk', type=int, default=1024, help="bytes per data_received call")
+    parser.add_argument('--line', type=int, default=64, help="mean frame length in bytes")
+    args = parser.parse_args()
+
+    line_stream, prefixed_stream, count = make_stream(int(args.mb * 1e6), args.line)
+    cases = [
+        ('partition (old)', PartitionParser(), line_stream),
+        ('LineParser', LineParser(), line_stream),
+        ('LengthPrefixed', LengthPrefixedParser(), prefixed_stream),
+    ]
+    print(f"{count} frames, {len(line_stream) / 1e6:.1f} MB, {args.chunk} B chunks\n")
+    print(f"{'parser':<18}{'MB/s':>10}{'frames/s':>14}{'x 115200 baud':>16}")
+    for name, p, stream in cases:
+        elapsed, frames = run(p, stream, args.chunk)
+        if frames != count:
+            raise SystemExit(f"FAIL: {name} returned {frames} frames, expected {count}")
+        mb_s = len(stream) / elapsed / 1e6
+        print(f"{name:<18}{mb_s:>10.1f}{frames / elapsed:>14,.0f}"
+              f"{len(stream) / elapsed / LINK_BYTES_PER_S:>16,.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""Constant-memory latency histogram shared by the load harness, the link queues and telemetry."""
+
+NS_PER_MS = 1_000_000
+
+
+class LatencyHistogram:
+    """Constant-memory latency histogram with log-linear buckets (values in ns).
+
+    Each power-of-two range is split into 2**precision_bits linear
+    sub-buckets, so any recorded value is reported within a relative error
+    of 2**-precision_bits (about 3% at the default 5 bits). Values above
+    2**max_bits ns (about 18 minutes by default) are clamped.
+    """
+
+    def __init__(self, precision_bits=5, max_bits=40):
+        self.m = precision_bits
+        self.max_value = (1 << max_bits) - 1
+        self.counts = [0] * ((1 << (self.m + 1)) + (max_bits - self.m - 1) * (1 << self.m))
+        self.count = 0
+        self.total = 0
+        self.min = None
+        self.max = None
+
+    def _bounds(self, i):
+        """[low, high] value range of bucket i."""
+        m = self.m
+        if i < (2 << m):
+            return i, i
+        shift = ((i - (2 << m)) >> m) + 1
+        top = (i - (2 << m)) % (1 << m) + (1 << m)
+        return top << shift, ((top + 1) << shift) - 1
+
+    def record(self, value_ns, count=1):
+        """Add `count` occurrences of value_ns."""
+        v = int(value_ns)
+        if v < 0:
+            v = 0
+        elif v > self.max_value:
+            v = self.max_value
+        # bucket index, inlined: this runs once per frame on the send path
+        m = self.m
+        if v < (2 << m):
+            i = v
+        else:
+            shift = v.bit_length() - (m + 1)
+            i = (2 << m) + ((shift - 1) << m) + ((v >> shift) - (1 << m))
+        self.counts[i] += count
+        self.count += count
+        self.total += v * count
+        if self.count == count:
+            self.min = self.max = v
+        elif v < self.min:
+            self.min = v
+        elif v > self.max:
+            self.max = v
+
+    def merge(self, other):
+        for i, c in enumerate(other.counts):
+            self.counts[i] += c
+        self.count += other.count
+        self.total += other.total
+        if other.min is not None:
+            self.min = other.min if self.min is None else min(self.min, other.min)
+            self.max = other.max if self.max is None else max(self.max, other.max)
+
+    def copy(self):
+        other = LatencyHistogram.__new__(LatencyHistogram)
+        other.__dict__.update(self.__dict__)
+        other.counts = list(self.counts)
+        return other
+
+    def since(self, earlier):
+        """Values recorded after `earlier`, a copy() of this histogram.
+
+        min and max of the difference are only known to bucket precision.
+        """
+        diff = self.copy()
+        diff.counts = [a - b for a, b in zip(self.counts, earlier.counts)]
+        diff.count = self.count - earlier.count
+        diff.total = self.total - earlier.total
+        used = [i for i, c in enumerate(diff.counts) if c]
+        diff.min = self._bounds(used[0])[0] if used else None
+        diff.max = min(self._bounds(used[-1])[1], self.max) if used else None
+        return diff
+
+    def percentile(self, q):
+        """Value at percentile q (0-100): the midpoint of the bucket holding it."""
+        if not self.count:
+            return None
+        rank = max(1, -(-self.count * q // 100))   # ceil, at least the first sample
+        seen = 0
+        for i, c in enumerate(self.counts):
+            seen += c
+            if seen >= rank:
+                lo, hi = self._bounds(i)
+                return min(max((lo + hi) // 2, self.min), self.max)
+        return self.max
+
+    @property
+    def mean(self):
+        return self.total / self.count if self.count else None
+
+    def summary(self, percentiles=(50, 99, 99.9), unit=1):
+        """count, min, mean, percentiles and max, with values divided by `unit`."""
+        def scaled(v):
+            return None if v is None else round(v / unit, 3)
+        out = {'count': self.count, 'min': scaled(self.min), 'mean': scaled(self.mean)}
+        for q in percentiles:
+            out[f"p{q:g}"] = scaled(self.percentile(q))
+        out['max'] = scaled(self.max)
+        return out
+
+    def summary_ms(self, percentiles=(50, 99, 99.9)):
+        return self.summary(percentiles, NS_PER_MS)
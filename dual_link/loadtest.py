@@ -0,0 +1,301 @@
+"""Per-link latency and throughput harness over echoing loopback stand-ins.
+
+    python -m dual_link.loadtest --mode open --rates 500,2000,8000 --duration 3
+    python -m dual_link.loadtest --mode closed --concurrency 1,8,64 --links xbee
+    python -m dual_link.loadtest --transport pty --rates 1000,4000 --json out.json
+
+Every message carries a unique id. The stand-in sink timestamps each line
+when it arrives (one-way latency) and echoes it; the router's on_line
+callback matches the echo by id (round-trip latency). Latencies go into a
+log-bucketed LatencyHistogram per link, so memory stays constant however
+many messages are sent.
+
+Offered load is either open-loop (a fixed arrival rate, independent of
+replies) or closed-loop (N messages outstanding, each reply releases the
+next). Open-loop latency is measured from the *scheduled* send time, so a
+stalled sender shows up as latency instead of silently lowering the load.
+Messages not echoed within --grace seconds of the end count as lost, as do
+messages a bounded link queue dropped or refused. Queue counters are
+reported per step.
+Sweeping the rate or concurrency shows where a link saturates: achieved
+rate stops tracking offered rate and p99 climbs.
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import time
+
+from .bench import open_standins
+from .histogram import LatencyHistogram
+from .router import Router
+
+
+QUEUE_COUNTERS = ('sent_frames', 'dropped', 'spilled', 'transport_pauses')
+
+
+class LinkProbe:
+    """Per-link counters and latency histograms for one load step."""
+
+    def __init__(self, name, link):
+        self.name = name
+        self.one_way = LatencyHistogram()
+        self.rtt = LatencyHistogram()
+        self.sent = 0
+        self.sent_bytes = 0
+        self.echoed = 0
+        self.echoed_bytes = 0
+        self.dropped = 0     # resolved to None by a 'drop' queue
+        self.refused = 0     # QueueFull from an 'await' queue
+        # the link's cumulative counters at the start of the step
+        self.link = link
+        link.max_depth_bytes = link.queued_bytes
+        self.queue_start = {key: getattr(link, key) for key in ('sent_frames', 'dropped', 'spilled')}
+        self.queue_start['transport_pauses'] = link.endpoint.pauses
+        self.queue_start['pacing_wait_s'] = link.bucket.waited_s if link.bucket else 0.0
+        self.wait_start = link.wait.copy()
+
+    def queue_metrics(self):
+        """Link.metrics() with the counters and wait times of this step only."""
+        out = self.link.metrics()
+        for key in QUEUE_COUNTERS:
+            out[key] -= self.queue_start[key]
+        if self.link.bucket:
+            out['pacing_wait_s'] = round(self.link.bucket.waited_s - self.queue_start['pacing_wait_s'], 3)
+        out['wait_ms'] = self.link.wait.since(self.wait_start).summary_ms()
+        return out
+
+
+class LoadHarness:
+    """Stamp messages, send them through a Router and match the echoes.
+
+        harness = await LoadHarness.open("socket")
+        result = await harness.open_loop("esp32", rate=2000, duration=3)
+        await harness.close()
+    """
+
+    def __init__(self, **router_opts):
+        self.router = Router(on_line=self._on_echo, **router_opts)
+        self.sinks = {}
+        self.closers = []
+        self._outstanding = {}   # id -> (probe, t_sent_ns, size, waiter future or None)
+        self._next_id = 0
+
+    @classmethod
+    async def open(cls, transport="socket", **router_opts):
+        """router_opts go to Router (e.g. pace=True, queue_bytes=2048, overflow='drop')."""
+        self = cls(**router_opts)
+        self.sinks, self.closers = await open_standins(
+            self.router, transport, keep=False, echo=True, on_line=self._on_arrival)
+        return self
+
+    async def close(self):
+        await self.router.close(drain=False)
+        for close in self.closers:
+            close()
+
+    # --- stamping and matching ---
+
+    def _payload(self, size):
+        msg_id = self._next_id
+        self._next_id += 1
+        return msg_id, f"{msg_id:x}".encode().ljust(size, b".")
+
+    def _send(self, probe, size, t_sent_ns, waiter=None):
+        msg_id, payload = self._payload(size)
+        probe.sent += 1
+        probe.sent_bytes += size
+        try:
+            fut = self.router.send(payload, probe.name)
+        except asyncio.QueueFull:
+            probe.refused += 1   # never queued: lost (a closed-loop worker times out)
+            return
+        self._outstanding[msg_id] = (probe, t_sent_ns, size, waiter)
+        fut.add_done_callback(lambda f, msg_id=msg_id: self._on_routed(msg_id, f))
+
+    def _on_routed(self, msg_id, fut):
+        # dropped by the link queue (resolves to None): it will never be echoed
+        if not fut.cancelled() and fut.exception() is None and fut.result() is None:
+            entry = self._outstanding.pop(msg_id, None)
+            if entry is not None:
+                entry[0].dropped += 1
+                if entry[3] is not None and not entry[3].done():
+                    entry[3].cancel()
+
+    @staticmethod
+    def _id(line):
+        return int(line.split(b".", 1)[0] if isinstance(line, bytes) else line.split(".", 1)[0], 16)
+
+    def _on_arrival(self, name, line, t_ns):
+        entry = self._outstanding.get(self._id(line))
+        if entry is not None:
+            entry[0].one_way.record(t_ns - entry[1])
+
+    def _on_echo(self, name, text):
+        t_ns = time.perf_counter_ns()
+        entry = self._outstanding.pop(self._id(text), None)
+        if entry is None:
+            return   # echo of a message already written off as lost
+        probe, t_sent, size, waiter = entry
+        probe.rtt.record(t_ns - t_sent)
+        probe.echoed += 1
+        probe.echoed_bytes += size
+        if waiter is not None and not waiter.done():
+            waiter.set_result(None)
+
+    async def _settle(self, grace):
+        """Wait up to `grace` s for echoes, then write off the rest; returns how many timed out."""
+        deadline = time.perf_counter() + grace
+        while self._outstanding and time.perf_counter() < deadline:
+            await asyncio.sleep(0.005)
+        timed_out = len(self._outstanding)
+        for _, _, _, waiter in self._outstanding.values():
+            if waiter is not None and not waiter.done():
+                waiter.cancel()
+        self._outstanding.clear()
+        return timed_out
+
+    def _result(self, probe, mode, offered, elapsed, timed_out):
+        # dropped, refused or never echoed: everything that didn't make the round trip
+        lost = probe.sent - probe.echoed
+        return {
+            'link': probe.name,
+            'mode': mode,
+            'offered': offered,
+            'sent': probe.sent,
+            'echoed': probe.echoed,
+            'lost': lost,
+            'dropped': probe.dropped,
+            'refused': probe.refused,
+            'timed_out': timed_out,
+            'loss_pct': round(100 * lost / probe.sent, 3) if probe.sent else 0.0,
+            'achieved_msgs_per_s': round(probe.echoed / elapsed, 1),
+            'goodput_kbps': round(probe.echoed_bytes * 8 / elapsed / 1000, 2),
+            'one_way_ms': probe.one_way.summary_ms(),
+            'rtt_ms': probe.rtt.summary_ms(),
+            'queue': probe.queue_metrics(),
+        }
+
+    # --- load generators ---
+
+    async def open_loop(self, link, rate, duration, size=64, poisson=False, grace=2.0, seed=0):
+        """Offer `rate` msgs/s to `link` for `duration` s regardless of replies."""
+        probe = LinkProbe(link, self.router.links[link])
+        rng = random.Random(seed)
+        interval_ns = 1e9 / rate
+        t0 = time.perf_counter_ns()
+        end = t0 + int(duration * 1e9)
+        next_ns = t0
+        while next_ns < end:
+            now = time.perf_counter_ns()
+            # send everything that is due; a late loop iteration catches up in a burst
+            while next_ns <= now and next_ns < end:
+                self._send(probe, size, next_ns)
+                next_ns += int(rng.expovariate(1.0) * interval_ns) if poisson else int(interval_ns)
+            await asyncio.sleep(max(0.0, (next_ns - time.perf_counter_ns()) / 1e9))
+        elapsed = (time.perf_counter_ns() - t0) / 1e9
+        timed_out = await self._settle(grace)
+        return self._result(probe, 'open', rate, elapsed, timed_out)
+
+    async def closed_loop(self, link, concurrency, duration, size=64, timeout=2.0, grace=2.0):
+        """Keep `concurrency` messages outstanding on `link` for `duration` s."""
+        probe = LinkProbe(link, self.router.links[link])
+        loop = asyncio.get_running_loop()
+        end = time.perf_counter() + duration
+
+        async def worker():
+            while time.perf_counter() < end:
+                waiter = loop.create_future()
+                self._send(probe, size, time.perf_counter_ns(), waiter)
+                try:
+                    await asyncio.wait_for(waiter, timeout)
+                except (asyncio.TimeoutError, asyncio.CancelledError):
+                    pass   # still outstanding; counted as lost unless it arrives by _settle()
+
+        t0 = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - t0
+        timed_out = await self._settle(grace)
+        return self._result(probe, 'closed', concurrency, elapsed, timed_out)
+
+
+def saturation(results, min_ratio=0.95):
+    """First step whose achieved rate falls below min_ratio x offered (open loop), else None."""
+    for r in results:
+        if r['mode'] == 'open' and r['achieved_msgs_per_s'] < min_ratio * r['offered']:
+            return r['offered']
+    return None
+
+
+async def run_sweep(links, mode, steps, duration, size, transport="socket", poisson=False, grace=2.0,
+                    **router_opts):
+    harness = await LoadHarness.open(transport, **router_opts)
+    results = []
+    try:
+        for link in links:
+            for step in steps:
+                if mode == 'open':
+                    r = await harness.open_loop(link, step, duration, size, poisson, grace)
+                else:
+                    r = await harness.closed_loop(link, step, duration, size, grace=grace)
+                print_row(r)
+                results.append(r)
+    finally:
+        await harness.close()
+    return results
+
+
+def print_header():
+    print(f"{'link':<6} {'mode':<6} {'offered':>8} {'achieved/s':>11} {'goodput kb/s':>13} "
+          f"{'loss%':>7} {'1w p50':>8} {'rtt p50':>8} {'rtt p99':>8} {'p99.9':>8} {'max':>8}")
+
+
+def print_row(r):
+    rtt, ow = r['rtt_ms'], r['one_way_ms']
+
+    def f(v):
+        return f"{v:8.3f}" if v is not None else f"{'-':>8}"
+    print(f"{r['link']:<6} {r['mode']:<6} {r['offered']:>8} {r['achieved_msgs_per_s']:>11.1f} "
+          f"{r['goodput_kbps']:>13.2f} {r['loss_pct']:>7.2f} {f(ow['p50'])} {f(rtt['p50'])} "
+          f"{f(rtt['p99'])} {f(rtt['p99.9'])} {f(rtt['max'])}", flush=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-link latency/throughput harness")
+    parser.add_argument('--transport', choices=['socket', 'pty'], default='socket')
+    parser.add_argument('--links', default='xbee,esp32', help="comma list of links to load")
+    parser.add_argument('--mode', choices=['open', 'closed'], default='open')
+    parser.add_argument('--rates', default='500,2000,8000,32000',
+                        help="open loop: comma list of offered msgs/s")
+    parser.add_argument('--concurrency', default='1,8,64',
+                        help="closed loop: comma list of outstanding messages")
+    parser.add_argument('--poisson', action='store_true', help="open loop: exponential inter-arrival times")
+    parser.add_argument('--duration', type=float, default=2.0, help="seconds per step")
+    parser.add_argument('--size', type=int, default=64, help="payload bytes per message")
+    parser.add_argument('--grace', type=float, default=2.0, help="seconds to wait for echoes after a step")
+    parser.add_argument('--pace', action='store_true', help="pace each link at its baud rate")
+    parser.add_argument('--queue-bytes', type=int, default=None, help="bound each link's send queue")
+    parser.add_argument('--overflow', choices=['await', 'drop', 'spill'], default='drop',
+                        help="what a full queue does (await = refuse, counted as loss here)")
+    parser.add_argument('--json', help="write the results here")
+    args = parser.parse_args()
+
+    steps = [int(float(s)) for s in (args.rates if args.mode == 'open' else args.concurrency).split(',')]
+    links = args.links.split(',')
+    print_header()
+    results = asyncio.run(run_sweep(links, args.mode, steps, args.duration, args.size,
+                                    args.transport, args.poisson, args.grace, pace=args.pace,
+                                    queue_bytes=args.queue_bytes, overflow=args.overflow))
+    if args.mode == 'open':
+        for link in links:
+            sat = saturation([r for r in results if r['link'] == link])
+            print(f"{link}: " + (f"saturates at <= {sat} msgs/s" if sat else "no saturation in sweep"))
+    if args.json:
+        with open(args.json, 'w') as fh:
+            json.dump(results, fh, indent=2)
+        print(f"\nSaved: {args.json}")
+
+
+if __name__ == "__main__":
+    main()
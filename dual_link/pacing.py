@@ -0,0 +1,35 @@
+"""Token-bucket pacing at a serial link's line rate."""
+
+import asyncio
+
+
+class TokenBucket:
+    """Refills at `rate` bytes/s up to `capacity` bytes.
+
+    take(n) waits until n bytes' worth of tokens have accumulated. A request
+    larger than the capacity waits for the whole amount rather than being
+    refused, so oversized frames are paced too, just without any burst.
+    """
+
+    def __init__(self, rate, capacity=None):
+        self.rate = float(rate)
+        self.capacity = float(capacity if capacity is not None else max(1.0, rate / 20))
+        self.tokens = self.capacity
+        self.waited_s = 0.0
+        self._last = None
+
+    def _refill(self, now):
+        if self._last is not None:
+            self.tokens = min(self.capacity, self.tokens + (now - self._last) * self.rate)
+        self._last = now
+
+    async def take(self, n):
+        loop = asyncio.get_running_loop()
+        self._refill(loop.time())
+        if self.tokens < n:
+            delay = (n - self.tokens) / self.rate
+            self.waited_s += delay
+            await asyncio.sleep(delay)
+            self._refill(loop.time())
+        # never carry debt: a long sleep overshoot simply refills
+        self.tokens = max(0.0, self.tokens - n)
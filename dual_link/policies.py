@@ -0,0 +1,99 @@
+"""Link scheduling policies for the dual-link router.
+
+A policy is any object with `choose(payload, links) -> link name`, where
+`links` maps names to router Link objects (see router.py). Plain functions
+`f(payload) -> name` are accepted too and wrapped in FunctionPolicy.
+"""
+
+SMALL_THRESHOLD = 64  # bytes: <= goes to XBee, > goes to ESP32
+
+
+def choose_interface(payload: bytes) -> str:
+    # demo: small -> XBee, large -> ESP32
+    return "xbee" if len(payload) <= SMALL_THRESHOLD else "esp32"
+
+
+class FunctionPolicy:
+    """Adapt a plain `f(payload) -> name` function."""
+
+    def __init__(self, func):
+        self.func = func
+
+    def choose(self, payload, links):
+        return self.func(payload)
+
+
+class ThresholdPolicy:
+    """Fixed size split: payloads <= threshold go to `small`, the rest to `large`."""
+
+    def __init__(self, threshold=SMALL_THRESHOLD, small="xbee", large="esp32"):
+        self.threshold = threshold
+        self.small = small
+        self.large = large
+
+    def choose(self, payload, links):
+        return self.small if len(payload) <= self.threshold else self.large
+
+
+class RoundRobinPolicy:
+    """Alternate between links regardless of size (baseline for benchmarks)."""
+
+    def __init__(self):
+        self._i = 0
+
+    def choose(self, payload, links):
+        names = list(links)
+        name = names[self._i % len(names)]
+        self._i += 1
+        return name
+
+
+class EarliestCompletionPolicy:
+    """Send on the link that would finish transmitting this payload soonest.
+
+    Completion time is estimated as (bytes already queued + this payload)
+    divided by the link's line rate, so a slow link is still used for small
+    messages while it is idle but is skipped once it has a backlog.
+    """
+
+    def choose(self, payload, links):
+        best, best_t = None, None
+        for name, link in links.items():
+            t = (link.queued_bytes + len(payload) + 1) / link.bytes_per_s
+            if best_t is None or t < best_t:
+                best, best_t = name, t
+        return best
+
+
+class CheapestLinkPolicy:
+    """Pick the link whose protocol has the lowest fitted energy for this size.
+
+    `link_for_mode` maps cost-model modes to router link names; only modes
+    with a link are considered. The lookup is a table index into the
+    CostModel, which reloads itself when the results CSV changes.
+    """
+
+    DEFAULT_LINKS = {'BLE_CONN': 'xbee', 'WiFi': 'esp32'}
+
+    def __init__(self, model=None, link_for_mode=None, warm=True):
+        if model is None:
+            from .cost_model import CostModel
+            model = CostModel()
+        self.model = model
+        self.link_for_mode = dict(link_for_mode or self.DEFAULT_LINKS)
+        self.modes = tuple(sorted(self.link_for_mode))
+        self.warm = warm
+
+    def choose(self, payload, links):
+        mode = self.model.cheapest(len(payload), self.modes, self.warm)
+        return self.link_for_mode[mode]
+
+
+def as_policy(policy):
+    if policy is None:
+        return ThresholdPolicy()
+    if hasattr(policy, "choose"):
+        return policy
+    if callable(policy):
+        return FunctionPolicy(policy)
+    raise TypeError(f"not a scheduling policy: {policy!r}")
@@ -0,0 +1,394 @@
+"""Offline replay of a message log through link-scheduling policies in virtual time.
+
+    python -m dual_link.replay --synthetic 7200 --rate 4            # 30 min of traffic_generator()
+    python -m dual_link.replay --log messages.csv --threshold 0:1024:16 --batch-bytes 512,4096 -j 4
+    python -m dual_link.replay --synthetic 20000 --save-log msgs.csv --json results.json
+
+A log is one row per message: arrival time, payload size and deadline (all
+relative seconds; `t_s,size,deadline_s` in CSV). Each policy variant replays
+the whole log against simulated links instead of the radios, so a 30-minute
+TEST_SECONDS run costs milliseconds and thousands of variants fit in one
+sweep.
+
+Links are modelled by the fitted ModeCost of the mode they carry (see
+cost_model.py, from full_energy_results.csv). A link sends one message at
+a time in FIFO order, taking t0 + t1 x size seconds and e0 + e1 x size mJ
+per message. A message that finds the link idle starts a new session,
+which adds the measured init + teardown time and energy. Messages sent
+back to back (a queue, a batch) share one session.
+
+Router policies (policies.py) run unchanged: each message is offered to
+`choose()` on arrival, with SimLink objects standing in for router Links.
+Batching is replayed by ReplayCoalescer, which makes the same flush
+decisions as Coalescer on the virtual clock.
+
+Every variant reports total energy, latency percentiles (arrival to end of
+transmission), deadline misses and per-link messages, sessions, energy and
+utilization.
+"""
+
+import argparse
+import collections
+import csv
+import itertools
+import json
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from .batching import Coalescer
+from .cost_model import CostModel
+from .policies import (SMALL_THRESHOLD, CheapestLinkPolicy, EarliestCompletionPolicy, RoundRobinPolicy,
+                       ThresholdPolicy, as_policy, choose_interface)
+from .router import BAUD_ESP32, BAUD_XBEE
+
+SIZES = [16, 32, 48, 64, 128, 256, 512]   # traffic_generator() payload sizes
+RATE = 4.0                                 # traffic_generator() sends every 0.25 s
+DEADLINE_S = 30.0
+
+# link name -> (cost-model mode, baud); the same pairing as CheapestLinkPolicy.DEFAULT_LINKS
+LINKS = {'xbee': ('BLE_CONN', BAUD_XBEE), 'esp32': ('WiFi', BAUD_ESP32)}
+
+_PAYLOAD = memoryview(bytes(1 << 16))   # policies only look at len(payload)
+
+
+# --- message logs ---
+
+class MessageLog:
+    """Arrival time, size and relative deadline of every message, sorted by arrival."""
+
+    def __init__(self, t_s, size, deadline_s):
+        order = np.argsort(t_s, kind='stable')
+        self.t_s = np.asarray(t_s, dtype=np.float64)[order]
+        self.size = np.asarray(size, dtype=np.int64)[order]
+        self.deadline_s = np.asarray(deadline_s, dtype=np.float64)[order]
+
+    def __len__(self):
+        return len(self.t_s)
+
+    @property
+    def span_s(self):
+        return float(self.t_s[-1] - self.t_s[0]) if len(self) else 0.0
+
+    @classmethod
+    def load(cls, path):
+        with open(path, newline='') as f:
+            rows = list(csv.DictReader(f))
+        return cls([float(r['t_s']) for r in rows], [int(r['size']) for r in rows],
+                   [float(r.get('deadline_s') or DEADLINE_S) for r in rows])
+
+    def save(self, path):
+        with open(path, 'w', newline='') as f:
+            w = csv.writer(f)
+            w.writerow(['t_s', 'size', 'deadline_s'])
+            for t, s, d in zip(self.t_s.tolist(), self.size.tolist(), self.deadline_s.tolist()):
+                w.writerow([f"{t:.6f}", s, f"{d:g}"])
+
+
+def synthetic_log(n, rate=RATE, sizes=SIZES, deadline_s=DEADLINE_S, poisson=True, seed=0):
+    """n messages like traffic_generator(): random sizes at `rate` msgs/s (Poisson or fixed)."""
+    rng = random.Random(seed)
+    t, out_t = 0.0, []
+    for _ in range(n):
+        out_t.append(t)
+        t += rng.expovariate(rate) if poisson else 1 / rate
+    return MessageLog(out_t, [rng.choice(sizes) for _ in range(n)], [deadline_s] * n)
+
+
+# --- simulated links ---
+
+class SimLink:
+    """Virtual-time stand-in for a router Link carrying one cost-model mode."""
+
+    def __init__(self, name, cost, baud):
+        self.name = name
+        self.cost = cost
+        self.bytes_per_s = baud / 10   # what EarliestCompletionPolicy reads, as on a real Link
+        self.queued_bytes = 0
+        self.busy_until = float('-inf')
+        self.messages = 0
+        self.bytes = 0
+        self.sessions = 0
+        self.energy_mJ = 0.0
+        self.busy_s = 0.0
+        self._inflight = collections.deque()   # (done_at, size)
+
+    def advance(self, now):
+        """Retire messages finished by `now` from queued_bytes."""
+        q = self._inflight
+        while q and q[0][0] <= now:
+            self.queued_bytes -= q.popleft()[1]
+
+    def transmit(self, now, size):
+        """Queue one message at `now`; returns the time its transmission ends."""
+        c = self.cost
+        service = c.t0_s + c.t1_s * size
+        energy = c.e0_mJ + c.e1_mJ * size
+        if now > self.busy_until:       # idle link: a new session
+            start = now
+            service += c.session_s
+            energy += c.session_mJ
+            self.sessions += 1
+        else:
+            start = self.busy_until
+        done = start + service
+        self.busy_until = done
+        self.busy_s += service
+        self.energy_mJ += energy
+        self.messages += 1
+        self.bytes += size
+        self.queued_bytes += size
+        self._inflight.append((done, size))
+        return done
+
+
+class Simulation:
+    """One replay of a log: the links plus per-message completion times."""
+
+    def __init__(self, log, model, links=LINKS):
+        self.log = log
+        self.links = {name: SimLink(name, model.modes[mode], baud) for name, (mode, baud) in links.items()}
+        self.done_at = np.full(len(log), np.nan)
+
+    def advance(self, now):
+        for link in self.links.values():
+            link.advance(now)
+
+    def send(self, i, link, now):
+        self.done_at[i] = self.links[link].transmit(now, int(self.log.size[i]))
+
+    def run(self, policy):
+        if hasattr(policy, 'replay'):
+            policy.replay(self)
+            return self
+        policy = as_policy(policy)
+        links = self.links
+        for i, (t, size) in enumerate(zip(self.log.t_s.tolist(), self.log.size.tolist())):
+            for link in links.values():
+                link.advance(t)
+            name = policy.choose(_PAYLOAD[:size], links)
+            self.done_at[i] = links[name].transmit(t, size)
+        return self
+
+    def result(self, label=None):
+        log = self.log
+        latency_ms = (self.done_at - log.t_s) * 1000
+        missed = int(np.count_nonzero(self.done_at > log.t_s + log.deadline_s))
+        span = 0.0
+        if len(log):
+            end = max([log.t_s[-1]] + [link.busy_until for link in self.links.values() if link.messages])
+            span = end - log.t_s[0]
+        energy = sum(link.energy_mJ for link in self.links.values())
+        p50, p95, p99 = np.percentile(latency_ms, [50, 95, 99]) if len(log) else (0.0, 0.0, 0.0)
+        return {
+            'policy': label,
+            'messages': len(log),
+            'energy_mJ': round(energy, 3),
+            'energy_per_msg_mJ': round(energy / len(log), 3) if len(log) else 0.0,
+            'latency_ms': {
+                'mean': round(float(latency_ms.mean()), 3) if len(log) else 0.0,
+                'p50': round(float(p50), 3),
+                'p95': round(float(p95), 3),
+                'p99': round(float(p99), 3),
+                'max': round(float(latency_ms.max()), 3) if len(log) else 0.0,
+            },
+            'deadline_misses': missed,
+            'miss_pct': round(100 * missed / len(log), 3) if len(log) else 0.0,
+            'links': {
+                name: {
+                    'messages': link.messages,
+                    'bytes': link.bytes,
+                    'sessions': link.sessions,
+                    'energy_mJ': round(link.energy_mJ, 3),
+                    'utilization': round(link.busy_s / span, 4) if span > 0 else 0.0,
+                }
+                for name, link in self.links.items()
+            },
+        }
+
+
+class ReplayCoalescer(Coalescer):
+    """Coalescer's flush rules (large, size, break_even, deadline) on the virtual clock."""
+
+    def __init__(self, model, **kw):
+        super().__init__(None, model, **kw)
+
+    def replay(self, sim):
+        log = sim.log
+        self._fire_at = None
+        for i, (t, size, deadline) in enumerate(zip(log.t_s.tolist(), log.size.tolist(),
+                                                    log.deadline_s.tolist())):
+            if self._fire_at is not None and self._fire_at <= t:
+                self._flush_at(sim, self._fire_at, "deadline")
+            self._pending.append((i, size, t))
+            self._bytes += size
+            if self._deadline is None or t + deadline < self._deadline:
+                self._deadline = t + deadline
+
+            n = len(self._pending)
+            if size > self.small_bytes:
+                self._flush_at(sim, t, "large")
+            elif self._bytes >= self.max_batch_bytes:
+                self._flush_at(sim, t, "size")
+            elif self._burst_mJ(n, self._bytes) <= self._fallback_mJ(n, self._bytes):
+                self._flush_at(sim, t, "break_even")
+            else:
+                self._fire_at = max(t, self._deadline - self._burst_latency_s(n, self._bytes))
+        if self._pending:
+            self._flush_at(sim, self._fire_at, "deadline")
+
+    def _flush_at(self, sim, now, reason):
+        batch, self._pending = self._pending, []
+        n, nbytes = len(batch), self._bytes
+        self._bytes = 0
+        self._deadline = None
+        self._fire_at = None
+
+        burst = self._burst_mJ(n, nbytes)
+        fallback = self._fallback_mJ(n, nbytes)
+        link = self.link if reason == "large" or burst <= fallback else self.fallback_link
+        self.totals['batches'] += 1
+        self.totals['messages'] += n
+        sim.advance(now)
+        for i, _, _ in batch:
+            sim.send(i, link, now)
+
+
+# --- policy variants ---
+
+def make_policy(kind, params, model):
+    """Build one policy variant from its (kind, params) spec."""
+    if kind == 'choose_interface':
+        return choose_interface
+    if kind == 'threshold':
+        return ThresholdPolicy(**params)
+    if kind == 'roundrobin':
+        return RoundRobinPolicy()
+    if kind == 'earliest':
+        return EarliestCompletionPolicy()
+    if kind == 'cheapest':
+        return CheapestLinkPolicy(model, **params)
+    if kind == 'batching':
+        return ReplayCoalescer(model, **params)
+    raise ValueError(f"unknown policy kind {kind!r}")
+
+
+def label(kind, params):
+    return kind + "".join(f" {k}={v}" for k, v in params.items())
+
+
+def variants(thresholds=(SMALL_THRESHOLD,), batch_bytes=(4096,), batch_small=(SMALL_THRESHOLD,)):
+    """(kind, params) specs: the fixed policies plus threshold and batching sweeps."""
+    specs = [('choose_interface', {}), ('roundrobin', {}), ('earliest', {}),
+             ('cheapest', {'warm': True}), ('cheapest', {'warm': False})]
+    specs += [('threshold', {'threshold': t}) for t in thresholds]
+    specs += [('batching', {'max_batch_bytes': b, 'small_bytes': s})
+              for b, s in itertools.product(batch_bytes, batch_small)]
+    return specs
+
+
+def run_specs(log, specs, model_path=None):
+    model = CostModel(model_path) if model_path else CostModel()
+    return [Simulation(log, model).run(make_policy(kind, params, model)).result(label(kind, params))
+            for kind, params in specs]
+
+
+def _run_chunk(args):
+    return run_specs(*args)
+
+
+def compare(log, specs, workers=1, model_path=None):
+    """Replay every spec over the log; results in spec order."""
+    if workers <= 1 or len(specs) < 2:
+        return run_specs(log, specs, model_path)
+    chunks = [specs[i::workers] for i in range(workers)]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        parts = list(pool.map(_run_chunk, [(log, c, model_path) for c in chunks if c]))
+    # undo the round-robin split
+    out = [None] * len(specs)
+    for w, part in enumerate(parts):
+        out[w::workers] = part
+    return out
+
+
+def pareto(results):
+    """Results not beaten on both energy and p99 latency by another result."""
+    ranked = sorted(results, key=lambda r: (r['energy_mJ'], r['latency_ms']['p99']))
+    front, best_p99 = [], float('inf')
+    for r in ranked:
+        if r['latency_ms']['p99'] < best_p99:
+            front.append(r)
+            best_p99 = r['latency_ms']['p99']
+    return front
+
+
+# --- CLI ---
+
+def _int_list(text):
+    """'16,64,128' or a range 'start:stop:step' (stop inclusive)."""
+    if ':' in text:
+        start, stop, step = (int(x) for x in text.split(':'))
+        return list(range(start, stop + 1, step))
+    return [int(x) for x in text.split(',')]
+
+
+def print_table(results, title):
+    print(f"\n### {title} ###\n")
+    names = list(results[0]['links']) if results else []
+    print(f"{'policy':<46} {'energy J':>9} {'mJ/msg':>8} {'p50 ms':>9} {'p99 ms':>9} {'miss%':>6}  "
+          + "  ".join(f"{n + ' msgs/sess/util':>24}" for n in names))
+    for r in results:
+        lat = r['latency_ms']
+        links = "  ".join(f"{l['messages']:>8} {l['sessions']:>6} {l['utilization'] * 100:>7.1f}%"
+                          for l in r['links'].values())
+        print(f"{r['policy']:<46} {r['energy_mJ'] / 1000:>9.2f} {r['energy_per_msg_mJ']:>8.2f} "
+              f"{lat['p50']:>9.1f} {lat['p99']:>9.1f} {r['miss_pct']:>6.2f}  {links}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    src = parser.add_mutually_exclusive_group()
+    src.add_argument('--log', help="message log CSV (t_s,size,deadline_s)")
+    src.add_argument('--synthetic', type=int, default=7200, help="messages in a synthetic log")
+    parser.add_argument('--rate', type=float, default=RATE, help="synthetic: messages per second")
+    parser.add_argument('--deadline', type=float, default=None, help="override every message's deadline (s)")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--save-log', help="write the (synthetic) log here")
+    parser.add_argument('--threshold', type=_int_list, default=[16, 32, 64, 128, 256],
+                        help="ThresholdPolicy sizes, e.g. 16,64 or 0:1024:8")
+    parser.add_argument('--batch-bytes', type=_int_list, default=[1024, 4096], help="Coalescer max_batch_bytes")
+    parser.add_argument('--batch-small', type=_int_list, default=[SMALL_THRESHOLD],
+                        help="Coalescer small_bytes")
+    parser.add_argument('--results', default=None, help="full_energy_results.csv to fit the cost model from")
+    parser.add_argument('-j', '--workers', type=int, default=1)
+    parser.add_argument('--top', type=int, default=15, help="rows to print, by energy")
+    parser.add_argument('--json', help="write every result here")
+    args = parser.parse_args()
+
+    log = MessageLog.load(args.log) if args.log else synthetic_log(args.synthetic, args.rate, seed=args.seed)
+    if args.deadline is not None:
+        log.deadline_s[:] = args.deadline
+    if args.save_log:
+        log.save(args.save_log)
+        print(f"Saved: {args.save_log}")
+
+    specs = variants(args.threshold, args.batch_bytes, args.batch_small)
+    t0 = time.perf_counter()
+    results = compare(log, specs, args.workers, args.results)
+    elapsed = time.perf_counter() - t0
+
+    print(f"{len(log)} messages over {log.span_s:.0f} s, {len(specs)} policy variants "
+          f"in {elapsed:.2f} s ({len(specs) * log.span_s / elapsed:,.0f}x real time)")
+    by_energy = sorted(results, key=lambda r: r['energy_mJ'])
+    print_table(by_energy[:args.top], f"LOWEST ENERGY (top {min(args.top, len(results))} of {len(results)})")
+    print_table(pareto(results), "PARETO FRONT (energy vs p99 latency)")
+    if args.json:
+        with open(args.json, 'w') as fh:
+            json.dump(results, fh, indent=2)
+        print(f"\nSaved: {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,347 @@
+"""Dual-link router: pick a link per payload and feed per-link async send queues."""
+
+import asyncio
+import collections
+import time
+
+from .endpoint import new_stats, open_serial, open_socket
+from .histogram import LatencyHistogram
+from .pacing import TokenBucket
+from .policies import as_policy
+
+# ==== default link config (from concurrency_test.py) ====
+PORT_XBEE = "/dev/cu.usbserial-A50285BI"
+BAUD_XBEE = 9600
+
+PORT_ESP32 = "/dev/cu.SLAB_USBtoUART"
+BAUD_ESP32 = 115200
+
+MAX_BATCH_BYTES = 4096  # frames coalesced into a single transport.write()
+TRANSPORT_BUFFER_S = 0.1  # transport write-buffer high watermark, in seconds of line time
+MIN_TRANSPORT_HIGH = 256
+
+OVERFLOW = ('await', 'drop', 'spill')
+
+
+class Link:
+    """One outgoing link: an endpoint plus its send queue and sender task.
+
+    queue_bytes bounds the queue (None = unbounded). Once it is full, room
+    opens again only when the queue has drained to low_water, so waiting
+    senders resume in batches rather than one frame at a time. With
+    pace=True frames leave no faster than the configured baud allows
+    (token bucket, burst of about 50 ms of line time), which keeps the
+    backlog in this queue where it can be inspected, prioritised and
+    spilled, instead of in the OS or transport buffer.
+    """
+
+    def __init__(self, name, endpoint, baud, queue_bytes=None, low_water=None,
+                 overflow='await', pace=False):
+        if overflow not in OVERFLOW:
+            raise ValueError(f"overflow must be one of {OVERFLOW}, not {overflow!r}")
+        self.name = name
+        self.endpoint = endpoint
+        self.baud = baud
+        self.bytes_per_s = baud / 10  # 8N1: 10 bits on the wire per byte
+        self.queue = collections.deque()   # [frame, future, priority, enqueued_at]
+        self.queued_bytes = 0
+        # priority -> the same items, oldest first, so put_dropping finds its
+        # victim in O(1); evicted items stay in `queue` with frame b"" until
+        # the sender task reaches them
+        self.levels = {} if overflow != 'await' else None
+        self.evicted = 0
+        self.queue_bytes = queue_bytes
+        self.low_water = low_water if low_water is not None else (queue_bytes or 0) // 2
+        self.overflow = overflow
+        self.bucket = TokenBucket(self.bytes_per_s) if pace else None
+        self.sent_frames = 0
+        self.dropped = 0
+        self.spilled = 0      # frames sent elsewhere because this queue was full
+        self.max_depth_bytes = 0
+        self.wait = LatencyHistogram()     # enqueue -> handed to the transport (per batch head)
+        self.task = None
+        self._clock = asyncio.get_running_loop().time
+        self._ready = asyncio.Event()
+        self._room = asyncio.Event()
+        self._room.set()
+        self._idle = asyncio.Event()
+        self._idle.set()
+
+        high = max(MIN_TRANSPORT_HIGH, int(self.bytes_per_s * TRANSPORT_BUFFER_S))
+        endpoint.set_write_limits(high, high // 4)
+
+    def has_room(self, n):
+        """True if an n-byte frame fits (an empty queue always takes one frame)."""
+        return self.queue_bytes is None or not self.queued_bytes or self.queued_bytes + n <= self.queue_bytes
+
+    async def wait_room(self, n):
+        while not self.has_room(n):
+            self._room.clear()
+            await self._room.wait()
+
+    def put(self, frame, fut, priority=0):
+        if not self.queue:
+            self._idle.clear()
+            self._ready.set()
+        item = [frame, fut, priority, self._clock()]
+        self.queue.append(item)
+        self.queued_bytes += len(frame)
+        if self.levels is not None:
+            level = self.levels.get(priority)
+            if level is None:
+                level = self.levels[priority] = collections.deque()
+            level.append(item)
+        if self.queued_bytes > self.max_depth_bytes:
+            self.max_depth_bytes = self.queued_bytes
+
+    def put_dropping(self, frame, fut, priority=0):
+        """Make room by dropping lower-priority frames; drop this one if it ranks lowest.
+
+        Dropped frames' futures resolve to None.
+        """
+        levels = self.levels
+        while not self.has_room(len(frame)):
+            lowest = min(levels, default=None)
+            if lowest is None or lowest >= priority:
+                self.dropped += 1
+                fut.set_result(None)
+                return
+            # newest of the lowest-priority frames goes first
+            level = levels[lowest]
+            item = level.pop()
+            if not level:
+                del levels[lowest]
+            self.queued_bytes -= len(item[0])
+            item[0] = b""
+            self.evicted += 1
+            self.dropped += 1
+            if not item[1].done():
+                item[1].set_result(None)
+        self.put(frame, fut, priority)
+
+    async def join(self):
+        """Wait until every queued frame has been handed to the transport."""
+        await self._idle.wait()
+
+    async def run(self):
+        """Drain the queue, coalescing whatever is already waiting into one write."""
+        queue = self.queue
+        record = self.wait.record
+        limit = MAX_BATCH_BYTES
+        if self.bucket is not None:
+            limit = max(1, min(limit, int(self.bucket.capacity)))
+        while True:
+            while not queue:
+                self._idle.set()
+                self._ready.clear()
+                await self._ready.wait()
+            await self.endpoint.writable.wait()
+            batch = [queue.popleft()]
+            size = len(batch[0][0])
+            while queue and size + len(queue[0][0]) <= limit:
+                item = queue.popleft()
+                batch.append(item)
+                size += len(item[0])
+            self.queued_bytes -= size      # evicted frames are b"": already subtracted
+            if self.queued_bytes <= self.low_water:
+                self._room.set()
+            if self.levels is not None:
+                self._unlevel(batch)
+
+            live = [item for item in batch if not item[1].done()]
+            frames = b"".join(item[0] for item in live)
+            if self.bucket is not None and frames:
+                await self.bucket.take(len(frames))
+            try:
+                if frames:
+                    self.endpoint.write(frames)
+            except Exception as e:
+                for item in live:
+                    if not item[1].done():
+                        item[1].set_exception(e)
+            else:
+                if live:
+                    # one record per write: every frame in it waited at most as
+                    # long as the oldest, which keeps this O(1) per batch
+                    record((self._clock() - live[0][3]) * 1e9, len(live))
+                for item in live:
+                    if not item[1].done():
+                        item[1].set_result(self.name)
+                self.sent_frames += len(live)
+
+    def _unlevel(self, batch):
+        levels = self.levels
+        for item in batch:
+            if item[0]:
+                # the oldest queued item is also the oldest of its priority
+                level = levels[item[2]]
+                level.popleft()
+                if not level:
+                    del levels[item[2]]
+            else:
+                self.evicted -= 1
+
+    def metrics(self):
+        """Queue depth, wait-time and flow-control counters for tuning."""
+        return {
+            'depth_frames': len(self.queue) - self.evicted,
+            'depth_bytes': self.queued_bytes,
+            'max_depth_bytes': self.max_depth_bytes,
+            'queue_bytes': self.queue_bytes,
+            'sent_frames': self.sent_frames,
+            'dropped': self.dropped,
+            'spilled': self.spilled,
+            'transport_pauses': self.endpoint.pauses,
+            'pacing_wait_s': round(self.bucket.waited_s, 3) if self.bucket else 0.0,
+            'wait_ms': self.wait.summary_ms(),
+        }
+
+
+class Router:
+    """Route framed payloads over several links.
+
+        router = Router(ThresholdPolicy(64))
+        await router.open_serial("xbee", PORT_XBEE, BAUD_XBEE)
+        await router.open_serial("esp32", PORT_ESP32, BAUD_ESP32)
+        link_name = await router.send(payload)
+
+    send() returns a future that resolves to the link name once the frame
+    has been handed to that link's transport. Payloads are framed by each
+    link endpoint's parser (newline-delimited unless configured otherwise).
+
+    Pass telemetry=Telemetry() to collect decision timing, event-loop lag,
+    queue-depth samples and rates on top of the per-link counters, and to
+    serve them over a local socket (see telemetry.py).
+
+    queue_bytes, overflow and pace are defaults for every link (see Link)
+    and can be overridden per link in open_serial/open_socket/add_link.
+    When a bounded queue is full, `overflow` decides what send() does:
+      'await' - raise asyncio.QueueFull; use `await router.put(...)` to wait
+      'drop'  - drop the lowest-priority frame (possibly this one); its
+                future resolves to None
+      'spill' - queue on another link with room (the future resolves to
+                that link's name), dropping only if every link is full
+    """
+
+    def __init__(self, policy=None, on_line=None, queue_bytes=None, overflow='await', pace=False,
+                 telemetry=None):
+        self.policy = as_policy(policy)
+        self.on_line = on_line
+        self.link_defaults = {'queue_bytes': queue_bytes, 'overflow': overflow, 'pace': pace}
+        self.links = {}
+        self.stats = {}
+        self.telemetry = telemetry
+        # policy decisions left until the next timed one; -1 never counts down to 0
+        self.decisions_until_timed = -1
+        if telemetry is not None:
+            self.decisions_until_timed = telemetry.decision_every
+            telemetry.attach(self)
+
+    def _on_line(self, name, text):
+        if self.on_line:
+            self.on_line(name, text)
+
+    def add_link(self, name, endpoint, baud, **link_opts):
+        """Register an already-connected endpoint and start its sender task."""
+        self.stats.setdefault(name, new_stats(name)[name])
+        endpoint.stats = self.stats
+        link = Link(name, endpoint, baud, **{**self.link_defaults, **link_opts})
+        link.task = asyncio.create_task(link.run(), name=f"link-{name}")
+        self.links[name] = link
+        if self.telemetry is not None:
+            self.telemetry.start()
+        return link
+
+    async def open_serial(self, name, port, baud, framing=None, **link_opts):
+        loop = asyncio.get_running_loop()
+        endpoint = await open_serial(loop, port, baud, name, self._on_line, self.stats, framing)
+        return self.add_link(name, endpoint, baud, **link_opts)
+
+    async def open_socket(self, name, sock, baud, framing=None, **link_opts):
+        """Attach a connected socket as a link that is scheduled (and optionally paced) like `baud`."""
+        loop = asyncio.get_running_loop()
+        endpoint = await open_socket(loop, sock, name, self._on_line, self.stats, framing)
+        return self.add_link(name, endpoint, baud, **link_opts)
+
+    def _choose(self, payload):
+        self.decisions_until_timed -= 1
+        if self.decisions_until_timed:
+            return self.policy.choose(payload, self.links)
+        tel = self.telemetry
+        self.decisions_until_timed = tel.decision_every
+        t0 = time.perf_counter_ns()
+        link = self.policy.choose(payload, self.links)
+        tel.decision_ns.record(time.perf_counter_ns() - t0)
+        return link
+
+    def _target(self, payload, link):
+        if link is None:
+            link = self._choose(payload)
+        try:
+            return self.links[link]
+        except KeyError:
+            raise KeyError(f"no such link: {link!r}") from None
+
+    def send(self, payload: bytes, link=None, priority=0):
+        """Queue payload on `link` (or the policy's choice); returns a future.
+
+        Higher `priority` frames survive 'drop' overflow longer; queue order
+        is always FIFO.
+        """
+        target = self._target(payload, link)
+        frame = target.endpoint.parser.encode(payload)
+        fut = asyncio.get_running_loop().create_future()
+        if target.queue_bytes is None or target.has_room(len(frame)):
+            target.put(frame, fut, priority)
+            return fut
+
+        overflow = target.overflow
+        if overflow == 'spill':
+            for other in self.links.values():
+                if other is target:
+                    continue
+                spill_frame = other.endpoint.parser.encode(payload)
+                if other.has_room(len(spill_frame)):
+                    target.spilled += 1
+                    other.put(spill_frame, fut, priority)
+                    return fut
+            overflow = 'drop'
+        if overflow == 'drop':
+            target.put_dropping(frame, fut, priority)
+            return fut
+        raise asyncio.QueueFull(f"{target.name} queue full ({target.queued_bytes} bytes)")
+
+    async def put(self, payload: bytes, link=None, priority=0):
+        """Like send(), but wait for room when the chosen link's queue is full."""
+        target = self._target(payload, link)
+        if target.overflow == 'await':
+            await target.wait_room(len(target.endpoint.parser.encode(payload)))
+        return self.send(payload, target.name, priority)
+
+    def send_line(self, text: str, link=None):
+        return self.send(text.encode(), link)
+
+    def link_metrics(self):
+        """Per-link queue metrics (see Link.metrics)."""
+        return {name: link.metrics() for name, link in self.links.items()}
+
+    async def drain(self):
+        """Wait until every queued frame has been written."""
+        await asyncio.gather(*(link.join() for link in self.links.values()))
+
+    async def close(self, drain=True):
+        if drain:
+            await self.drain()
+        for link in self.links.values():
+            link.task.cancel()
+        await asyncio.gather(*(l.task for l in self.links.values()), return_exceptions=True)
+        for link in self.links.values():
+            link.endpoint.close()
+        if self.telemetry is not None:
+            await self.telemetry.stop()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close(drain=exc[0] is None)
@@ -0,0 +1,121 @@
+"""Loopback stand-ins for the XBee and ESP32 serial links.
+
+Each stand-in gives the router one end of a byte pipe (a socketpair or a
+pty path) and runs a LineSink on the other end that counts, records and
+optionally echoes the newline-framed messages it receives. An on_line
+callback sees each line with its arrival time (time.perf_counter_ns()).
+"""
+
+import asyncio
+import os
+import socket
+import time
+import tty
+
+
+class LineSink:
+    """Peer side of a link: split incoming bytes into lines, optionally echo them."""
+
+    def __init__(self, name, echo=False, keep=True, on_line=None):
+        self.name = name
+        self.echo = echo
+        self.keep = keep
+        self.on_line = on_line
+        self.lines = []
+        self.count = 0
+        self.rx_bytes = 0
+        self._buf = bytearray()
+        self._write = None
+        self._waiters = []
+
+    def feed(self, data):
+        self.rx_bytes += len(data)
+        self._buf.extend(data)
+        end = self._buf.rfind(b"\n")
+        if end < 0:
+            return
+        chunk = bytes(self._buf[:end + 1])
+        del self._buf[:end + 1]
+        lines = chunk.split(b"\n")[:-1]
+        self.count += len(lines)
+        if self.keep:
+            self.lines.extend(lines)
+        if self.on_line:
+            now = time.perf_counter_ns()
+            for line in lines:
+                self.on_line(line, now)
+        if self.echo and self._write:
+            self._write(chunk)
+        self._wake()
+
+    def _wake(self):
+        for target, fut in list(self._waiters):
+            if self.count >= target and not fut.done():
+                fut.set_result(self.count)
+        self._waiters = [(t, f) for t, f in self._waiters if not f.done()]
+
+    async def wait_for(self, count):
+        """Wait until at least `count` lines have arrived."""
+        if self.count >= count:
+            return self.count
+        fut = asyncio.get_running_loop().create_future()
+        self._waiters.append((count, fut))
+        return await fut
+
+
+class _SinkProtocol(asyncio.Protocol):
+    def __init__(self, sink):
+        self.sink = sink
+
+    def connection_made(self, transport):
+        self.sink._write = transport.write
+
+    def data_received(self, data):
+        self.sink.feed(data)
+
+
+async def socket_standin(name, echo=False, keep=True, on_line=None):
+    """Return (router_sock, sink, close) for a socketpair-backed link."""
+    loop = asyncio.get_running_loop()
+    router_sock, peer_sock = socket.socketpair()
+    sink = LineSink(name, echo, keep, on_line)
+    transport, _ = await loop.create_connection(lambda: _SinkProtocol(sink), sock=peer_sock)
+    return router_sock, sink, transport.close
+
+
+def pty_standin(name, echo=False, keep=True, on_line=None):
+    """Return (pty_path, sink, close) for a pty-backed link.
+
+    The router opens pty_path like a real serial port; the sink reads the
+    master side through the running event loop.
+    """
+    loop = asyncio.get_running_loop()
+    master, slave = os.openpty()
+    tty.setraw(slave)
+    path = os.ttyname(slave)
+    os.set_blocking(master, False)
+    sink = LineSink(name, echo, keep, on_line)
+
+    def on_readable():
+        try:
+            data = os.read(master, 65536)
+        except (BlockingIOError, OSError):
+            return
+        if data:
+            sink.feed(data)
+
+    def write(data):
+        try:
+            os.write(master, data)
+        except BlockingIOError:
+            pass
+
+    sink._write = write
+    loop.add_reader(master, on_readable)
+
+    def close():
+        loop.remove_reader(master)
+        os.close(master)
+        os.close(slave)
+
+    return path, sink, close
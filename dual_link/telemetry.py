@@ -0,0 +1,257 @@
+"""Runtime metrics for the router, exported as JSON or Prometheus text over a local socket.
+
+    telemetry = Telemetry()
+    router = Router(ThresholdPolicy(64), telemetry=telemetry)
+    await router.open_serial("xbee", PORT_XBEE, BAUD_XBEE)
+    await telemetry.serve(port=9464)          # or serve(path="/tmp/dual_link.sock")
+
+    curl -s localhost:9464/metrics            # Prometheus text
+    curl -s localhost:9464/metrics.json       # JSON snapshot
+    echo json | nc -U /tmp/dual_link.sock     # raw request, no HTTP
+
+Nothing here adds work per byte. The endpoints and link queues already
+count bytes, frames, parse errors, drops and queue waits in plain
+attributes. A snapshot reads them, so the only per-message cost is a countdown
+in the router: every `decision_every`-th policy choose() call is timed.
+A monitor task wakes every `tick_s`. Each time it records event-loop lag
+(how late the wake-up was) and samples every link's queue depth into a
+histogram. Every `rate_window_s` it also turns the counters into bytes/s
+and frames/s. All histograms are LatencyHistograms: preallocated buckets,
+constant memory.
+"""
+
+import asyncio
+import json
+import time
+
+from .histogram import LatencyHistogram
+
+TICK_S = 0.05
+RATE_WINDOW_S = 1.0
+DECISION_EVERY = 32
+DEFAULT_PORT = 9464
+NS_PER_US = 1_000
+NS_PER_S = 1_000_000_000
+
+PREFIX = "dual_link"
+QUANTILES = (50, 90, 99, 99.9)
+# Prometheus name, help, snapshot key: per-link counters read straight from the router
+LINK_COUNTERS = [
+    ('tx_bytes_total', "Bytes handed to the link transport.", 'tx_bytes'),
+    ('tx_frames_total', "Frames handed to the link transport.", 'sent_frames'),
+    ('rx_bytes_total', "Bytes received on the link.", 'rx_bytes'),
+    ('rx_frames_total', "Frames parsed from received bytes.", 'rx_frames'),
+    ('parse_errors_total', "Framing errors (oversized lines, bad length headers).", 'parse_errors'),
+    ('dropped_frames_total', "Frames dropped by a full queue.", 'dropped'),
+    ('spilled_frames_total', "Frames moved to another link by a full queue.", 'spilled'),
+    ('transport_pauses_total', "pause_writing() calls from the transport.", 'transport_pauses'),
+]
+LINK_GAUGES = [
+    ('queue_depth_bytes', "Bytes waiting in the send queue.", 'depth_bytes'),
+    ('queue_depth_frames', "Frames waiting in the send queue.", 'depth_frames'),
+    ('queue_max_depth_bytes', "Largest send queue seen, in bytes.", 'max_depth_bytes'),
+    ('tx_bytes_per_second', "Transmit rate over the last rate window.", 'tx_bytes_per_s'),
+    ('tx_frames_per_second', "Transmit frame rate over the last rate window.", 'tx_frames_per_s'),
+    ('rx_bytes_per_second', "Receive rate over the last rate window.", 'rx_bytes_per_s'),
+    ('rx_frames_per_second', "Receive frame rate over the last rate window.", 'rx_frames_per_s'),
+]
+RATE_KEYS = ('tx_bytes', 'sent_frames', 'rx_bytes', 'rx_frames')
+RATE_NAMES = ('tx_bytes_per_s', 'tx_frames_per_s', 'rx_bytes_per_s', 'rx_frames_per_s')
+
+
+class Telemetry:
+    """Counters, histograms and rates for one Router.
+
+    Pass it as Router(telemetry=...); the router starts the monitor task
+    with its first link and stops it (and any server) on close().
+    """
+
+    def __init__(self, tick_s=TICK_S, rate_window_s=RATE_WINDOW_S, decision_every=DECISION_EVERY):
+        self.tick_s = tick_s
+        self.rate_window_s = rate_window_s
+        self.decision_every = decision_every
+        self.router = None
+        self.decision_ns = LatencyHistogram()      # timed policy.choose() calls
+        self.loop_lag_ns = LatencyHistogram()
+        self.depth_bytes = {}                      # link name -> LatencyHistogram of sampled depth
+        self.rates = {}                            # link name -> {rate name: value}
+        self.started = time.monotonic()
+        self.task = None
+        self.servers = []
+        self._last = {}                            # link name -> (t, counter values) at the last rate update
+
+    def attach(self, router):
+        self.router = router
+
+    @property
+    def decisions(self):
+        """Policy decisions made so far (timed or not)."""
+        if self.router is None:
+            return 0
+        return self.decision_ns.count * self.decision_every + self.decision_every - self.router.decisions_until_timed
+
+    def start(self):
+        """Start the monitor task (idempotent; needs a running loop)."""
+        if self.task is None:
+            self.task = asyncio.get_running_loop().create_task(self._monitor(), name="telemetry")
+
+    async def stop(self):
+        for server in self.servers:
+            server.close()
+        if self.task is not None:
+            self.task.cancel()
+            await asyncio.gather(self.task, return_exceptions=True)
+            self.task = None
+        for server in self.servers:
+            await server.wait_closed()
+        self.servers = []
+
+    # --- collection ---
+
+    def _counters(self, name, link):
+        stats = self.router.stats.get(name, {})
+        endpoint = link.endpoint
+        return {
+            'tx_bytes': stats.get('tx_bytes', 0),
+            'sent_frames': link.sent_frames,
+            'rx_bytes': stats.get('rx_bytes', 0),
+            'rx_frames': endpoint.parser.frames,
+            'parse_errors': endpoint.parser.errors,
+        }
+
+    def _update_rates(self, now):
+        for name, link in self.router.links.items():
+            counters = self._counters(name, link)
+            last = self._last.get(name)
+            if last is not None and now > last[0]:
+                dt = now - last[0]
+                self.rates[name] = {rate: round((counters[key] - last[1][key]) / dt, 1)
+                                    for key, rate in zip(RATE_KEYS, RATE_NAMES)}
+            self._last[name] = (now, counters)
+
+    def tick(self, lag_s):
+        """One monitor wake-up: record loop lag and sample queue depths."""
+        self.loop_lag_ns.record(lag_s * NS_PER_S)
+        for name, link in self.router.links.items():
+            hist = self.depth_bytes.get(name)
+            if hist is None:
+                hist = self.depth_bytes[name] = LatencyHistogram(precision_bits=3, max_bits=32)
+            hist.record(link.queued_bytes)
+
+    async def _monitor(self):
+        loop = asyncio.get_running_loop()
+        next_rate = loop.time()
+        while True:
+            expected = loop.time() + self.tick_s
+            await asyncio.sleep(self.tick_s)
+            now = loop.time()
+            self.tick(now - expected)
+            if now >= next_rate:
+                self._update_rates(now)
+                next_rate = now + self.rate_window_s
+
+    # --- export ---
+
+    def snapshot(self):
+        """Every metric as a JSON-ready dict."""
+        links = {}
+        for name, link in (self.router.links.items() if self.router else ()):
+            entry = link.metrics()
+            entry.update(self._counters(name, link))
+            entry.update(self.rates.get(name, dict.fromkeys(RATE_NAMES, 0.0)))
+            depth = self.depth_bytes.get(name)
+            entry['depth_sampled_bytes'] = depth.summary(QUANTILES) if depth else None
+            links[name] = entry
+        return {
+            'uptime_s': round(time.monotonic() - self.started, 3),
+            'decisions': self.decisions,
+            'decision_us': self.decision_ns.summary(QUANTILES, NS_PER_US),
+            'loop_lag_ms': self.loop_lag_ns.summary_ms(QUANTILES),
+            'links': links,
+        }
+
+    def to_json(self):
+        return json.dumps(self.snapshot(), indent=2) + "\n"
+
+    def to_prometheus(self):
+        """Prometheus text exposition format (0.0.4); histograms are exported as summaries."""
+        snap = self.snapshot()
+        links = snap['links']
+        out = []
+
+        def family(name, kind, help_text):
+            out.append(f"# HELP {PREFIX}_{name} {help_text}")
+            out.append(f"# TYPE {PREFIX}_{name} {kind}")
+
+        def summary(name, help_text, hists, unit):
+            # hists: [(label string, LatencyHistogram or None)]
+            family(name, 'summary', help_text)
+            for labels, hist in hists:
+                if hist is None:
+                    continue
+                sep = "," if labels else ""
+                for q in QUANTILES:
+                    value = hist.percentile(q)
+                    out.append(f'{PREFIX}_{name}{{{labels}{sep}quantile="{q / 100:g}"}} '
+                               f'{0 if value is None else value / unit:g}')
+                braces = f"{{{labels}}}" if labels else ""
+                out.append(f"{PREFIX}_{name}_sum{braces} {hist.total / unit:g}")
+                out.append(f"{PREFIX}_{name}_count{braces} {hist.count}")
+
+        family('uptime_seconds', 'gauge', "Seconds since the telemetry was created.")
+        out.append(f"{PREFIX}_uptime_seconds {snap['uptime_s']:g}")
+        family('decisions_total', 'counter', "Scheduling decisions made by the router policy.")
+        out.append(f"{PREFIX}_decisions_total {snap['decisions']}")
+        summary('decision_seconds', f"Time in policy.choose() (1 in {self.decision_every} calls timed).",
+                [("", self.decision_ns)], NS_PER_S)
+        summary('event_loop_lag_seconds', "How late the monitor's periodic wake-up ran.",
+                [("", self.loop_lag_ns)], NS_PER_S)
+        for metrics, kind in ((LINK_COUNTERS, 'counter'), (LINK_GAUGES, 'gauge')):
+            for name, help_text, key in metrics:
+                family(name, kind, help_text)
+                for link, entry in links.items():
+                    out.append(f'{PREFIX}_{name}{{link="{link}"}} {entry[key]:g}')
+        summary('queue_depth_sampled_bytes', f"Send queue depth sampled every {self.tick_s:g} s.",
+                [(f'link="{name}"', hist) for name, hist in self.depth_bytes.items()], 1)
+        summary('queue_wait_seconds', "Enqueue to transport write, per batch head.",
+                [(f'link="{name}"', link.wait) for name, link in
+                 (self.router.links.items() if self.router else ())], NS_PER_S)
+        return "\n".join(out) + "\n"
+
+    async def serve(self, host="127.0.0.1", port=DEFAULT_PORT, path=None):
+        """Serve snapshots on a local TCP port, or on a Unix socket at `path`.
+
+        HTTP GET /metrics returns Prometheus text and /metrics.json (or
+        ?format=json) returns JSON. A connection that sends a bare line
+        instead ("json" or "prometheus") gets the raw body with no headers.
+        """
+        if path is not None:
+            server = await asyncio.start_unix_server(self._handle, path=path)
+        else:
+            server = await asyncio.start_server(self._handle, host, port)
+        self.servers.append(server)
+        return server
+
+    async def _handle(self, reader, writer):
+        try:
+            request = (await asyncio.wait_for(reader.readline(), 5)).decode("latin-1").strip()
+            parts = request.split()
+            http = len(parts) == 3 and parts[2].startswith("HTTP/")
+            if http:
+                while (await asyncio.wait_for(reader.readline(), 5)).strip():
+                    pass    # skip headers
+                target = parts[1]
+            else:
+                target = request
+            as_json = "json" in target.lower()
+            body = (self.to_json() if as_json else self.to_prometheus()).encode()
+            if http:
+                kind = "application/json" if as_json else "text/plain; version=0.0.4"
+                writer.write(f"HTTP/1.0 200 OK\r\nContent-Type: {kind}\r\n"
+                             f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode())
+            writer.write(body)
+            await writer.drain()
+        except (asyncio.TimeoutError, ConnectionError):
+            pass
+        finally:
+            writer.close()
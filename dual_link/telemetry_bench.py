@@ -0,0 +1,166 @@
+"""Overhead of router telemetry at full message rate, plus a check of the socket export.
+
+    python -m dual_link.telemetry_bench
+    python -m dual_link.telemetry_bench --messages 100000 --repeats 9 --max-overhead 3
+
+Runs bench.run_bench (as many messages as the event loop can push through
+both loopback stand-ins) alternately without and with a Telemetry attached.
+On a shared or single-core machine two identical runs can differ by tens of
+percent, far more than the effect being measured. So the overhead is also
+costed directly: the router's per-message decision path and one monitor
+tick are timed in short alternating blocks (best of --repeats each), and
+the extra time is scaled to the full message rate:
+
+    overhead = extra ns/message x msgs/s + tick ns / tick_s
+
+The end-to-end medians are printed alongside as a sanity check. Finally a
+snapshot is served on an ephemeral local port, /metrics and /metrics.json
+are fetched over HTTP and both are checked. Exits non-zero if the costed
+overhead is above --max-overhead percent or the export check fails.
+"""
+
+import argparse
+import asyncio
+import json
+import statistics
+import time
+
+from .bench import make_payloads, open_standins, run_bench
+from .router import Router
+from .telemetry import Telemetry
+
+
+async def fetch(target, host="127.0.0.1", port=None, path=None):
+    """HTTP GET target from a telemetry server; returns the body as text."""
+    if path is not None:
+        reader, writer = await asyncio.open_unix_connection(path)
+    else:
+        reader, writer = await asyncio.open_connection(host, port)
+    writer.write(f"GET {target} HTTP/1.0\r\nHost: {host}\r\n\r\n".encode())
+    await writer.drain()
+    response = await reader.read()
+    writer.close()
+    head, _, body = response.partition(b"\r\n\r\n")
+    if not head.startswith(b"HTTP/1.0 200"):
+        raise ConnectionError(f"bad response: {head[:80]!r}")
+    return body.decode()
+
+
+async def check_export(messages=2000):
+    """Route some traffic with telemetry on and read it back over the socket; returns (json, text)."""
+    telemetry = Telemetry(tick_s=0.01, rate_window_s=0.05)
+    router = Router(telemetry=telemetry)
+    _, closers = await open_standins(router, "socket", echo=True)
+    try:
+        server = await telemetry.serve(port=0)
+        port = server.sockets[0].getsockname()[1]
+        await asyncio.gather(*(router.send(b"x" * (16 + i % 200)) for i in range(messages)))
+        await asyncio.sleep(0.2)     # let echoes arrive and the monitor tick
+        snap = json.loads(await fetch("/metrics.json", port=port))
+        text = await fetch("/metrics", port=port)
+    finally:
+        await router.close()
+        for close in closers:
+            close()
+    return snap, text
+
+
+def verify_export(snap, text, messages):
+    """List of problems with a check_export() result (empty if fine)."""
+    problems = []
+    if snap['decisions'] != messages:
+        problems.append(f"decisions {snap['decisions']} != {messages}")
+    if sum(link['sent_frames'] for link in snap['links'].values()) != messages:
+        problems.append("sent frames do not add up")
+    if not any(link['rx_frames'] for link in snap['links'].values()):
+        problems.append("no echoes counted")
+    if not snap['loop_lag_ms']['count']:
+        problems.append("event-loop lag never sampled")
+    for name in ('dual_link_decisions_total', 'dual_link_event_loop_lag_seconds_count',
+                 'dual_link_tx_bytes_total{link="xbee"}', 'dual_link_queue_wait_seconds{link="esp32",quantile="0.99"}'):
+        if name not in text:
+            problems.append(f"{name} missing from Prometheus text")
+    return problems
+
+
+async def end_to_end(messages, repeats, transport, policy):
+    """msgs/s for each run without (False) and with (True) telemetry, alternating."""
+    rates = {False: [], True: []}
+    await run_bench(min(messages, 5000), transport, policy)      # warm-up
+    for i in range(repeats):
+        for instrumented in ((False, True) if i % 2 == 0 else (True, False)):
+            opts = {'telemetry': Telemetry()} if instrumented else {}
+            result = await run_bench(messages, transport, policy, **opts)
+            if not result['in_order']:
+                raise SystemExit("FAIL: sinks did not receive the routed messages in order")
+            rates[instrumented].append(result['msgs_per_s'])
+    return rates
+
+
+async def path_costs(repeats, policy, block=20000):
+    """(decision path ns/message without, with telemetry; monitor ns/tick), best of `repeats` blocks."""
+    from .bench import POLICIES
+
+    payloads = make_payloads(block)
+    routers, closers = {}, []
+    for instrumented in (False, True):
+        router = Router(POLICIES[policy](), telemetry=Telemetry() if instrumented else None)
+        _, close = await open_standins(router, "socket")
+        routers[instrumented] = router
+        closers += close
+    best = {False: float('inf'), True: float('inf')}
+    tick = float('inf')
+    telemetry = routers[True].telemetry
+    try:
+        for i in range(repeats):
+            for instrumented in ((False, True) if i % 2 == 0 else (True, False)):
+                choose = routers[instrumented]._choose
+                t0 = time.perf_counter_ns()
+                for payload in payloads:
+                    choose(payload)
+                best[instrumented] = min(best[instrumented], (time.perf_counter_ns() - t0) / block)
+            t0 = time.perf_counter_ns()
+            for _ in range(100):
+                telemetry.tick(0.0)
+            tick = min(tick, (time.perf_counter_ns() - t0) / 100)
+    finally:
+        for router in routers.values():
+            await router.close(drain=False)
+        for close in closers:
+            close()
+    return best[False], best[True], tick
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Router telemetry overhead benchmark")
+    parser.add_argument('--messages', type=int, default=50000)
+    parser.add_argument('--repeats', type=int, default=5, help="runs per configuration")
+    parser.add_argument('--transport', choices=['socket', 'pty'], default='socket')
+    parser.add_argument('--policy', default='threshold', help="bench.POLICIES name")
+    parser.add_argument('--max-overhead', type=float, default=3.0, help="fail above this, in percent")
+    args = parser.parse_args()
+
+    rates = asyncio.run(end_to_end(args.messages, args.repeats, args.transport, args.policy))
+    off, on = statistics.median(rates[False]), statistics.median(rates[True])
+    print(f"{'telemetry':<10} {'median msgs/s':>14}  runs")
+    for label, key in (('off', False), ('on', True)):
+        print(f"{label:<10} {statistics.median(rates[key]):>14,.0f}  {', '.join(f'{r:,}' for r in rates[key])}")
+    print(f"{'':<10} {(off - on) / off * 100:>13.1f}%  end-to-end (noisy)")
+
+    base_ns, timed_ns, tick_ns = asyncio.run(path_costs(max(args.repeats, 5), args.policy))
+    full_rate = max(rates[False])
+    per_s_ns = (timed_ns - base_ns) * full_rate + tick_ns / Telemetry().tick_s
+    overhead = per_s_ns / 1e9 * 100
+    print(f"\ndecision path {base_ns:.0f} -> {timed_ns:.0f} ns/message, monitor tick {tick_ns / 1000:.1f} us")
+    print(f"at {full_rate:,} msgs/s: {overhead:.2f}% of one core (limit {args.max_overhead:g}%)")
+
+    snap, text = asyncio.run(check_export())
+    problems = verify_export(snap, text, 2000)
+    print(f"\nexport     {len(text.splitlines())} Prometheus lines, decision p50 {snap['decision_us']['p50']} us, "
+          f"loop lag p99 {snap['loop_lag_ms']['p99']} ms: {'ok' if not problems else '; '.join(problems)}")
+    if overhead > args.max_overhead or problems:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
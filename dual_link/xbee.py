@@ -0,0 +1,494 @@
+"""Asyncio XBee driver for API mode (AP=1, or AP=2 with escaping).
+
+Replaces the transparent-mode `+++` / `ATND` / sleep polling loop from
+concurrency_test.py. Every command is an API frame with its own frame ID,
+so any number of AT commands, transmits and node discoveries can be in
+flight at once without guard times or blocking reads:
+
+    xbee = await XBee.open(PORT_XBEE, BAUD_XBEE)
+    ni = await xbee.at("NI")                 # -> b"COORD"
+    await xbee.discover()                    # fills xbee.neighbors as replies arrive
+    await xbee.send(neighbor.addr64, b"hello")
+
+Incoming frames are parsed in place and checksum-validated by
+APIFrameParser. Corrupt frames are counted and the parser resyncs on the
+next start delimiter. ND replies are parsed as they arrive and folded into
+a NeighborTable whose entries expire after `ttl` seconds without being
+seen again.
+
+The radio has to be in API mode once (`configure_api_mode()` does the
+one-time `+++` / ATAP / ATWR); after that no guard times are needed.
+"""
+
+import argparse
+import asyncio
+import struct
+
+from .endpoint import new_stats
+from .framing import _Parser
+
+START = 0x7E
+ESCAPE = 0x7D
+XON, XOFF = 0x11, 0x13
+_ESCAPED = {START, ESCAPE, XON, XOFF}
+
+# API frame types
+AT_COMMAND = 0x08
+TX_REQUEST = 0x10
+MODEM_STATUS = 0x8A
+AT_RESPONSE = 0x88
+TX_STATUS = 0x8B
+RX_PACKET = 0x90
+
+AT_STATUS = {0: "OK", 1: "ERROR", 2: "invalid command", 3: "invalid parameter", 4: "TX failure"}
+BROADCAST_64 = 0x000000000000FFFF
+UNKNOWN_16 = 0xFFFE
+DEFAULT_TIMEOUT_S = 2.0
+# Largest API frame the radios produce (RF payload NP plus headers). Keeping
+# the bound tight means a corrupted byte that looks like a start delimiter
+# is rejected at once instead of waiting for kilobytes that never come.
+MAX_FRAME = 512
+
+
+class XBeeError(Exception):
+    """The radio rejected a command or a transmission."""
+
+
+class ATCommandError(XBeeError):
+    def __init__(self, command, status):
+        self.command = command
+        self.status = status
+        super().__init__(f"AT{command}: {AT_STATUS.get(status, status)}")
+
+
+def checksum(frame_data):
+    return 0xFF - (sum(frame_data) & 0xFF)
+
+
+class APIFrameParser(_Parser):
+    """XBee API frames: 0x7E, uint16 big-endian length, frame data, checksum.
+
+    feed() returns the frame data (API identifier onwards) of every complete
+    frame with a valid checksum, as read-only memoryviews. With escaped=True
+    (AP=2) the byte stream is unescaped before framing.
+    """
+
+    def __init__(self, escaped=False, max_frame=MAX_FRAME, **kw):
+        super().__init__(max_frame=max_frame, **kw)
+        self.escaped = escaped
+        self._pending_escape = False
+
+    def feed(self, data):
+        if self.escaped:
+            data = self._unescape(data)
+        return super().feed(data)
+
+    def _unescape(self, data):
+        out = bytearray()
+        for b in data:
+            if self._pending_escape:
+                out.append(b ^ 0x20)
+                self._pending_escape = False
+            elif b == ESCAPE:
+                self._pending_escape = True
+            else:
+                out.append(b)
+        return out
+
+    def _parse(self):
+        buf, pos, end = self.buf, self.pos, self.end
+        view = memoryview(buf).toreadonly()
+        out = []
+        while True:
+            start = buf.find(b"\x7e", pos, end)
+            if start < 0:
+                pos = end  # line noise between frames
+                break
+            if end - start < 3:
+                pos = start
+                break
+            length = (buf[start + 1] << 8) | buf[start + 2]
+            if length == 0 or length > self.max_frame:
+                self.errors += 1
+                pos = start + 1
+                continue
+            stop = start + 3 + length
+            if end - stop < 1:
+                pos = start
+                break
+            frame = view[start + 3:stop]
+            if (sum(frame) + buf[stop]) & 0xFF != 0xFF:
+                # a 0x7E inside a frame's data, or a corrupted frame: resync
+                self.errors += 1
+                pos = start + 1
+                continue
+            out.append(frame)
+            pos = stop + 1
+        self.pos = pos
+        self.frames += len(out)
+        return out
+
+    def encode(self, frame_data):
+        body = bytes(frame_data)
+        raw = struct.pack(">H", len(body)) + body + bytes([checksum(body)])
+        if self.escaped:
+            raw = bytes(b for c in raw for b in ((ESCAPE, c ^ 0x20) if c in _ESCAPED else (c,)))
+        return b"\x7e" + raw
+
+
+class Neighbor:
+    """One ND reply (ZigBee layout: MY, SH, SL, NI, parent, device type, status, profile, mfr)."""
+
+    __slots__ = ('addr64', 'addr16', 'ni', 'parent16', 'device_type', 'first_seen', 'last_seen')
+
+    DEVICE_TYPES = {0: "coordinator", 1: "router", 2: "end device"}
+
+    def __init__(self, addr64, addr16, ni, parent16=None, device_type=None):
+        self.addr64 = addr64
+        self.addr16 = addr16
+        self.ni = ni
+        self.parent16 = parent16
+        self.device_type = device_type
+        self.first_seen = None
+        self.last_seen = None
+
+    @classmethod
+    def parse(cls, data):
+        data = bytes(data)
+        addr16, addr64 = struct.unpack_from(">HQ", data)
+        nul = data.find(b"\x00", 10)
+        if nul < 0:
+            nul = len(data)
+        ni = data[10:nul].decode(errors="replace")
+        rest = data[nul + 1:]
+        parent16 = device_type = None
+        if len(rest) >= 3:
+            parent16, device_type = struct.unpack_from(">HB", rest)
+        return cls(addr64, addr16, ni, parent16, device_type)
+
+    def encode(self):
+        """ND reply payload (used by the fake XBee)."""
+        return (struct.pack(">HQ", self.addr16, self.addr64) + self.ni.encode() + b"\x00"
+                + struct.pack(">HBBHH", self.parent16 if self.parent16 is not None else UNKNOWN_16,
+                              self.device_type or 0, 0, 0xC105, 0x101E))
+
+    def __repr__(self):
+        kind = self.DEVICE_TYPES.get(self.device_type, "?")
+        return f"Neighbor({self.ni!r} {self.addr64:016X}/{self.addr16:04X} {kind})"
+
+
+class NeighborTable:
+    """Neighbors keyed by 64-bit address, expiring `ttl` seconds after they were last seen.
+
+    on_change(event, neighbor) is called with 'added', 'updated' (address or
+    name changed) or 'expired'; a plain re-sighting only refreshes last_seen.
+    """
+
+    def __init__(self, ttl=30.0, on_change=None):
+        self.ttl = ttl
+        self.on_change = on_change
+        self._entries = {}
+
+    def update(self, neighbor, now):
+        old = self._entries.get(neighbor.addr64)
+        neighbor.first_seen = old.first_seen if old else now
+        neighbor.last_seen = now
+        self._entries[neighbor.addr64] = neighbor
+        if old is None:
+            event = 'added'
+        elif (old.addr16, old.ni, old.parent16) != (neighbor.addr16, neighbor.ni, neighbor.parent16):
+            event = 'updated'
+        else:
+            return 'seen'   # refreshes last_seen only
+        if self.on_change:
+            self.on_change(event, neighbor)
+        return event
+
+    def expire(self, now):
+        """Drop neighbors not seen for ttl seconds; returns them."""
+        gone = [n for n in self._entries.values() if now - n.last_seen > self.ttl]
+        for n in gone:
+            del self._entries[n.addr64]
+            if self.on_change:
+                self.on_change('expired', n)
+        return gone
+
+    def get(self, addr64):
+        return self._entries.get(addr64)
+
+    def by_name(self, ni):
+        return next((n for n in self._entries.values() if n.ni == ni), None)
+
+    def __iter__(self):
+        return iter(list(self._entries.values()))
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, addr64):
+        return addr64 in self._entries
+
+
+class XBee(asyncio.Protocol):
+    """API-mode XBee on an asyncio transport (serial port, pty or socket)."""
+
+    def __init__(self, name="xbee", escaped=False, ttl=30.0, on_receive=None,
+                 on_neighbor=None, stats=None):
+        self.name = name
+        self.parser = APIFrameParser(escaped=escaped)
+        self.neighbors = NeighborTable(ttl, on_neighbor)
+        self.on_receive = on_receive          # on_receive(addr64, payload bytes)
+        self.stats = stats if stats is not None else new_stats(name)
+        self.transport = None
+        self.modem_status = None
+        self._handlers = {}                   # frame id -> callback(frame)
+        self._next_id = 1
+        self._ids = asyncio.Semaphore(255)    # frame ids 1..255 in flight
+        self._nt_s = None
+        self.connected = asyncio.get_running_loop().create_future()
+
+    # --- transport plumbing ---
+
+    @classmethod
+    async def open(cls, port, baud=9600, **kw):
+        """Open a serial port (or pty path) in API mode."""
+        import serial_asyncio
+
+        loop = asyncio.get_running_loop()
+        _, protocol = await serial_asyncio.create_serial_connection(
+            loop, lambda: cls(**kw), port, baudrate=baud)
+        await protocol.connected
+        return protocol
+
+    def connection_made(self, transport):
+        self.transport = transport
+        if not self.connected.done():
+            self.connected.set_result(True)
+
+    def connection_lost(self, exc):
+        self.transport = None
+        err = exc or ConnectionError(f"{self.name} closed")
+        for handler in list(self._handlers.values()):
+            handler(err)
+        self._handlers.clear()
+
+    def data_received(self, data):
+        self.stats[self.name]["rx_bytes"] += len(data)
+        for frame in self.parser.feed(data):
+            self._dispatch(frame)
+
+    def close(self):
+        if self.transport:
+            self.transport.close()
+
+    @property
+    def checksum_errors(self):
+        return self.parser.errors
+
+    def write_frame(self, frame_data):
+        if self.transport is None:
+            raise ConnectionError(f"{self.name} is not connected")
+        raw = self.parser.encode(frame_data)
+        self.stats[self.name]["tx_bytes"] += len(raw)
+        self.transport.write(raw)
+
+    # --- frame ids ---
+
+    async def _acquire_id(self, handler):
+        await self._ids.acquire()
+        while self._next_id in self._handlers:
+            self._next_id = self._next_id % 255 + 1
+        fid = self._next_id
+        self._next_id = fid % 255 + 1
+        self._handlers[fid] = handler
+        return fid
+
+    def _release_id(self, fid):
+        if self._handlers.pop(fid, None) is not None:
+            self._ids.release()
+
+    def _dispatch(self, frame):
+        api_id = frame[0]
+        if api_id in (AT_RESPONSE, TX_STATUS):
+            handler = self._handlers.get(frame[1])
+            if handler:
+                handler(frame)
+        elif api_id == RX_PACKET:
+            if self.on_receive:
+                addr64 = int.from_bytes(frame[1:9], "big")
+                self.on_receive(addr64, bytes(frame[12:]))
+        elif api_id == MODEM_STATUS:
+            self.modem_status = frame[1]
+
+    # --- commands ---
+
+    async def _request(self, build, timeout):
+        """Send one frame built by build(fid) and await its single response frame."""
+        loop = asyncio.get_running_loop()
+        fut = loop.create_future()
+
+        def handler(frame):
+            if fut.done():
+                return
+            if isinstance(frame, BaseException):
+                fut.set_exception(frame)
+            else:
+                fut.set_result(bytes(frame))
+
+        fid = await self._acquire_id(handler)
+        try:
+            self.write_frame(build(fid))
+            return await asyncio.wait_for(fut, timeout)
+        finally:
+            self._release_id(fid)
+
+    async def at(self, command, param=b"", timeout=DEFAULT_TIMEOUT_S):
+        """Run a local AT command; returns its response data (raises ATCommandError)."""
+        cmd = command.encode()
+        if isinstance(param, int):
+            param = param.to_bytes(max(1, (param.bit_length() + 7) // 8), "big")
+        frame = await self._request(lambda fid: bytes([AT_COMMAND, fid]) + cmd + param, timeout)
+        status = frame[4]
+        if status != 0:
+            raise ATCommandError(command, status)
+        return frame[5:]
+
+    async def at_int(self, command, timeout=DEFAULT_TIMEOUT_S):
+        return int.from_bytes(await self.at(command, timeout=timeout), "big")
+
+    async def send(self, addr64, payload, addr16=UNKNOWN_16, timeout=10.0):
+        """Transmit payload to addr64; resolves once the radio reports delivery."""
+        header = struct.pack(">QHBB", addr64, addr16, 0, 0)
+        frame = await self._request(lambda fid: bytes([TX_REQUEST, fid]) + header + payload,
+                                    timeout)
+        delivery = frame[5]
+        if delivery != 0:
+            raise XBeeError(f"TX to {addr64:016X} failed: delivery status 0x{delivery:02X}")
+        return frame[4]  # retries
+
+    async def discovery_time(self):
+        """Node discovery window (ATNT, units of 100 ms), queried once."""
+        if self._nt_s is None:
+            self._nt_s = await self.at_int("NT") / 10
+        return self._nt_s
+
+    async def discover(self, timeout=None):
+        """Run ATND and return the neighbors that answered.
+
+        Replies update self.neighbors as they arrive, so concurrent readers
+        see nodes incrementally. Ends after the ND window (plus margin) or
+        on the radio's empty end-of-discovery reply.
+        """
+        if timeout is None:
+            timeout = await self.discovery_time() + 1.0
+        loop = asyncio.get_running_loop()
+        done = loop.create_future()
+        found = []
+
+        def handler(frame):
+            if done.done():
+                return
+            if isinstance(frame, BaseException):
+                done.set_exception(frame)
+                return
+            if frame[4] != 0:
+                done.set_exception(ATCommandError("ND", frame[4]))
+                return
+            if len(frame) <= 5:
+                done.set_result(None)   # end of discovery
+                return
+            neighbor = Neighbor.parse(frame[5:])
+            self.neighbors.update(neighbor, loop.time())
+            found.append(neighbor)
+
+        fid = await self._acquire_id(handler)
+        try:
+            self.write_frame(bytes([AT_COMMAND, fid]) + b"ND")
+            try:
+                await asyncio.wait_for(asyncio.shield(done), timeout)
+            except asyncio.TimeoutError:
+                pass
+        finally:
+            self._release_id(fid)
+        return found
+
+    async def watch_neighbors(self, interval=5.0):
+        """Rediscover every `interval` seconds and expire stale neighbors, forever."""
+        loop = asyncio.get_running_loop()
+        while True:
+            await self.discover()
+            self.neighbors.expire(loop.time())
+            await asyncio.sleep(interval)
+
+
+async def configure_api_mode(port, baud=9600, mode=1):
+    """One-time switch of a transparent-mode radio to API mode (ATAP, ATWR, ATCN).
+
+    This is the only place that still needs the command-mode guard time.
+    """
+    import serial_asyncio
+
+    reader, writer = await serial_asyncio.open_serial_connection(url=port, baudrate=baud)
+    try:
+        await asyncio.sleep(1.1)
+        writer.write(b"+++")
+        await asyncio.sleep(1.1)
+        writer.write(f"ATAP{mode}\rATWR\rATCN\r".encode())
+        await writer.drain()
+        replies = []
+        for _ in range(4):  # OK for +++, AP, WR, CN
+            replies.append((await asyncio.wait_for(reader.readuntil(b"\r"), 3)).strip())
+        if any(r != b"OK" for r in replies):
+            raise XBeeError(f"configuration failed: {replies}")
+    finally:
+        writer.close()
+
+
+def _print_change(event, neighbor):
+    print(f"[{event:>7}] {neighbor}", flush=True)
+
+
+async def _watch(args):
+    fake = None
+    port = args.port
+    if args.fake:
+        from .fake_xbee import FakeXBee
+        fake = FakeXBee.with_neighbors(args.fake, nt_s=args.nt)
+        fake.start()
+        port = fake.path
+        print(f"fake XBee on {port} with {args.fake} neighbors", flush=True)
+
+    xbee = await XBee.open(port, args.baud, ttl=args.ttl, on_neighbor=_print_change)
+    print(f"NI={bytes(await xbee.at('NI')).decode()!r}, ND window {await xbee.discovery_time():.1f}s")
+    try:
+        await asyncio.wait_for(xbee.watch_neighbors(args.interval), args.seconds or None)
+    except asyncio.TimeoutError:
+        pass
+    finally:
+        print(f"{len(xbee.neighbors)} neighbors, {xbee.checksum_errors} bad frames")
+        xbee.close()
+        if fake:
+            fake.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Watch XBee neighbors in API mode")
+    parser.add_argument('port', nargs='?', default=None, help="serial port (omit with --fake)")
+    parser.add_argument('--baud', type=int, default=9600)
+    parser.add_argument('--interval', type=float, default=5.0, help="seconds between discoveries")
+    parser.add_argument('--ttl', type=float, default=30.0, help="forget neighbors not seen for this long")
+    parser.add_argument('--seconds', type=float, default=0, help="stop after N seconds (0 = forever)")
+    parser.add_argument('--fake', type=int, default=0, metavar='N',
+                        help="run against a pty fake XBee with N neighbors")
+    parser.add_argument('--nt', type=float, default=1.0, help="fake XBee ND window (s)")
+    args = parser.parse_args()
+    if not args.port and not args.fake:
+        parser.error("give a port or --fake N")
+    try:
+        asyncio.run(_watch(args))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
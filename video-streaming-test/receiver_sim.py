@@ -0,0 +1,247 @@
+#!/usr/bin/env python3
+"""Monte Carlo simulator of the NEED_DATA video receiver (xifi_receiver_sim.ino).
+
+Replays the firmware's loop() for many (parameter set, seed) runs at once.
+Every run is one element of a NumPy vector and each LOOP_DELAY tick is a
+handful of array operations, so thousands of configurations cost about the
+same as one. Large sweeps can additionally be split across processes.
+
+Per LOOP_DELAY tick, exactly like the sketch:
+  1. buffer -= VIDEO_CONSUME_RATE (clamped at 0)
+  2. buffer < BUFFER_THRESHOLD and not advertising -> start NEED_DATA advertising
+  3. now >= nextBurstTime -> stop advertising, buffer += WIFI_BURST_SIZE
+     (clamped at BUFFER_MAX), next burst in random(WIFI_BURST_MIN_MS, WIFI_BURST_MAX_MS)
+
+With --reactive the sender only bursts when it sees NEED_DATA, which is the
+hybrid algorithm from PowerTests/REPORT.md rather than the sketch's blind
+random bursts.
+
+Energy uses the measured costs (dual_link.cost_model): each burst is a cold
+WiFi send of WIFI_BURST_SIZE bytes, and advertising draws the BLE_ADV
+transfer-phase power.
+"""
+
+import argparse
+import itertools
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT_DIR))
+
+from dual_link.cost_model import CostModel  # noqa: E402
+
+# Defaults from xifi_receiver_sim.ino
+BUFFER_MAX = 500
+BUFFER_THRESHOLD = 200
+VIDEO_CONSUME_RATE = 5
+LOOP_DELAY = 50
+WIFI_BURST_SIZE = 120
+WIFI_BURST_MIN_MS = 300
+WIFI_BURST_MAX_MS = 2500
+
+RNG_BLOCK = 256   # uniforms drawn per run at a time
+
+PARAMS = ['buffer_max', 'buffer_threshold', 'consume_rate', 'burst_size',
+          'burst_min_ms', 'burst_max_ms']
+
+DEFAULTS = {
+    'buffer_max': BUFFER_MAX,
+    'buffer_threshold': BUFFER_THRESHOLD,
+    'consume_rate': VIDEO_CONSUME_RATE,
+    'burst_size': WIFI_BURST_SIZE,
+    'burst_min_ms': WIFI_BURST_MIN_MS,
+    'burst_max_ms': WIFI_BURST_MAX_MS,
+}
+
+
+def load_costs(model=None):
+    """(WiFi ModeCost for burst energy, BLE advertising power in mW).
+
+    The advertising power is the median measured BLE_ADV transfer-phase
+    power over all payload sizes, read from the CSV the model was fitted on.
+    """
+    model = model or CostModel()
+    results = pd.read_csv(model.path)
+    adv_power_mW = float(results.loc[results['mode'] == 'BLE_ADV', 'transfer_avg_power_mW'].median())
+    return model.modes['WiFi'], adv_power_mW
+
+
+def simulate(params, duration_s=600, loop_ms=LOOP_DELAY, reactive=False, seed=0,
+             costs=None):
+    """Run every row of `params` ({name: array(R)}) for duration_s; returns {metric: array(R)}.
+
+    Row r draws its burst gaps from SeedSequence([seed, params['seed'][r]])
+    (the row index if there is no 'seed'), and only when that row is due.
+    A run's result therefore depends on its parameters, `seed` and its
+    replicate number alone, not on the other rows in the batch. Parameter
+    sets with the same replicate share a stream (common random numbers).
+    """
+    p = {k: np.asarray(params[k], dtype=np.int64) for k in PARAMS}
+    runs = len(p['buffer_max'])
+    steps = int(duration_s * 1000 // loop_ms)
+    replicate = np.asarray(params['seed']) if 'seed' in params else np.arange(runs)
+
+    # per-run uniform streams, buffered so a draw stays one fancy index
+    gens = [np.random.default_rng(np.random.SeedSequence([seed, int(r)])) for r in replicate]
+    uniforms = np.array([g.random(RNG_BLOCK) for g in gens]).reshape(runs, RNG_BLOCK)
+    used = np.zeros(runs, dtype=np.intp)
+
+    def gap_ms(rows):
+        """random(burst_min_ms, burst_max_ms) for each of `rows`, from its own stream."""
+        for i in rows[used[rows] == RNG_BLOCK]:
+            uniforms[i] = gens[i].random(RNG_BLOCK)
+            used[i] = 0
+        u = uniforms[rows, used[rows]]
+        used[rows] += 1
+        lo, hi = p['burst_min_ms'][rows], p['burst_max_ms'][rows]
+        return lo + (u * (hi - lo)).astype(np.int64)
+
+    buffer = p['buffer_max'].copy()
+    advertising = np.zeros(runs, dtype=bool)
+    next_burst = gap_ms(np.arange(runs))
+
+    stall_steps = np.zeros(runs, dtype=np.int64)
+    stall_events = np.zeros(runs, dtype=np.int64)
+    adv_steps = np.zeros(runs, dtype=np.int64)
+    adv_starts = np.zeros(runs, dtype=np.int64)
+    bursts = np.zeros(runs, dtype=np.int64)
+    min_buffer = buffer.copy()
+    was_stalled = np.zeros(runs, dtype=bool)
+
+    for step in range(steps):
+        now = step * loop_ms
+
+        # 1. playback; a tick that can't consume a full chunk is a stall
+        stalled = buffer < p['consume_rate']
+        stall_steps += stalled
+        stall_events += stalled & ~was_stalled
+        was_stalled = stalled
+        buffer = np.maximum(buffer - p['consume_rate'], 0)
+        np.minimum(min_buffer, buffer, out=min_buffer)
+
+        # 2. NEED_DATA advertising
+        start = (buffer < p['buffer_threshold']) & ~advertising
+        adv_starts += start
+        advertising |= start
+        adv_steps += advertising
+
+        # 3. WiFi burst
+        due = now >= next_burst
+        if reactive:
+            fire = due & advertising
+        else:
+            fire = due
+        if fire.any():
+            bursts += fire
+            advertising &= ~fire
+            buffer = np.where(fire, np.minimum(buffer + p['burst_size'], p['buffer_max']), buffer)
+        if due.any():
+            # the sender reschedules whether or not it found anything to send
+            rows = np.flatnonzero(due)
+            next_burst[rows] = now + gap_ms(rows)
+
+    wifi, adv_power_mW = costs if costs is not None else load_costs()
+    burst_cost = wifi.energy_mJ(p['burst_size'], warm=False)  # cold WiFi send per burst
+    adv_s = adv_steps * loop_ms / 1000
+
+    return {
+        'stall_s': stall_steps * loop_ms / 1000,
+        'stall_events': stall_events,
+        'stall_pct': stall_steps / steps * 100,
+        'adv_duty_pct': adv_steps / steps * 100,
+        'adv_starts': adv_starts,
+        'bursts': bursts,
+        'min_buffer': min_buffer,
+        'sender_energy_mJ': bursts * burst_cost,
+        'adv_energy_mJ': adv_s * adv_power_mW,
+    }
+
+
+def expand_grid(grid, seeds=1):
+    """Cartesian product of {param: values} (missing params use the sketch defaults) x seeds."""
+    values = {k: list(np.atleast_1d(grid.get(k, DEFAULTS[k]))) for k in PARAMS}
+    combos = list(itertools.product(*(values[k] for k in PARAMS)))
+    rows = [c for c in combos for _ in range(seeds)]
+    out = {k: np.array([r[i] for r in rows], dtype=np.int64) for i, k in enumerate(PARAMS)}
+    out['seed'] = np.tile(np.arange(seeds), len(combos))
+    # random(min, max) needs min < max
+    out['burst_max_ms'] = np.maximum(out['burst_max_ms'], out['burst_min_ms'] + 1)
+    return out
+
+
+def _run_chunk(args):
+    params, duration_s, loop_ms, reactive, seed, costs = args
+    return simulate(params, duration_s, loop_ms, reactive, seed, costs)
+
+
+def sweep(grid, seeds=10, duration_s=600, loop_ms=LOOP_DELAY, reactive=False,
+          workers=1, seed=0):
+    """Simulate the full grid x seeds; returns one DataFrame row per run.
+
+    The `seed` column numbers the replicates of each parameter set. With
+    the sweep's `seed` it fixes the run's random stream (see simulate), so
+    results don't depend on `workers`, and any row can be rerun on its own.
+    """
+    runs = expand_grid(grid, seeds)
+    n = len(runs['seed'])
+    costs = load_costs()
+
+    workers = max(1, workers)
+    bounds = np.linspace(0, n, workers + 1).astype(int)
+    chunks = [({k: runs[k][lo:hi] for k in PARAMS + ['seed']}, duration_s, loop_ms, reactive, seed, costs)
+              for lo, hi in zip(bounds[:-1], bounds[1:]) if hi > lo]
+
+    if workers == 1:
+        results = [_run_chunk(c) for c in chunks]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(_run_chunk, chunks))
+
+    metrics = {k: np.concatenate([r[k] for r in results]) for k in results[0]}
+    df = pd.DataFrame({**{k: runs[k] for k in PARAMS + ['seed']}, **metrics})
+    df['total_energy_mJ'] = df['sender_energy_mJ'] + df['adv_energy_mJ']
+    return df
+
+
+def _int_list(text):
+    return [int(x) for x in text.split(',')]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    for name in PARAMS:
+        parser.add_argument('--' + name.replace('_', '-'), type=_int_list,
+                            default=[DEFAULTS[name]], help=f"comma list (default {DEFAULTS[name]})")
+    parser.add_argument('--seeds', type=int, default=20, help="random seeds per parameter set")
+    parser.add_argument('--duration', type=float, default=600, help="simulated seconds per run")
+    parser.add_argument('--reactive', action='store_true', help="sender bursts only on NEED_DATA")
+    parser.add_argument('--seed', type=int, default=0, help="sweep seed; with a row's seed it fixes the run")
+    parser.add_argument('-j', '--workers', type=int, default=1)
+    parser.add_argument('--out', help="write per-run results CSV")
+    args = parser.parse_args()
+
+    grid = {name: getattr(args, name) for name in PARAMS}
+    df = sweep(grid, args.seeds, args.duration, reactive=args.reactive, workers=args.workers, seed=args.seed)
+
+    summary = (df.groupby(PARAMS)
+               .agg(stall_pct=('stall_pct', 'mean'), stall_events=('stall_events', 'mean'),
+                    adv_duty_pct=('adv_duty_pct', 'mean'), bursts=('bursts', 'mean'),
+                    total_energy_mJ=('total_energy_mJ', 'mean'))
+               .reset_index()
+               .sort_values(['stall_pct', 'total_energy_mJ']))
+    print(f"{len(df)} runs ({len(summary)} parameter sets x {args.seeds} seeds), "
+          f"{args.duration:.0f}s simulated each\n")
+    print(summary.head(20).to_string(index=False))
+
+    if args.out:
+        df.to_csv(args.out, index=False)
+        print(f"\nSaved: {args.out}")
+
+
+if __name__ == "__main__":
+    main()